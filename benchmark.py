@@ -0,0 +1,434 @@
+"""
+benchmark.py
+=============
+EAPS — Employee Attrition Prediction System
+Inference micro-benchmarks against the trained models in models/.
+
+Usage:
+    python benchmark.py                  # run every benchmark
+    python benchmark.py tree_engine      # run selected benchmarks
+
+Requires a trained models/ directory (python eaps_ml_pipeline.py).
+"""
+
+import os, sys, time, warnings
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+warnings.filterwarnings('ignore')
+
+from utils.preprocess import IBM_FEATURES, CATEGORICAL_MAPS
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    """Register a bench_* function under its short name."""
+    BENCHMARKS[fn.__name__.replace('bench_', '', 1)] = fn
+    return fn
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Best-of-N wall time of fn() in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def synthetic_employees(n: int, seed: int = 0) -> pd.DataFrame:
+    """Raw (unencoded) IBM-style employee rows, as an HR upload would contain."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in IBM_FEATURES:
+        if col in CATEGORICAL_MAPS:
+            data[col] = rng.choice(list(CATEGORICAL_MAPS[col]), n)
+        elif col == 'Age':
+            data[col] = rng.integers(18, 60, n)
+        elif col in ('MonthlyIncome', 'MonthlyRate'):
+            data[col] = rng.integers(1000, 27000, n)
+        elif col == 'HourlyRate':
+            data[col] = rng.integers(30, 100, n)
+        elif col in ('DistanceFromHome', 'PercentSalaryHike'):
+            data[col] = rng.integers(1, 30, n)
+        elif col.startswith('Years'):
+            data[col] = rng.integers(0, 20, n)
+        else:
+            data[col] = rng.integers(1, 5, n)
+    return pd.DataFrame(data)
+
+
+def labelled_employees(n: int, seed: int = 0):
+    """
+    (encoded rows in feature_names order, labels, P(leave)) for training
+    benchmarks: leavers are drawn from the served XGBoost probabilities, a
+    realistic nonlinear target.
+    """
+    from utils.model_loader import load_feature_names, score_rows
+    from utils.preprocess import preprocess_uploaded_csv
+
+    X = preprocess_uploaded_csv(synthetic_employees(n, seed=seed))[load_feature_names()]
+    p = score_rows(X, 'XGBoost')[0]
+    return X, (np.random.default_rng(seed).random(n) < p).astype(int), p
+
+
+def _row(*cols, width=12):
+    return '  ' + ''.join(str(c).rjust(width) for c in cols)
+
+
+# ── Benchmarks ────────────────────────────────────────────────────────────────
+@benchmark
+def bench_tree_engine():
+    """sklearn predict_proba vs native CompiledTreeEnsemble at 1, 100, 100k rows."""
+    from utils.model_loader import load_all_models, get_compiled_model, TREE_MODELS
+    from utils.preprocess import preprocess_uploaded_csv
+
+    models, _ = load_all_models()
+    X_all = preprocess_uploaded_csv(synthetic_employees(100_000)).astype(np.float64)
+
+    for name in sorted(TREE_MODELS):
+        model, native = models.get(name), get_compiled_model(name)
+        if model is None or native is None:
+            print(f"  {name}: not available — skipped")
+            continue
+        print(f"\n  {name}  ({native.n_trees} trees, depth ≤ {native.max_depth}, "
+              f"{native.nbytes / 1e6:.1f} MB node arrays)")
+        print(_row('rows', 'sklearn ms', 'native ms', 'speedup', 'max |Δp|'))
+        for n in (1, 100, 100_000):
+            X_df = X_all.head(n)
+            X_np = X_df.to_numpy()
+            repeat = 5 if n < 10_000 else 1
+            t_sk = timed(lambda: model.predict_proba(X_df), repeat)
+            t_nt = timed(lambda: native.predict_proba(X_np), repeat)
+            diff = np.abs(model.predict_proba(X_df)[:, 1] - native.predict_proba(X_np)[:, 1]).max()
+            print(_row(f'{n:,}', f'{t_sk:.2f}', f'{t_nt:.2f}', f'{t_sk / t_nt:.1f}x', f'{diff:.1e}'))
+
+
+@benchmark
+def bench_single_row():
+    """Per-call overhead of the legacy DataFrame path vs encode_row → NumPy row."""
+    from utils import model_loader as ml
+    from utils.preprocess import encode_input, encode_row
+
+    payload = synthetic_employees(1, seed=7).iloc[0].to_dict()
+    models, scaler = ml.load_all_models()
+    feature_names = ml.load_feature_names()
+
+    def legacy(model_name):
+        # Pre-change path: encode_input → .iloc[0].to_dict() → DataFrame(s)
+        emp = encode_input(payload).iloc[0].to_dict()
+        df = pd.DataFrame([{col: emp.get(col, 0) for col in feature_names}])
+        if model_name in ml.SCALED_MODELS and scaler:
+            df = pd.DataFrame(scaler.transform(df), columns=df.columns)
+        return float(ml._predictor(ml._snapshot(), model_name, 1).predict_proba(df)[0][1])
+
+    def fast(model_name):
+        return ml.predict_single(encode_row(payload, feature_names), model_name)
+
+    t_enc_old = timed(lambda: encode_input(payload).iloc[0].to_dict(), 200)
+    t_enc_new = timed(lambda: encode_row(payload, feature_names), 200)
+    print(_row('stage', 'legacy ms', 'numpy ms', width=14))
+    print(_row('encode', f'{t_enc_old:.3f}', f'{t_enc_new:.3f}', width=14))
+
+    previous = ml.get_inference_engine()
+    ml.set_inference_engine('native')
+    try:
+        for name in ml.MODELS:
+            if models.get(name) is None:
+                continue
+            assert round(legacy(name), 4) == fast(name)['probability']
+            t_old = timed(lambda: legacy(name), 50)
+            t_new = timed(lambda: fast(name), 50)
+            print(_row(name[:14], f'{t_old:.3f}', f'{t_new:.3f}', width=14))
+    finally:
+        ml.set_inference_engine(previous)
+    print("  (tree models scored with the native engine so model time does not mask overhead)")
+
+
+@benchmark
+def bench_coalescer():
+    """Throughput of 32 concurrent single predictions: direct vs micro-batched."""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils import model_loader as ml
+    from utils.coalescer import PredictionCoalescer
+    from utils.preprocess import encode_row
+
+    feature_names = ml.load_feature_names()
+    rows = [encode_row(r, feature_names) for r in synthetic_employees(512).to_dict('records')]
+
+    for name in ml.MODELS:
+        if ml.load_all_models()[0].get(name) is None:
+            continue
+        print(f"\n  {name}")
+        print(_row('window ms', 'req/s', 'mean batch', 'p99 wait ms', width=13))
+        with ThreadPoolExecutor(32) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(lambda r: ml.predict_single(r, name), rows))
+            print(_row('direct', f'{len(rows) / (time.perf_counter() - t0):.0f}', '1', '-', width=13))
+
+            for window in (1, 2, 5):
+                co = PredictionCoalescer(window_ms=window, max_rows=64)
+                t0 = time.perf_counter()
+                list(pool.map(lambda r: co.predict(r, name), rows))
+                rate = len(rows) / (time.perf_counter() - t0)
+                st = co.stats()
+                co.close()
+                print(_row(window, f'{rate:.0f}', st['mean_batch_size'],
+                           st['queue_wait_ms']['p99'], width=13))
+
+
+@benchmark
+def bench_categorical_encoding():
+    """Label-encoding uploaded categorical columns: per-cell transform vs vectorized lookup."""
+    from sklearn.preprocessing import LabelEncoder
+    from utils.model_loader import models_exist
+    from utils.preprocess import current_feature_plan
+
+    if not models_exist():
+        print("  No trained models — train the models first.")
+        return
+    plan    = current_feature_plan()
+    le_dict = {}
+    for col, lookup in plan.categories.items():
+        # The training encoders again, from the served plan's class → code tables
+        le_dict[col] = LabelEncoder()
+        le_dict[col].classes_ = np.array(sorted(lookup, key=lookup.get))
+
+    def per_cell(df):
+        # Pre-change path: one LabelEncoder.transform call per cell
+        out = {}
+        for col, le in le_dict.items():
+            if col in df.columns:
+                known = set(le.classes_)
+                out[col] = df[col].astype(str).apply(
+                    lambda x: int(le.transform([x])[0]) if x in known else 0)
+        return out
+
+    def vectorized(df):
+        return {col: plan.encode_column(col, df[col])
+                for col in le_dict if col in plan.categories and col in df.columns}
+
+    cols = [c for c in le_dict if c in IBM_FEATURES]
+    print(f"  {len(cols)} categorical columns: {', '.join(cols)}")
+    print(_row('rows', 'per-cell ms', 'vector ms', 'speedup', width=13))
+    for n in (1_000, 10_000, 100_000):
+        df = synthetic_employees(n, seed=3)
+        df.loc[df.index[::97], cols[0]] = 'Unseen value'   # unknowns must still encode to 0
+        t0 = time.perf_counter()
+        old = per_cell(df)                      # ~70 s at 100k rows — timed once
+        t_old = (time.perf_counter() - t0) * 1000
+        new = vectorized(df)
+        assert all(old[c].equals(new[c]) for c in old)
+        t_new = timed(lambda: vectorized(df), 5)
+        print(_row(f'{n:,}', f'{t_old:.1f}', f'{t_new:.1f}', f'{t_old / t_new:.0f}x', width=13))
+
+
+
+@benchmark
+def bench_csv_projection():
+    """Reading a wide HR export: parse every column vs projected usecols + category dtypes."""
+    import tempfile
+    from utils.batch import read_roster
+    from utils.preprocess import preprocess_uploaded_csv
+
+    print(_row('rows', 'cols', 'full ms', 'proj ms', 'full MB', 'proj MB', width=10))
+    for n in (10_000, 100_000):
+        df  = synthetic_employees(n, seed=5)
+        rng = np.random.default_rng(5)
+        for i in range(60):   # export-only columns the models never use
+            df[f'Extra_{i}'] = rng.integers(0, 1000, n) if i % 2 else rng.choice(['a', 'bb', 'ccc'], n)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.csv')
+            df.to_csv(path, index=False)
+
+            full = pd.read_csv(path)
+            proj = read_roster(path)
+            assert preprocess_uploaded_csv(full).equals(preprocess_uploaded_csv(proj))
+            t_full = timed(lambda: preprocess_uploaded_csv(pd.read_csv(path)), 3)
+            t_proj = timed(lambda: preprocess_uploaded_csv(read_roster(path)), 3)
+            mb = lambda d: d.memory_usage(deep=True).sum() / 2**20
+            print(_row(f'{n:,}', df.shape[1], f'{t_full:.0f}', f'{t_proj:.0f}',
+                       f'{mb(full):.1f}', f'{mb(proj):.1f}', width=10))
+
+
+@benchmark
+def bench_input_formats():
+    """Reading a roster for batch scoring: CSV text parsing vs Parquet / Arrow IPC."""
+    import tempfile
+    import pyarrow.feather as feather
+    from utils.batch import read_roster
+    from utils.preprocess import preprocess_uploaded_csv
+
+    print(_row('rows', 'csv ms', 'parquet ms', 'arrow ms', width=12))
+    for n in (10_000, 100_000, 500_000):
+        df = synthetic_employees(n, seed=7)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {fmt: os.path.join(tmp, f'roster.{fmt}') for fmt in ('csv', 'parquet', 'arrow')}
+            df.to_csv(paths['csv'], index=False)
+            df.to_parquet(paths['parquet'], index=False)
+            feather.write_feather(df, paths['arrow'])
+
+            expected = preprocess_uploaded_csv(read_roster(paths['csv']))
+            times = []
+            for fmt, path in paths.items():
+                assert preprocess_uploaded_csv(read_roster(path)).equals(expected), fmt
+                times.append(timed(lambda: preprocess_uploaded_csv(read_roster(path)), 3))
+            print(_row(f'{n:,}', *(f'{t:.0f}' for t in times), width=12))
+
+
+@benchmark
+def bench_dedup():
+    """/api/batch scoring of stacked snapshots in 5,000-row chunks: every row vs distinct rows only."""
+    from utils.batch import iter_chunks, _scored_chunks
+    from utils.model_loader import load_all_models
+
+    # 5,000 distinct employees, each appearing 4 times (re-exported snapshots),
+    # one snapshot per chunk: only dedup across chunks finds the repeats
+    roster = pd.concat([synthetic_employees(5_000, seed=11)] * 4, ignore_index=True)
+
+    def scored(name, dedup):
+        chunks = list(_scored_chunks(iter_chunks(roster), name, dedup))
+        return (np.concatenate([probs for *_, probs in chunks]),
+                sum(res.attrs['dedup']['unique_rows'] for _, res, _ in chunks) if dedup else len(roster))
+
+    print(_row('model', 'all ms', 'dedup ms', 'ratio', width=20))
+    for name in load_all_models()[0]:
+        (full, _), (dedup, unique) = scored(name, False), scored(name, True)
+        assert np.array_equal(full, dedup)
+        t_full  = timed(lambda: scored(name, False), 3)
+        t_dedup = timed(lambda: scored(name, True), 3)
+        print(_row(name, f'{t_full:.0f}', f'{t_dedup:.0f}', f'{len(roster) / unique:.1f}', width=20))
+
+
+@benchmark
+def bench_compare_fanout():
+    """Compare page scoring: the four models one after another vs fanned out on threads."""
+    from utils import model_loader
+    from utils.model_loader import load_all_models, score_rows, fan_out
+    from utils.preprocess import preprocess_uploaded_csv
+
+    X      = preprocess_uploaded_csv(synthetic_employees(20_000, seed=12))
+    models = list(load_all_models()[0])
+    print(_row('model', 'ms', width=20))
+    for name in models:
+        print(_row(name, f'{timed(lambda: score_rows(X, name), 3):.0f}', width=20))
+
+    workers = model_loader.COMPARE_WORKERS
+    try:
+        model_loader.COMPARE_WORKERS = 1
+        t_seq = timed(lambda: fan_out(lambda m: score_rows(X, m), models), 3)
+    finally:
+        model_loader.COMPARE_WORKERS = workers
+    t_fan = timed(lambda: fan_out(lambda m: score_rows(X, m), models), 3)
+    print(_row('sequential', f'{t_seq:.0f}', width=20))
+    print(_row(f'fan-out ({workers} thr)', f'{t_fan:.0f}', width=20))
+
+
+@benchmark
+def bench_svm_engines():
+    """SVM engines at 10k / 100k / 1M training rows: exact RBF SVC vs NystroemSVC fit, scoring and AUC."""
+    from sklearn.metrics import roc_auc_score
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC
+    from utils.kernel_svm import NystroemSVC
+
+    exact_max = int(os.environ.get('EAPS_BENCH_SVC_MAX_ROWS', 10_000))   # SVC is O(n²)+ beyond
+
+    def labelled(n, seed):
+        X, y, p = labelled_employees(n, seed)
+        return X.to_numpy(dtype=np.float64), y, p
+
+    X_test, y_test, p_test = labelled(20_000, seed=99)
+    print(f"  test rows: 20,000   AUC of the true probabilities (ceiling): {roc_auc_score(y_test, p_test):.4f}")
+    print(_row('rows', 'engine', 'fit s', 'score ms', 'row ms', 'AUC', width=12))
+    exact_fit = None
+    for n in (10_000, 100_000, 1_000_000):
+        X, y, _ = labelled(n, seed=n)
+        scaler = StandardScaler().fit(X)
+        Xs, Xt = scaler.transform(X), scaler.transform(X_test)
+        engines = [('nystroem', NystroemSVC(class_weight='balanced', random_state=42))]
+        if n <= exact_max:
+            engines.insert(0, ('rbf', SVC(kernel='rbf', probability=True, random_state=42,
+                                          class_weight='balanced')))
+        for engine, clf in engines:
+            start = time.perf_counter()
+            clf.fit(Xs, y)
+            fit_s = time.perf_counter() - start
+            auc = roc_auc_score(y_test, clf.predict_proba(Xt)[:, 1])
+            score_ms = timed(lambda: clf.predict_proba(Xt), 3)
+            row_ms = timed(lambda: clf.predict_proba(Xt[:1]), 20)
+            print(_row(f'{n:,}', engine, f'{fit_s:.1f}', f'{score_ms:.0f}', f'{row_ms:.2f}',
+                       f'{auc:.4f}', width=12))
+            if engine == 'rbf':
+                exact_fit = (n, fit_s)
+        if n > exact_max and exact_fit:
+            est = exact_fit[1] * (n / exact_fit[0]) ** 2
+            print(_row(f'{n:,}', 'rbf', f'~{est:,.0f}', '', '', '(skipped, O(n²) est.)', width=12))
+
+
+@benchmark
+def bench_xgboost():
+    """XGBoost fit (300 fixed rounds vs hist + early stopping) and serving (sklearn wrapper vs inplace_predict)."""
+    from sklearn.base import clone
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from eaps_ml_pipeline import EARLY_STOPPING_SIZE, model_specs
+    from utils.model_loader import load_all_models
+    from utils.tree_engine import InplaceBooster
+
+    X_test, y_test, _ = labelled_employees(20_000, seed=99)
+    print(_row('rows', 'config', 'fit s', 'rounds', 'AUC', width=14))
+    for n in (10_000, 100_000):
+        X, y, _ = labelled_employees(n, seed=n)
+        spec = model_specs((y == 0).sum() / max(y.sum(), 1))['XGBoost'][0]
+        X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=EARLY_STOPPING_SIZE,
+                                                      random_state=42, stratify=y)
+        configs = [
+            ('exact, 300', clone(spec).set_params(tree_method='exact', early_stopping_rounds=None), False),
+            ('default, 300', clone(spec).set_params(tree_method=None, early_stopping_rounds=None), False),
+            ('hist + early', clone(spec), True),
+        ]
+        for label, clf, early in configs:
+            start = time.perf_counter()
+            if early:
+                clf.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            else:
+                clf.fit(X, y)
+            fit_s = time.perf_counter() - start
+            rounds = clf.best_iteration + 1 if early else clf.n_estimators
+            auc = roc_auc_score(y_test, clf.predict_proba(X_test)[:, 1])
+            print(_row(f'{n:,}', label, f'{fit_s:.2f}', rounds, f'{auc:.4f}', width=14))
+
+    model = load_all_models()[0].get('XGBoost')
+    if model is None:
+        print("  XGBoost: not available — skipped")
+        return
+    cpus = os.cpu_count() or 1
+    engines = [('sklearn', model.predict_proba), ('inplace 1 thr', InplaceBooster(model, 1).predict_proba)]
+    if cpus > 1:
+        engines.append((f'inplace {cpus} thr', InplaceBooster(model, cpus).predict_proba))
+    print(f"\n  served model, ms per batch (best of 5)")
+    print(_row('rows', *(label for label, _ in engines), 'max |Δp|', width=16))
+    for n in (1, 100, 5_000, 20_000):
+        X_df = X_test.head(n)
+        X_np = X_df.to_numpy(dtype=np.float64)
+        times = [timed(lambda: predict(X_df if label == 'sklearn' else X_np)) for label, predict in engines]
+        diff = np.abs(engines[0][1](X_df)[:, 1] - engines[1][1](X_np)[:, 1]).max()
+        print(_row(f'{n:,}', *(f'{t:.2f}' for t in times), f'{diff:.1e}', width=16))
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [s for s in selected if s not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {unknown}. Available: {list(BENCHMARKS)}")
+        sys.exit(1)
+    for name in selected:
+        print("=" * 65)
+        print(f"  {name}: {BENCHMARKS[name].__doc__}")
+        print("=" * 65)
+        BENCHMARKS[name]()
+        print()
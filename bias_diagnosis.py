@@ -29,10 +29,13 @@ from sklearn.metrics import (
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 
+from utils.model_registry import resolve_model_dir
+
 warnings.filterwarnings('ignore')
 
 BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR   = os.path.join(BASE_DIR, 'models')
+# Diagnose the published model version (flat models/ before the first one)
+MODEL_DIR   = resolve_model_dir(os.path.join(BASE_DIR, 'models'))[1]
 DATA_DIR    = os.path.join(BASE_DIR, 'data')
 RESULTS_DIR = os.path.join(BASE_DIR, 'results')
 os.makedirs(RESULTS_DIR, exist_ok=True)
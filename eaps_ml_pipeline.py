@@ -6,26 +6,53 @@ Full ML Training Pipeline — Supports IBM HR CSV + Custom CSVs
 
 Trains 4 models on your datasets:
   1. Logistic Regression
-  2. SVM (RBF kernel)
+  2. SVM (RBF kernel; Nystroem approximation above 20,000 training rows)
   3. Random Forest    (class_weight='balanced' + isotonic calibration)
-  4. XGBoost          (scale_pos_weight + isotonic calibration)
+  4. XGBoost          (scale_pos_weight + hist trees, early stopping on a
+                       validation slice + isotonic calibration)
+
+Calibration is prefit by default: the tree models are trained on 80% of the
+training rows and the isotonic map is fit on the other 20%, so the artifact
+holds one ensemble. --calibration=cv keeps the older CalibratedClassifierCV
+(cv=3) refits; --compare-calibration reports both (training time, artifact
+size, latency, Brier / AUC).
 
 Also saves:
   models/label_encoders.pkl   — for decoding at inference time
+  models/feature_plan.pkl     — aliases, encoders, defaults, column order (utils/feature_plan.py)
   models/feature_names.pkl    — exact column order
   models/best_model_name.pkl  — fastest model lookup in app
   models/threshold.pkl        — per-model optimal thresholds (Youden's J)
   models/class_ratio.pkl      — training class imbalance ratio
 
 Usage:
-    python eaps_ml_pipeline.py
+    python eaps_ml_pipeline.py [--no-cache] [--calibration=cv] [--svm=rbf|nystroem|auto]
+    python eaps_ml_pipeline.py --compare-calibration
+
+    from eaps_ml_pipeline import train
+    train(params={'XGBoost': {'max_depth': 6}})
 
 Outputs:
-    models/*.pkl      (8 model/meta files)
-    results/*.png     (7 plot files)
+    models/versions/<version>/*.pkl   (8 model/meta files + manifest.json)
+    models/CURRENT                    (points at the new version once complete)
+    results/*.png                     (7 plot files)
+
+Stages: load → normalise → encode → split → fit (per model) → calibrate
+(Random Forest, XGBoost) → evaluate (per model) → plot. Each stage's output
+is cached under models/.stage_cache/ by a hash of its inputs and parameters
+(utils/stage_cache.py), so a re-run only recomputes what changed: new data
+reruns everything, one model's hyperparameters only that model and the plots.
+
+The four models train concurrently in EAPS_TRAIN_WORKERS processes: the
+single-threaded LR / SVM fits get one core each and overlap RF / XGBoost,
+which share the remaining cores (thread_budgets); a timeline is printed.
+
+Each run is written to a staging directory and published atomically once
+every stage, the plots included, has succeeded (utils/model_registry.py);
+running servers pick it up without a restart.
 """
 
-import os, sys, warnings, joblib
+import io, os, sys, time, warnings, joblib
 import numpy as np
 import pandas as pd
 import matplotlib
@@ -33,7 +60,8 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
@@ -41,26 +69,27 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.calibration import CalibratedClassifierCV
 from xgboost import XGBClassifier
 from sklearn.metrics import (
-    accuracy_score, roc_auc_score, f1_score,
+    accuracy_score, roc_auc_score, f1_score, brier_score_loss,
     precision_score, recall_score, roc_curve, confusion_matrix,
     classification_report
 )
 
-warnings.filterwarnings('ignore')
+from utils import model_registry
+from utils.feature_plan import FeaturePlan
+from utils.kernel_svm import NystroemSVC
+from utils.stage_cache import StageCache, file_digest
 
 # ── Paths ─────────────────────────────────────────────────────────────────────
 BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR    = os.path.join(BASE_DIR, 'data')
-MODEL_DIR   = os.path.join(BASE_DIR, 'models')
+MODEL_ROOT  = os.path.join(BASE_DIR, 'models')
 RESULTS_DIR = os.path.join(BASE_DIR, 'results')
 
-os.makedirs(MODEL_DIR, exist_ok=True)
-os.makedirs(RESULTS_DIR, exist_ok=True)
-
-print("=" * 65)
-print("  EAPS ML Pipeline - Employee Attrition Prediction System")
-print("  [Debiased Version: class_weight + calibration + threshold]")
-print("=" * 65)
+DATASET_FILES = [
+    'WA_Fn-UseC_-HR-Employee-Attrition.csv',
+    'employee_attrition_dataset.csv',
+    'employee_attrition_dataset_10000.csv',
+]
 
 # ── 1. Column name normalisation map ─────────────────────────────────────────
 # Maps custom CSV column names → IBM-style column names
@@ -88,6 +117,17 @@ COLUMN_RENAME_MAP = {
     'Absenteeism':                 'PercentSalaryHike',
 }
 
+# Values filled in for columns a dataset does not have
+TRAINING_DEFAULTS = {
+    'BusinessTravel': 'Travel_Rarely',
+    'DailyRate': 800,
+    'Education': 3,
+    'EducationField': 'Other',
+    'StockOptionLevel': 0,
+    'PercentSalaryHike': 14,
+    'MonthlyRate': 14000,
+}
+
 TARGET_CANDIDATES = ['Attrition', 'attrition', 'ATTRITION']
 
 DROP_COLS = ['EmployeeCount', 'Over18', 'StandardHours', 'EmployeeNumber',
@@ -105,29 +145,66 @@ FINAL_FEATURES = [
 ]
 
 
+TEST_SIZE    = 0.2
+RANDOM_STATE = 42
+
+SCALED_MODELS     = ('Logistic Regression', 'SVM')     # trained on StandardScaler output
+CALIBRATED_MODELS = ('Random Forest', 'XGBoost')       # isotonic calibration on top
+
+# prefit: isotonic map fit on a held-out slice of the training rows (default)
+# cv:     CalibratedClassifierCV(cv=3), three refit ensembles in the artifact
+CALIBRATION_MODES = ('prefit', 'cv')
+CALIBRATION       = 'prefit'
+CALIBRATION_SIZE  = 0.2     # share of the training rows held out for prefit calibration
+LATENCY_REPEAT    = 20
+
+# SVM engine: exact RBF SVC, or NystroemSVC (utils/kernel_svm.py), whose fit is
+# linear in the rows; 'auto' switches above SVM_EXACT_MAX_ROWS training rows
+SVM_ENGINES        = ('rbf', 'nystroem', 'auto')
+SVM_ENGINE         = 'auto'
+SVM_EXACT_MAX_ROWS = 20_000
+
+# XGBoost grows histogram-binned trees and stops boosting once the logloss of
+# a validation slice of its fit rows has not improved for early_stopping_rounds
+# rounds (n_estimators is the cap); the trees kept are pinned as n_estimators
+EARLY_STOPPING_SIZE   = 0.15    # share of the fit rows XGBoost validates on
+EARLY_STOPPING_ROUNDS = 30
+
+# Models train concurrently in worker processes, each with a thread budget
+TRAIN_WORKERS   = int(os.environ.get('EAPS_TRAIN_WORKERS', min(4, os.cpu_count() or 1)))
+SINGLE_THREADED = ('Logistic Regression', 'SVM')    # lbfgs / libsvm fits use one core
+THREAD_PARAMS   = ('n_jobs', 'nthread')             # not part of a fit's cache key
+
+# Repo modules whose code runs inside stages; their source is part of every
+# stage key, like this module's own (utils/stage_cache.py)
+STAGE_CODE = ('utils.kernel_svm',)
+
+COLORS_MAP = {
+    'Logistic Regression': '#4f46e5',
+    'SVM':                 '#0891b2',
+    'Random Forest':       '#16a34a',
+    'XGBoost':             '#dc2626',
+}
+
+
 # ── 2. Load & normalise data ──────────────────────────────────────────────────
-def load_and_normalise(filepath: str) -> pd.DataFrame | None:
-    """Load a CSV and normalise its columns to IBM-style names."""
+def read_dataset(filepath: str) -> pd.DataFrame | None:
+    """Load one training CSV as is, or None if it is not there."""
     if not os.path.exists(filepath):
         return None
     df = pd.read_csv(filepath)
-    print(f"  Loaded {filepath.split(os.sep)[-1]}: {df.shape}")
+    print(f"  Loaded {os.path.basename(filepath)}: {df.shape}")
+    return df
+
 
-    df.rename(columns=COLUMN_RENAME_MAP, inplace=True)
+def normalise(df: pd.DataFrame) -> pd.DataFrame | None:
+    """Normalise a dataset's columns to IBM-style names and Attrition to 0/1."""
+    df = df.rename(columns=COLUMN_RENAME_MAP)
 
     if 'Overtime' in df.columns and 'OverTime' not in df.columns:
-        df.rename(columns={'Overtime': 'OverTime'}, inplace=True)
-
-    defaults = {
-        'BusinessTravel': 'Travel_Rarely',
-        'DailyRate': 800,
-        'Education': 3,
-        'EducationField': 'Other',
-        'StockOptionLevel': 0,
-        'PercentSalaryHike': 14,
-        'MonthlyRate': 14000,
-    }
-    for col, val in defaults.items():
+        df = df.rename(columns={'Overtime': 'OverTime'})
+
+    for col, val in TRAINING_DEFAULTS.items():
         if col not in df.columns:
             df[col] = val
 
@@ -144,7 +221,7 @@ def load_and_normalise(filepath: str) -> pd.DataFrame | None:
         lambda x: 1 if str(x).strip().lower() in ['yes', '1', 'true'] else 0
     )
     if target_col != 'Attrition':
-        df.drop(columns=[target_col], inplace=True)
+        df = df.drop(columns=[target_col])
 
     yes_count = df['Attrition'].sum()
     no_count  = (df['Attrition'] == 0).sum()
@@ -153,176 +230,255 @@ def load_and_normalise(filepath: str) -> pd.DataFrame | None:
     return df
 
 
-print("\n>> Loading datasets...")
-frames = []
-for fname in [
-    'WA_Fn-UseC_-HR-Employee-Attrition.csv',
-    'employee_attrition_dataset.csv',
-    'employee_attrition_dataset_10000.csv',
-]:
-    df_loaded = load_and_normalise(os.path.join(DATA_DIR, fname))
-    if df_loaded is not None:
-        frames.append(df_loaded)
+def combine(raw_frames: list) -> pd.DataFrame:
+    """Normalise every loaded dataset and stack them."""
+    frames = [normalise(df) for df in raw_frames if df is not None]
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        raise FileNotFoundError("No datasets found in data/ folder!")
+    return pd.concat(frames, ignore_index=True)
 
-if not frames:
-    print("\n❌ No datasets found in data/ folder!")
-    sys.exit(1)
 
-df = pd.concat(frames, ignore_index=True)
-print(f"\n[OK] Combined dataset: {df.shape[0]:,} rows x {df.shape[1]} columns")
+# ── 3. Preprocess ─────────────────────────────────────────────────────────────
+def encode(df: pd.DataFrame):
+    """
+    Reduce to FINAL_FEATURES + Attrition, fill gaps and label-encode the
+    categorical columns. Returns (encoded df, {column: LabelEncoder}).
+    """
+    df = df.drop(columns=[c for c in DROP_COLS if c in df.columns])
+
+    missing = [f for f in FINAL_FEATURES if f not in df.columns]
+    if missing:
+        print(f"   [WARN] Missing features (will use defaults): {missing}")
+        for m in missing:
+            df[m] = 0
+
+    df = df[FINAL_FEATURES + ['Attrition']].copy()
+    df = df.dropna(subset=['Attrition'])
+    df = df.ffill().fillna(0)
+
+    label_encoders = {}
+    categorical_cols = df.select_dtypes(include='object').columns.tolist()
+    categorical_cols = [c for c in categorical_cols if c != 'Attrition']
+
+    for col in categorical_cols:
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col].astype(str))
+        label_encoders[col] = le
+    return df, label_encoders
+
+
+# ── 4. Stratified Train/Test split + scaling for LR & SVM ─────────────────────
+def split(df: pd.DataFrame, test_size: float = TEST_SIZE,
+          random_state: int = RANDOM_STATE, calibration_size: float = CALIBRATION_SIZE,
+          early_stopping_size: float = EARLY_STOPPING_SIZE) -> dict:
+    """
+    Stratified train/test split, plus a scaler fit on the raw (unbalanced)
+    train rows, a stratified fit / calibration split of the train rows
+    for prefit calibration and a validation slice of the fit rows for
+    XGBoost's early stopping.
+    """
+    X = df[FINAL_FEATURES]
+    y = df['Attrition']
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+    X_fit, X_cal, y_fit, y_cal = train_test_split(
+        X_train, y_train, test_size=calibration_size, random_state=random_state, stratify=y_train
+    )
+    _, X_val, _, y_val = train_test_split(
+        X_fit, y_fit, test_size=early_stopping_size, random_state=random_state, stratify=y_fit
+    )
+    scaler = StandardScaler()
+    return {
+        'X_train':        X_train,
+        'X_test':         X_test,
+        'y_train':        y_train,
+        'y_test':         y_test,
+        'scaler':         scaler,
+        'X_train_scaled': scaler.fit_transform(X_train),
+        'X_test_scaled':  scaler.transform(X_test),
+        'X_fit':          X_fit,
+        'y_fit':          y_fit,
+        'X_cal':          X_cal,
+        'y_cal':          y_cal,
+        'X_val':          X_val,
+        'y_val':          y_val,
+    }
 
-total_yes = df['Attrition'].sum()
-total_no  = (df['Attrition'] == 0).sum()
-class_ratio = total_no / max(total_yes, 1)
-print(f"   Overall class ratio  No:Yes = {total_no}:{total_yes} = {class_ratio:.2f}:1")
 
-# ── 3. Preprocess ─────────────────────────────────────────────────────────────
-print("\n>> Preprocessing...")
-
-for col in DROP_COLS:
-    if col in df.columns:
-        df.drop(columns=[col], inplace=True)
-
-available = [f for f in FINAL_FEATURES if f in df.columns]
-missing   = [f for f in FINAL_FEATURES if f not in df.columns]
-if missing:
-    print(f"   [WARN] Missing features (will use defaults): {missing}")
-    for m in missing:
-        df[m] = 0
-
-df = df[FINAL_FEATURES + ['Attrition']].copy()
-df.dropna(subset=['Attrition'], inplace=True)
-df.fillna(method='ffill', inplace=True)
-df.fillna(0, inplace=True)
-
-print(f"   Features used: {len(FINAL_FEATURES)}")
-print(f"   Final shape:   {df.shape}")
-
-# Save feature names for app use
-joblib.dump(FINAL_FEATURES, os.path.join(MODEL_DIR, 'feature_names.pkl'))
-print("   Saved → models/feature_names.pkl")
-
-# Label-encode all object columns — save encoders for consistent inference
-label_encoders = {}
-categorical_cols = df.select_dtypes(include='object').columns.tolist()
-categorical_cols = [c for c in categorical_cols if c != 'Attrition']
-
-for col in categorical_cols:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col].astype(str))
-    label_encoders[col] = le
-
-joblib.dump(label_encoders, os.path.join(MODEL_DIR, 'label_encoders.pkl'))
-print(f"   Encoded {len(categorical_cols)} categorical columns")
-print("   Saved → models/label_encoders.pkl")
-
-# Save class ratio for scale_pos_weight
-joblib.dump(class_ratio, os.path.join(MODEL_DIR, 'class_ratio.pkl'))
-print(f"   Saved → models/class_ratio.pkl  (ratio={class_ratio:.2f})")
-
-# ── 4. Stratified Train/Test split ────────────────────────────────────────────
-X = df[FINAL_FEATURES]
-y = df['Attrition']
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-print(f"\n   Train: {len(X_train):,}  |  Test: {len(X_test):,}")
-train_dist = dict(zip(*np.unique(y_train, return_counts=True)))
-print(f"   Class balance (train — before balancing): {train_dist}")
-print(f"   No:Yes ratio = {train_dist.get(0,0)}:{train_dist.get(1,0)}")
-
-# ── 5. Scale for LR & SVM ───────────────────────────────────────────────────
-print("\n>> Fitting scaler on raw (unbalanced) train data...")
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled  = scaler.transform(X_test)
-joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
-print("   Saved → models/scaler.pkl")
-
-# ── 6. Class balance plot (no SMOTE — using class weights instead) ───────────
-fig, ax = plt.subplots(figsize=(6, 4))
-counts = y_train.value_counts().sort_index()
-ax.bar(['No (Stay)', 'Yes (Leave)'], counts.values,
-       color=['#4f46e5', '#dc2626'], alpha=0.85, edgecolor='white')
-ax.set_title('Training Class Distribution (class_weight handles imbalance)',
-             fontsize=12, fontweight='bold')
-ax.set_ylabel('Count')
-for i, v in enumerate(counts.values):
-    ax.text(i, v + 5, str(v), ha='center', fontweight='600')
-plt.tight_layout()
-plt.savefig(os.path.join(RESULTS_DIR, 'smote_class_balance.png'), dpi=150)
-plt.close()
-
-# ── 7. Train all models ───────────────────────────────────────────────────────
-print("\n>> Training models (with bias mitigations)...\n")
-
-# XGBoost scale_pos_weight automatically handles imbalance
-xgb_spw = min(class_ratio, 10.0)  # cap at 10 to avoid over-correction
-
-MODEL_CONFIGS = {
-    'Logistic Regression': (
-        LogisticRegression(max_iter=2000, random_state=42, C=1.0,
-                           class_weight='balanced'),
-        X_train_scaled, X_test_scaled, X_train, 'logistic_regression.pkl'
-    ),
-    'SVM': (
-        SVC(kernel='rbf', C=1.0, gamma='scale', probability=True,
-            random_state=42, class_weight='balanced'),
-        X_train_scaled, X_test_scaled, X_train, 'svm.pkl'
-    ),
-    'Random Forest': (
-        RandomForestClassifier(
-            n_estimators=300,
-            max_depth=12,
-            min_samples_leaf=4,
-            min_samples_split=10,
-            class_weight='balanced_subsample',
-            random_state=42,
-            n_jobs=-1,
+def _inputs(name: str, data: dict, part: str):
+    """The (scaled for LR / SVM) train or test matrix of a model."""
+    return data[f'X_{part}_scaled' if name in SCALED_MODELS else f'X_{part}']
+
+
+# ── 5. Models ─────────────────────────────────────────────────────────────────
+def resolve_svm_engine(svm_engine: str, n_train: int) -> str:
+    """'rbf' or 'nystroem' for a training split of n_train rows."""
+    if svm_engine not in SVM_ENGINES:
+        raise ValueError(f'Unknown SVM engine "{svm_engine}". Choose from {SVM_ENGINES}.')
+    if svm_engine == 'auto':
+        return 'nystroem' if n_train > SVM_EXACT_MAX_ROWS else 'rbf'
+    return svm_engine
+
+
+def model_specs(class_ratio: float, params: dict = None, svm_engine: str = 'rbf') -> dict:
+    """
+    {model name: (unfitted estimator, artifact file name)}, in training order.
+    params overrides hyperparameters per model, e.g. {'SVM': {'C': 2.0}};
+    svm_engine is 'rbf' (exact SVC) or 'nystroem' (NystroemSVC).
+    """
+    # XGBoost scale_pos_weight automatically handles imbalance
+    xgb_spw = min(class_ratio, 10.0)  # cap at 10 to avoid over-correction
+
+    specs = {
+        'Logistic Regression': (
+            LogisticRegression(max_iter=2000, random_state=42, C=1.0,
+                               class_weight='balanced'),
+            'logistic_regression.pkl'
         ),
-        X_train, X_test, X_train, 'random_forest.pkl'
-    ),
-    'XGBoost': (
-        XGBClassifier(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=5,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            scale_pos_weight=xgb_spw,
-            use_label_encoder=False,
-            eval_metric='logloss',
-            random_state=42,
-            n_jobs=-1,
-            verbosity=0,
+        'SVM': (
+            SVC(kernel='rbf', C=1.0, gamma='scale', probability=True,
+                random_state=42, class_weight='balanced')
+            if svm_engine == 'rbf' else
+            NystroemSVC(C=1.0, gamma='scale', random_state=42, class_weight='balanced'),
+            'svm.pkl'
         ),
-        X_train, X_test, X_train, 'xgboost.pkl'
-    ),
-}
+        'Random Forest': (
+            RandomForestClassifier(
+                n_estimators=300,
+                max_depth=12,
+                min_samples_leaf=4,
+                min_samples_split=10,
+                class_weight='balanced_subsample',
+                random_state=42,
+                n_jobs=-1,
+            ),
+            'random_forest.pkl'
+        ),
+        'XGBoost': (
+            XGBClassifier(
+                n_estimators=300,
+                learning_rate=0.05,
+                max_depth=5,
+                subsample=0.8,
+                colsample_bytree=0.8,
+                scale_pos_weight=xgb_spw,
+                tree_method='hist',
+                early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                use_label_encoder=False,
+                eval_metric='logloss',
+                random_state=42,
+                n_jobs=-1,
+                verbosity=0,
+            ),
+            'xgboost.pkl'
+        ),
+    }
+    for name, overrides in (params or {}).items():
+        if name not in specs:
+            raise ValueError(f'Unknown model "{name}". Choose from {list(specs)}.')
+        specs[name][0].set_params(**overrides)
+    return specs
 
-RESULTS  = {}
-trained  = {}
-thresholds = {}
 
-for name, (clf, Xtr, Xte, Xtr_raw, fname) in MODEL_CONFIGS.items():
-    print(f"  ▶ Training {name}...")
+def fit_model(name: str, clf, data: dict, calibration: str = CALIBRATION):
+    """Train a base model; with prefit calibration the tree models leave the calibration slice out."""
+    if name in CALIBRATED_MODELS and calibration == 'prefit':
+        X, y = data['X_fit'], data['y_fit']
+    else:
+        X, y = _inputs(name, data, 'train'), data['y_train']
+    if getattr(clf, 'early_stopping_rounds', None):
+        return _fit_early_stopped(clf, X, y, data)
+    return clf.fit(X, y)
+
+
+def _fit_early_stopped(clf, X, y, data: dict):
+    """
+    Boost on X without the validation slice until the slice's logloss stops
+    improving, then pin n_estimators to the rounds kept: predictions use
+    exactly those trees and cv calibration refits that many without an
+    eval set.
+    """
+    held_out = X.index.isin(data['X_val'].index)
+    clf.fit(X[~held_out], y[~held_out], eval_set=[(data['X_val'], data['y_val'])], verbose=False)
+    return clf.set_params(n_estimators=clf.best_iteration + 1, early_stopping_rounds=None)
+
+
+def boosted_rounds(model):
+    """Boosting rounds an XGBoost model (or calibrated XGBoost) predicts with."""
+    from utils.calibrated_shap import calibrated_folds
+    base = calibrated_folds(model)[0][0] if hasattr(model, 'calibrated_classifiers_') else model
+    return int(base.get_params()['n_estimators'])
+
+
+def _prefit_calibrator(clf):
+    """Isotonic CalibratedClassifierCV over an already fitted model."""
+    try:
+        from sklearn.frozen import FrozenEstimator      # scikit-learn >= 1.6
+    except ImportError:
+        return CalibratedClassifierCV(clf, method='isotonic', cv='prefit')
+    return CalibratedClassifierCV(FrozenEstimator(clf), method='isotonic')
+
+
+def calibrate(name: str, clf, data: dict, calibration: str = CALIBRATION):
+    """
+    Isotonic probability calibration (tree models). Skipped for LR — it's
+    already well-calibrated via the logistic link.
+      prefit  maps the trained model's probabilities on the held-out
+              calibration slice: the artifact holds that one ensemble
+      cv      cv=3 refits three clones of the model on training folds and
+              averages them; the fitted base model is only kept as
+              .estimator (feature importances)
+    """
+    if calibration == 'prefit':
+        return _prefit_calibrator(clf).fit(data['X_cal'], data['y_cal'])
+    calibrated = CalibratedClassifierCV(clf, method='isotonic', cv=3)
+    return calibrated.fit(_inputs(name, data, 'train'), data['y_train'])
+
+
+def calibration_stats(name: str, clf, data: dict, train_s: float) -> dict:
+    """Training time, artifact size, inference latency and test Brier / AUC of a calibrated model."""
+    X_test = _inputs(name, data, 'test')
+    buf = io.BytesIO()
+    joblib.dump(clf, buf)
+
+    row = X_test[:1]
+    clf.predict_proba(row)                  # warm-up
+    start = time.perf_counter()
+    for _ in range(LATENCY_REPEAT):
+        clf.predict_proba(row)
+    row_ms = (time.perf_counter() - start) / LATENCY_REPEAT * 1000
+
+    start = time.perf_counter()
+    y_proba = clf.predict_proba(X_test)[:, 1]
+    test_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'train_s':     round(train_s, 2),
+        'artifact_mb': round(buf.tell() / 2**20, 2),
+        'row_ms':      round(row_ms, 2),
+        'test_set_ms': round(test_ms, 1),
+        'brier':       round(brier_score_loss(data['y_test'], y_proba), 4),
+        'auc':         round(roc_auc_score(data['y_test'], y_proba), 4),
+    }
 
-    # Train base model
-    clf.fit(Xtr, y_train)
 
-    # ── Isotonic probability calibration (tree/SVM) ────────────────────────
-    # Skip calibration for LR — it's already well-calibrated via logistic link
-    if name in ('Random Forest', 'XGBoost'):
-        print(f"    Calibrating probabilities (isotonic)...")
-        calibrated = CalibratedClassifierCV(clf, method='isotonic', cv=3)
-        calibrated.fit(Xtr, y_train)
-        clf_final = calibrated
-    else:
-        clf_final = clf
+def _print_calibration(report: dict):
+    """Table of calibration_stats per mode and model."""
+    print(f"   {'model':<15}{'mode':<8}{'train s':>9}{'MB':>8}{'row ms':>9}"
+          f"{'test ms':>9}{'Brier':>8}{'AUC':>8}")
+    for mode, by_model in report.items():
+        for name, st in by_model.items():
+            print(f"   {name:<15}{mode:<8}{st['train_s']:>9}{st['artifact_mb']:>8}"
+                  f"{st['row_ms']:>9}{st['test_set_ms']:>9}{st['brier']:>8}{st['auc']:>8}")
 
-    # Predict probabilities on test set
-    y_proba = clf_final.predict_proba(Xte)[:, 1]
+
+def evaluate(name: str, clf, data: dict) -> dict:
+    """Test-set probabilities, Youden's J threshold and metrics of one model."""
+    y_test  = data['y_test']
+    y_proba = clf.predict_proba(_inputs(name, data, 'test'))[:, 1]
 
     # ── Find optimal threshold via Youden's J ─────────────────────────────
     fpr, tpr, thresh_vals = roc_curve(y_test, y_proba)
@@ -330,27 +486,32 @@ for name, (clf, Xtr, Xte, Xtr_raw, fname) in MODEL_CONFIGS.items():
     best_idx  = np.argmax(j_scores)
     opt_thresh = float(thresh_vals[best_idx])
     opt_thresh = round(max(0.20, min(0.65, opt_thresh)), 4)  # clamp to sane range
-    thresholds[name] = opt_thresh
 
     # Use optimal threshold for predictions
     y_pred = (y_proba >= opt_thresh).astype(int)
 
-    RESULTS[name] = {
-        'Accuracy':   round(accuracy_score(y_test, y_pred), 4),
-        'AUC-ROC':    round(roc_auc_score(y_test, y_proba), 4),
-        'F1':         round(f1_score(y_test, y_pred, zero_division=0), 4),
-        'Precision':  round(precision_score(y_test, y_pred, zero_division=0), 4),
-        'Recall':     round(recall_score(y_test, y_pred, zero_division=0), 4),
-        'Threshold':  opt_thresh,
+    return {
+        'proba':     y_proba,
+        'threshold': opt_thresh,
+        'metrics': {
+            'Accuracy':   round(accuracy_score(y_test, y_pred), 4),
+            'AUC-ROC':    round(roc_auc_score(y_test, y_proba), 4),
+            'F1':         round(f1_score(y_test, y_pred, zero_division=0), 4),
+            'Precision':  round(precision_score(y_test, y_pred, zero_division=0), 4),
+            'Recall':     round(recall_score(y_test, y_pred, zero_division=0), 4),
+            'Threshold':  opt_thresh,
+        },
     }
-    trained[name] = (clf_final, Xte, y_proba)
-    joblib.dump(clf_final, os.path.join(MODEL_DIR, fname))
 
-    r = RESULTS[name]
-    print(f"    Threshold={opt_thresh}  Acc={r['Accuracy']}  AUC={r['AUC-ROC']}  "
+
+def _report(name: str, ev: dict):
+    """Console metrics and bias check of an evaluated model."""
+    r = ev['metrics']
+    print(f"    Threshold={ev['threshold']}  Acc={r['Accuracy']}  AUC={r['AUC-ROC']}  "
           f"F1={r['F1']}  Prec={r['Precision']}  Rec={r['Recall']}")
 
     # ── Bias check ────────────────────────────────────────────────────────
+    y_pred  = (ev['proba'] >= ev['threshold']).astype(int)
     n_leave = int(y_pred.sum())
     n_stay  = len(y_pred) - n_leave
     pct_leave = 100 * n_leave / max(len(y_pred), 1)
@@ -363,180 +524,492 @@ for name, (clf, Xtr, Xte, Xtr_raw, fname) in MODEL_CONFIGS.items():
     else:
         print(f"    [OK]  Prediction distribution looks healthy")
 
-    print(f"    Saved → models/{fname}")
-
-# Save thresholds and best model name
-joblib.dump(thresholds, os.path.join(MODEL_DIR, 'threshold.pkl'))
-print(f"\n   Saved → models/threshold.pkl  {thresholds}")
-
-best_model = max(RESULTS, key=lambda m: RESULTS[m]['AUC-ROC'])
-joblib.dump(best_model, os.path.join(MODEL_DIR, 'best_model_name.pkl'))
-
-# ── 8. Results summary ────────────────────────────────────────────────────────
-print("\n" + "=" * 65)
-print("  FINAL RESULTS SUMMARY")
-print("=" * 65)
-
-df_results = pd.DataFrame(RESULTS).T
-print(df_results.to_string())
-print(f"\n[BEST] Best model: {best_model} (AUC-ROC={RESULTS[best_model]['AUC-ROC']})")
-
-# ── 9. Classification reports ─────────────────────────────────────────────────
-print("\n>> Classification Reports (with optimal thresholds):\n")
-for name, (clf_final, Xte, y_proba) in trained.items():
-    thresh = thresholds[name]
-    y_pred = (y_proba >= thresh).astype(int)
-    print(f"  [{name}]  threshold={thresh}")
-    print(classification_report(y_test, y_pred,
-                                 target_names=['Stay (0)', 'Leave (1)'],
-                                 zero_division=0))
-
-# ── 10. ROC curves ────────────────────────────────────────────────────────────
-print("\n>> Generating plots...")
-colors_map = {
-    'Logistic Regression': '#4f46e5',
-    'SVM':                 '#0891b2',
-    'Random Forest':       '#16a34a',
-    'XGBoost':             '#dc2626',
-}
 
-fig, ax = plt.subplots(figsize=(8, 6))
-for name, (clf_final, Xte, y_proba) in trained.items():
-    fpr, tpr, _ = roc_curve(y_test, y_proba)
-    auc = RESULTS[name]['AUC-ROC']
-    ax.plot(fpr, tpr, color=colors_map[name], lw=2.5,
-            label=f'{name} (AUC={auc})')
-ax.plot([0, 1], [0, 1], 'k--', lw=1, alpha=0.5)
-ax.set_xlabel('False Positive Rate', fontsize=12)
-ax.set_ylabel('True Positive Rate', fontsize=12)
-ax.set_title('ROC Curves — All Models', fontsize=14, fontweight='bold')
-ax.legend(loc='lower right', fontsize=10, framealpha=0.9)
-ax.grid(alpha=0.3)
-plt.tight_layout()
-plt.savefig(os.path.join(RESULTS_DIR, 'roc_curves.png'), dpi=150)
-plt.close()
-print("   Saved → results/roc_curves.png")
-
-# ── 11. Confusion matrices ────────────────────────────────────────────────────
-fig, axes = plt.subplots(1, 4, figsize=(18, 4))
-for ax, (name, (clf_final, Xte, y_proba)) in zip(axes, trained.items()):
-    thresh = thresholds[name]
-    y_pred = (y_proba >= thresh).astype(int)
-    cm = confusion_matrix(y_test, y_pred)
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax,
-                xticklabels=['Stay', 'Leave'], yticklabels=['Stay', 'Leave'],
-                annot_kws={'size': 13})
-    ax.set_title(f'{name}\n(thresh={thresh})', fontsize=10, fontweight='bold')
-    ax.set_xlabel('Predicted')
-    ax.set_ylabel('Actual')
-plt.suptitle('Confusion Matrices — Optimal Thresholds', fontsize=13,
-             fontweight='bold', y=1.02)
-plt.tight_layout()
-plt.savefig(os.path.join(RESULTS_DIR, 'confusion_matrices.png'),
-            dpi=150, bbox_inches='tight')
-plt.close()
-print("   Saved → results/confusion_matrices.png")
-
-# ── 12. Model comparison bar chart ───────────────────────────────────────────
-df_bar   = pd.DataFrame(RESULTS).T.reset_index().rename(columns={'index': 'Model'})
-metrics  = ['Accuracy', 'AUC-ROC', 'F1', 'Precision', 'Recall']
-m_colors = ['#4f46e5', '#0891b2', '#16a34a', '#dc2626', '#d97706']
-
-fig, ax = plt.subplots(figsize=(13, 5))
-model_names = list(RESULTS.keys())
-x = np.arange(len(model_names))
-width = 0.15
-
-for i, (metric, color) in enumerate(zip(metrics, m_colors)):
-    vals = [RESULTS[m][metric] for m in model_names]
-    bars = ax.bar(x + i * width, vals, width, label=metric,
-                  color=color, alpha=0.85, edgecolor='white')
-    for bar in bars:
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.003,
-                f'{bar.get_height():.3f}', ha='center', va='bottom',
-                fontsize=7, fontweight='600')
-
-ax.set_xlabel('Model', fontsize=12)
-ax.set_ylabel('Score', fontsize=12)
-ax.set_title('Model Comparison — All Metrics (Debiased)', fontsize=14, fontweight='bold')
-ax.set_xticks(x + width * 2)
-ax.set_xticklabels(model_names, fontsize=11)
-ax.set_ylim(0.4, 1.08)
-ax.legend(fontsize=10, loc='lower right')
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig(os.path.join(RESULTS_DIR, 'model_comparison.png'), dpi=150)
-plt.close()
-print("   Saved → results/model_comparison.png")
-
-# ── 13. Probability distribution plot ────────────────────────────────────────
-fig, axes = plt.subplots(2, 2, figsize=(12, 8))
-axes = axes.flatten()
-for idx, (name, (clf_final, Xte, y_proba)) in enumerate(trained.items()):
-    thresh = thresholds[name]
-    ax = axes[idx]
-    ax.hist(y_proba[y_test == 0], bins=40, alpha=0.7, color='#4f46e5',
-            label='Actual Stay', density=True)
-    ax.hist(y_proba[y_test == 1], bins=40, alpha=0.7, color='#dc2626',
-            label='Actual Leave', density=True)
-    ax.axvline(thresh, color='black', linestyle='--', lw=2,
-               label=f'Threshold={thresh}')
-    ax.set_title(f'{name}', fontsize=11, fontweight='bold')
-    ax.set_xlabel('Predicted Probability')
-    ax.set_ylabel('Density')
-    ax.legend(fontsize=9)
+# ── 6. Plots ──────────────────────────────────────────────────────────────────
+def _png(fig, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150, **kwargs)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def plot(data: dict, models: dict, evals: dict) -> dict:
+    """Render the result plots; {file name under results/: PNG bytes}."""
+    y_train, y_test = data['y_train'], data['y_test']
+    pngs = {}
+
+    # Class balance plot (no SMOTE — using class weights instead)
+    fig, ax = plt.subplots(figsize=(6, 4))
+    counts = y_train.value_counts().sort_index()
+    ax.bar(['No (Stay)', 'Yes (Leave)'], counts.values,
+           color=['#4f46e5', '#dc2626'], alpha=0.85, edgecolor='white')
+    ax.set_title('Training Class Distribution (class_weight handles imbalance)',
+                 fontsize=12, fontweight='bold')
+    ax.set_ylabel('Count')
+    for i, v in enumerate(counts.values):
+        ax.text(i, v + 5, str(v), ha='center', fontweight='600')
+    plt.tight_layout()
+    pngs['smote_class_balance.png'] = _png(fig)
+
+    # ROC curves
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for name, ev in evals.items():
+        fpr, tpr, _ = roc_curve(y_test, ev['proba'])
+        auc = ev['metrics']['AUC-ROC']
+        ax.plot(fpr, tpr, color=COLORS_MAP[name], lw=2.5,
+                label=f'{name} (AUC={auc})')
+    ax.plot([0, 1], [0, 1], 'k--', lw=1, alpha=0.5)
+    ax.set_xlabel('False Positive Rate', fontsize=12)
+    ax.set_ylabel('True Positive Rate', fontsize=12)
+    ax.set_title('ROC Curves — All Models', fontsize=14, fontweight='bold')
+    ax.legend(loc='lower right', fontsize=10, framealpha=0.9)
     ax.grid(alpha=0.3)
-plt.suptitle('Probability Distributions — Stay vs Leave', fontsize=13,
-             fontweight='bold')
-plt.tight_layout()
-plt.savefig(os.path.join(RESULTS_DIR, 'probability_distributions.png'), dpi=150)
-plt.close()
-print("   Saved → results/probability_distributions.png")
-
-# ── 14. Feature importance plots ─────────────────────────────────────────────
-for mname, fsuffix in [('Random Forest', 'random_forest'), ('XGBoost', 'xgboost')]:
-    clf_final = trained[mname][0]
-    # CalibratedClassifierCV wraps the base estimator
-    base_clf = clf_final.estimator if hasattr(clf_final, 'estimator') else clf_final
-    if hasattr(base_clf, 'calibrated_classifiers_'):
-        # Get importances from the first fold's base estimator
-        base_clf = base_clf.calibrated_classifiers_[0].estimator
-
-    if not hasattr(base_clf, 'feature_importances_'):
-        print(f"   [WARN] {mname}: feature importances not available after calibration")
-        continue
-
-    imp = pd.Series(base_clf.feature_importances_, index=FINAL_FEATURES)
-    imp = imp.sort_values(ascending=True)
-
-    fig, ax = plt.subplots(figsize=(9, 6))
-    colors_feat = ['#dc2626' if v > imp.median() else '#4f46e5' for v in imp.values]
-    ax.barh(imp.index, imp.values, color=colors_feat, edgecolor='none', alpha=0.85)
-    ax.set_xlabel('Feature Importance', fontsize=12)
-    ax.set_title(f'{mname} — Feature Importances ({len(FINAL_FEATURES)} features)',
-                 fontsize=13, fontweight='bold')
-    ax.axvline(imp.median(), color='gray', linestyle='--', lw=1, alpha=0.7,
-               label='Median')
-    ax.legend(fontsize=10)
-    ax.grid(axis='x', alpha=0.3)
     plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, f'feature_importance_{fsuffix}.png'), dpi=150)
-    plt.close()
-    print(f"   Saved → results/feature_importance_{fsuffix}.png")
-
-# ── Done ──────────────────────────────────────────────────────────────────────
-print("\n" + "=" * 65)
-print("  [DONE] Pipeline complete!")
-print(f"  [BEST] Best model: {best_model} (AUC={RESULTS[best_model]['AUC-ROC']})")
-print("\n  Files saved:")
-print("  models/ -> random_forest.pkl  xgboost.pkl  logistic_regression.pkl")
-print("            svm.pkl  scaler.pkl  label_encoders.pkl")
-print("            feature_names.pkl  best_model_name.pkl")
-print("            threshold.pkl  class_ratio.pkl")
-print("  results/ -> roc_curves.png  confusion_matrices.png")
-print("             model_comparison.png  feature_importance_*.png")
-print("             probability_distributions.png")
-print("             smote_class_balance.png")
-print("\n  Launch the app:")
-print("    python flask_app/server.py")
-print("=" * 65)
+    pngs['roc_curves.png'] = _png(fig)
+
+    # Confusion matrices
+    fig, axes = plt.subplots(1, 4, figsize=(18, 4))
+    for ax, (name, ev) in zip(axes, evals.items()):
+        thresh = ev['threshold']
+        y_pred = (ev['proba'] >= thresh).astype(int)
+        cm = confusion_matrix(y_test, y_pred)
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax,
+                    xticklabels=['Stay', 'Leave'], yticklabels=['Stay', 'Leave'],
+                    annot_kws={'size': 13})
+        ax.set_title(f'{name}\n(thresh={thresh})', fontsize=10, fontweight='bold')
+        ax.set_xlabel('Predicted')
+        ax.set_ylabel('Actual')
+    plt.suptitle('Confusion Matrices — Optimal Thresholds', fontsize=13,
+                 fontweight='bold', y=1.02)
+    plt.tight_layout()
+    pngs['confusion_matrices.png'] = _png(fig, bbox_inches='tight')
+
+    # Model comparison bar chart
+    metrics  = ['Accuracy', 'AUC-ROC', 'F1', 'Precision', 'Recall']
+    m_colors = ['#4f46e5', '#0891b2', '#16a34a', '#dc2626', '#d97706']
+
+    fig, ax = plt.subplots(figsize=(13, 5))
+    model_names = list(evals.keys())
+    x = np.arange(len(model_names))
+    width = 0.15
+
+    for i, (metric, color) in enumerate(zip(metrics, m_colors)):
+        vals = [evals[m]['metrics'][metric] for m in model_names]
+        bars = ax.bar(x + i * width, vals, width, label=metric,
+                      color=color, alpha=0.85, edgecolor='white')
+        for bar in bars:
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.003,
+                    f'{bar.get_height():.3f}', ha='center', va='bottom',
+                    fontsize=7, fontweight='600')
+
+    ax.set_xlabel('Model', fontsize=12)
+    ax.set_ylabel('Score', fontsize=12)
+    ax.set_title('Model Comparison — All Metrics (Debiased)', fontsize=14, fontweight='bold')
+    ax.set_xticks(x + width * 2)
+    ax.set_xticklabels(model_names, fontsize=11)
+    ax.set_ylim(0.4, 1.08)
+    ax.legend(fontsize=10, loc='lower right')
+    ax.grid(axis='y', alpha=0.3)
+    plt.tight_layout()
+    pngs['model_comparison.png'] = _png(fig)
+
+    # Probability distribution plot
+    fig, axes = plt.subplots(2, 2, figsize=(12, 8))
+    axes = axes.flatten()
+    for idx, (name, ev) in enumerate(evals.items()):
+        thresh, y_proba = ev['threshold'], ev['proba']
+        ax = axes[idx]
+        ax.hist(y_proba[y_test == 0], bins=40, alpha=0.7, color='#4f46e5',
+                label='Actual Stay', density=True)
+        ax.hist(y_proba[y_test == 1], bins=40, alpha=0.7, color='#dc2626',
+                label='Actual Leave', density=True)
+        ax.axvline(thresh, color='black', linestyle='--', lw=2,
+                   label=f'Threshold={thresh}')
+        ax.set_title(f'{name}', fontsize=11, fontweight='bold')
+        ax.set_xlabel('Predicted Probability')
+        ax.set_ylabel('Density')
+        ax.legend(fontsize=9)
+        ax.grid(alpha=0.3)
+    plt.suptitle('Probability Distributions — Stay vs Leave', fontsize=13,
+                 fontweight='bold')
+    plt.tight_layout()
+    pngs['probability_distributions.png'] = _png(fig)
+
+    # Feature importance plots
+    for mname, fsuffix in [('Random Forest', 'random_forest'), ('XGBoost', 'xgboost')]:
+        clf_final = models[mname]
+        # CalibratedClassifierCV wraps the base estimator
+        base_clf = clf_final.estimator if hasattr(clf_final, 'estimator') else clf_final
+        if hasattr(base_clf, 'calibrated_classifiers_'):
+            # Get importances from the first fold's base estimator
+            base_clf = base_clf.calibrated_classifiers_[0].estimator
+
+        if not hasattr(base_clf, 'feature_importances_'):
+            print(f"   [WARN] {mname}: feature importances not available after calibration")
+            continue
+
+        imp = pd.Series(base_clf.feature_importances_, index=FINAL_FEATURES)
+        imp = imp.sort_values(ascending=True)
+
+        fig, ax = plt.subplots(figsize=(9, 6))
+        colors_feat = ['#dc2626' if v > imp.median() else '#4f46e5' for v in imp.values]
+        ax.barh(imp.index, imp.values, color=colors_feat, edgecolor='none', alpha=0.85)
+        ax.set_xlabel('Feature Importance', fontsize=12)
+        ax.set_title(f'{mname} — Feature Importances ({len(FINAL_FEATURES)} features)',
+                     fontsize=13, fontweight='bold')
+        ax.axvline(imp.median(), color='gray', linestyle='--', lw=1, alpha=0.7,
+                   label='Median')
+        ax.legend(fontsize=10)
+        ax.grid(axis='x', alpha=0.3)
+        plt.tight_layout()
+        pngs[f'feature_importance_{fsuffix}.png'] = _png(fig)
+
+    return pngs
+
+
+# ── 7. Pipeline ───────────────────────────────────────────────────────────────
+def train(data_files: list = None, params: dict = None, model_root: str = MODEL_ROOT,
+          results_dir: str = RESULTS_DIR, cache: bool = True, cache_dir: str = None,
+          calibration: str = CALIBRATION, workers: int = TRAIN_WORKERS,
+          svm_engine: str = SVM_ENGINE) -> dict:
+    """
+    Run every stage, write the plots and publish the models as a new version.
+
+    data_files defaults to DATASET_FILES under data/ (missing ones are
+    skipped); params overrides model hyperparameters (see model_specs);
+    calibration is one of CALIBRATION_MODES and svm_engine of SVM_ENGINES;
+    models train on up to workers processes at once. With cache, stage outputs are reused from cache_dir
+    (default <model_root>/.stage_cache) when their inputs are unchanged.
+
+    Returns {'version', 'best_model', 'results', 'thresholds', 'calibration',
+    'timeline', 'stages': {'cached': [...], 'run': [...]}}.
+    """
+    if calibration not in CALIBRATION_MODES:
+        raise ValueError(f'Unknown calibration "{calibration}". Choose from {CALIBRATION_MODES}.')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return _train(data_files, params, model_root, results_dir, cache, cache_dir,
+                      calibration, workers, svm_engine)
+
+
+def compare_calibration(data_files: list = None, params: dict = None, model_root: str = MODEL_ROOT,
+                        cache: bool = True, cache_dir: str = None,
+                        workers: int = TRAIN_WORKERS) -> dict:
+    """
+    Fit the calibrated models in every CALIBRATION_MODES on the same split
+    and report {mode: {model: calibration_stats}}. Publishes nothing; stages
+    are shared with train() through the stage cache.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        stages = _stage_cache(model_root, cache, cache_dir)
+        class_ratio, _, data, split_key = _prepare(stages, data_files)
+        specs  = model_specs(class_ratio, params)
+        specs  = {name: specs[name] for name in CALIBRATED_MODELS}
+        report = {}
+        for mode in CALIBRATION_MODES:
+            print(f"\n>> Calibration: {mode}\n")
+            models, _, _, _ = _fit_models(stages, specs, data, split_key, mode, workers)
+            report[mode] = {name: calibration_stats(name, models[name], data, _train_seconds(stages, name))
+                            for name in specs}
+    print("\n>> Calibration comparison (test split)\n")
+    _print_calibration(report)
+    return report
+
+
+def _stage_cache(model_root, cache, cache_dir) -> StageCache:
+    return StageCache(cache_dir or os.path.join(model_root, '.stage_cache'), enabled=cache,
+                      code=STAGE_CODE)
+
+
+def _train_seconds(stages: StageCache, name: str) -> float:
+    """Compute time of a model's fit and calibrate stages."""
+    return stages.seconds[f'fit {name}'] + stages.seconds.get(f'calibrate {name}', 0.0)
+
+
+def _prepare(stages: StageCache, data_files):
+    """load → normalise → encode → split. Returns (class_ratio, label_encoders, data, split key)."""
+    if data_files is None:
+        data_files = [os.path.join(DATA_DIR, fname) for fname in DATASET_FILES]
+
+    # ── Load & normalise ──────────────────────────────────────────────────
+    print("\n>> Loading datasets...")
+    raw, key = stages.run('load', [file_digest(path) for path in data_files],
+                          lambda: [read_dataset(path) for path in data_files])
+    df, key = stages.run('normalise', [key, COLUMN_RENAME_MAP, TRAINING_DEFAULTS,
+                                       TARGET_CANDIDATES], combine, raw)
+    print(f"\n[OK] Combined dataset: {df.shape[0]:,} rows x {df.shape[1]} columns")
+
+    total_yes = df['Attrition'].sum()
+    total_no  = (df['Attrition'] == 0).sum()
+    class_ratio = total_no / max(total_yes, 1)
+    print(f"   Overall class ratio  No:Yes = {total_no}:{total_yes} = {class_ratio:.2f}:1")
+
+    # ── Encode & split ────────────────────────────────────────────────────
+    print("\n>> Preprocessing...")
+    (df, label_encoders), key = stages.run('encode', [key, FINAL_FEATURES, DROP_COLS],
+                                           encode, df)
+    print(f"   Features used: {len(FINAL_FEATURES)}")
+    print(f"   Final shape:   {df.shape}")
+    print(f"   Encoded {len(label_encoders)} categorical columns")
+
+    data, split_key = stages.run('split', [key, TEST_SIZE, RANDOM_STATE, CALIBRATION_SIZE,
+                                           EARLY_STOPPING_SIZE], split, df)
+    print(f"\n   Train: {len(data['X_train']):,}  |  Test: {len(data['X_test']):,}")
+    train_dist = dict(zip(*np.unique(data['y_train'], return_counts=True)))
+    print(f"   Class balance (train — before balancing): {train_dist}")
+    print(f"   No:Yes ratio = {train_dist.get(0,0)}:{train_dist.get(1,0)}")
+    return class_ratio, label_encoders, data, split_key
+
+
+def thread_budgets(names, cpus: int) -> dict:
+    """
+    Threads per model when they all train at once: one core for each
+    single-threaded fit (lbfgs, libsvm), the rest split between the
+    multi-threaded ones (at least one each).
+    """
+    single  = [n for n in names if n in SINGLE_THREADED]
+    multi   = [n for n in names if n not in SINGLE_THREADED]
+    budgets = dict.fromkeys(single, 1)
+    spare   = max(cpus - len(single), len(multi))
+    for i, name in enumerate(multi):
+        budgets[name] = spare // len(multi) + (1 if i < spare % len(multi) else 0)
+    return budgets
+
+
+def _set_n_jobs(model, n_jobs):
+    """n_jobs of a model or, if calibrated, of every fold's base estimator."""
+    from utils.calibrated_shap import calibrated_folds
+    bases = ([base for base, _ in calibrated_folds(model)]
+             if hasattr(model, 'calibrated_classifiers_') else [model])
+    for base in bases:
+        base.set_params(n_jobs=n_jobs)
+
+
+def _model_chain(stages: StageCache, name: str, clf, data: dict, split_key: str,
+                 calibration: str, threads: int = None):
+    """
+    fit → calibrate → evaluate of one model, its n_jobs limited to threads
+    while training. Returns (model, evaluation, model key).
+    """
+    calibrated = name in CALIBRATED_MODELS
+    params = {k: v for k, v in clf.get_params().items() if k not in THREAD_PARAMS}
+    n_jobs = clf.get_params().get('n_jobs')     # None: single-threaded model (or no n_jobs)
+    budget = threads if threads and n_jobs is not None else n_jobs
+
+    clf = clone(clf)
+    if n_jobs is not None:
+        clf.set_params(n_jobs=budget)
+    clf, key = stages.run(f'fit {name}', [split_key, name, type(clf).__name__, params,
+                                          calibrated and calibration],
+                          fit_model, name, clf, data, calibration)
+    if n_jobs is not None:
+        _set_n_jobs(clf, budget)            # a cached fit may carry another run's budget
+    if calibrated:
+        clf, key = stages.run(f'calibrate {name}', [key, 'isotonic', calibration],
+                              calibrate, name, clf, data, calibration)
+    ev, _ = stages.run(f'evaluate {name}', [key, split_key], evaluate, name, clf, data)
+    if n_jobs is not None:
+        _set_n_jobs(clf, n_jobs)            # the artifact keeps the configured n_jobs
+    return clf, ev, key
+
+
+def _fit_task(name: str, clf, data: dict, split_key: str, calibration: str,
+              threads: int, cache_dir: str, cache: bool):
+    """Worker process: _model_chain on `threads` cores (n_jobs, BLAS and OpenMP pools)."""
+    from threadpoolctl import threadpool_limits
+
+    stages = StageCache(cache_dir, enabled=cache, code=STAGE_CODE)
+    start  = time.time()
+    with warnings.catch_warnings(), threadpool_limits(limits=threads):
+        warnings.simplefilter('ignore')
+        model, ev, key = _model_chain(stages, name, clf, data, split_key, calibration, threads)
+    return model, ev, key, stages, {'threads': threads, 'start': start, 'end': time.time()}
+
+
+def _fit_models(stages: StageCache, specs: dict, data: dict, split_key: str, calibration: str,
+                workers: int = TRAIN_WORKERS):
+    """
+    fit → calibrate → evaluate every model in specs, on up to `workers`
+    processes at once with thread_budgets() cores each (in order in this
+    process if workers <= 1). Returns (models, evals, model keys, timeline).
+    """
+    names   = list(specs)
+    workers = max(1, min(workers, len(names)))
+    outputs = {}
+    if workers == 1:
+        for name, (clf, _) in specs.items():
+            start = time.time()
+            model, ev, key = _model_chain(stages, name, clf, data, split_key, calibration)
+            outputs[name] = model, ev, key, None, {'threads': None, 'start': start, 'end': time.time()}
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        budgets = thread_budgets(names, os.cpu_count() or 1)
+        # spawn: XGBoost's OpenMP runtime is not fork-safe once initialised
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {name: pool.submit(_fit_task, name, clf, data, split_key, calibration,
+                                         budgets[name], stages.cache_dir, stages.enabled)
+                       for name, (clf, _) in specs.items()}
+            outputs = {name: future.result() for name, future in futures.items()}
+
+    models, evals, model_keys, timeline = {}, {}, {}, {}
+    for name in names:
+        models[name], evals[name], model_keys[name], worker_stages, timeline[name] = outputs[name]
+        if worker_stages is not None:
+            stages.hits.extend(worker_stages.hits)
+            stages.runs.extend(worker_stages.runs)
+            stages.seconds.update(worker_stages.seconds)
+        print(f"  ▶ Trained {name}" + (f"  (isotonic calibration, {calibration})"
+                                       if name in CALIBRATED_MODELS else ''))
+        _report(name, evals[name])
+    return models, evals, model_keys, timeline
+
+
+def _print_timeline(timeline: dict, width: int = 40):
+    """Per-model start / end on a shared time axis."""
+    t0   = min(t['start'] for t in timeline.values())
+    wall = max(t['end'] for t in timeline.values()) - t0
+    busy = sum(t['end'] - t['start'] for t in timeline.values())
+    print(f"\n>> Training timeline: {wall:.1f}s wall, {busy:.1f}s of model time\n")
+    for name, t in timeline.items():
+        a = int((t['start'] - t0) / max(wall, 1e-9) * width)
+        b = max(a + 1, round((t['end'] - t0) / max(wall, 1e-9) * width))
+        threads = f"{t['threads']} thr" if t['threads'] else 'inline'
+        print(f"   {name:<20}{threads:>7}  {t['start'] - t0:5.1f}s → {t['end'] - t0:5.1f}s  "
+              f"|{' ' * a}{'█' * (b - a)}{' ' * (width - b)}|")
+
+
+def _train(data_files, params, model_root, results_dir, cache, cache_dir,
+           calibration, workers, svm_engine) -> dict:
+    stages = _stage_cache(model_root, cache, cache_dir)
+    os.makedirs(model_root, exist_ok=True)
+    os.makedirs(results_dir, exist_ok=True)
+
+    print("=" * 65)
+    print("  EAPS ML Pipeline - Employee Attrition Prediction System")
+    print("  [Debiased Version: class_weight + calibration + threshold]")
+    print("=" * 65)
+
+    class_ratio, label_encoders, data, split_key = _prepare(stages, data_files)
+
+    # ── Fit, calibrate & evaluate each model ──────────────────────────────
+    svm_engine = resolve_svm_engine(svm_engine, len(data['X_train']))
+    print(f"\n>> Training models (with bias mitigations, SVM engine: {svm_engine})...\n")
+    specs = model_specs(class_ratio, params, svm_engine)
+    models, evals, model_keys, timeline = _fit_models(stages, specs, data, split_key,
+                                                      calibration, workers)
+    _print_timeline(timeline)
+    xgb_rounds = boosted_rounds(models['XGBoost'])
+    print(f"\n   XGBoost: early stopping kept {xgb_rounds} of "
+          f"{specs['XGBoost'][0].get_params()['n_estimators']} rounds")
+
+    print(f"\n>> Calibrated models ({calibration}):\n")
+    calibration_report = {name: calibration_stats(name, models[name], data, _train_seconds(stages, name))
+                          for name in CALIBRATED_MODELS}
+    _print_calibration({calibration: calibration_report})
+
+    RESULTS    = {name: ev['metrics'] for name, ev in evals.items()}
+    thresholds = {name: ev['threshold'] for name, ev in evals.items()}
+    best_model = max(RESULTS, key=lambda m: RESULTS[m]['AUC-ROC'])
+
+    # ── Results summary ───────────────────────────────────────────────────
+    print("\n" + "=" * 65)
+    print("  FINAL RESULTS SUMMARY")
+    print("=" * 65)
+
+    df_results = pd.DataFrame(RESULTS).T
+    print(df_results.to_string())
+    print(f"\n[BEST] Best model: {best_model} (AUC-ROC={RESULTS[best_model]['AUC-ROC']})")
+
+    print("\n>> Classification Reports (with optimal thresholds):\n")
+    for name, ev in evals.items():
+        y_pred = (ev['proba'] >= ev['threshold']).astype(int)
+        print(f"  [{name}]  threshold={ev['threshold']}")
+        print(classification_report(data['y_test'], y_pred,
+                                    target_names=['Stay (0)', 'Leave (1)'],
+                                    zero_division=0))
+
+    # ── Plots ─────────────────────────────────────────────────────────────
+    # Written before the version is published: a failed plot leaves CURRENT as it was
+    print("\n>> Generating plots...")
+    pngs, _ = stages.run('plot', [split_key, model_keys], plot, data, models, evals)
+    for fname, png in pngs.items():
+        with open(os.path.join(results_dir, fname), 'wb') as fh:
+            fh.write(png)
+        print(f"   Saved → results/{fname}")
+
+    # ── Write & publish the version ───────────────────────────────────────
+    feature_plan = FeaturePlan(FINAL_FEATURES, label_encoders,
+                               aliases={**COLUMN_RENAME_MAP, 'Overtime': 'OverTime'},
+                               defaults=TRAINING_DEFAULTS)
+    artifacts = {
+        'feature_names.pkl':   FINAL_FEATURES,
+        'label_encoders.pkl':  label_encoders,
+        'feature_plan.pkl':    feature_plan,
+        'class_ratio.pkl':     class_ratio,
+        'scaler.pkl':          data['scaler'],
+        'threshold.pkl':       thresholds,
+        'best_model_name.pkl': best_model,
+        **{fname: models[name] for name, (_, fname) in specs.items()},
+    }
+    # All artifacts of this run go into a staging version directory, which
+    # is removed again if writing or sealing it fails (e.g. disk full)
+    version, model_dir = model_registry.begin_version(model_root)
+    try:
+        for fname, obj in artifacts.items():
+            joblib.dump(obj, os.path.join(model_dir, fname))
+        print(f"\n   Saved → models/  {', '.join(artifacts)}")
+        print(f"   Thresholds: {thresholds}")
+
+        # Seal the version (manifest.json) and flip models/CURRENT to it
+        model_registry.commit_version(model_dir, version, root=model_root, metadata={
+            'best_model': best_model,
+            'results':    RESULTS,
+            'thresholds': thresholds,
+            'features':   FINAL_FEATURES,
+            'svm_engine': svm_engine,
+            'xgboost_rounds': xgb_rounds,
+            'calibration': {'mode': calibration, 'models': calibration_report},
+        })
+    except BaseException:
+        model_registry.abort_version(model_dir)
+        raise
+    print(f"   Published model version {version}")
+
+    stages.prune()
+    print("\n" + "=" * 65)
+    print("  [DONE] Pipeline complete!")
+    print(f"  [BEST] Best model: {best_model} (AUC={RESULTS[best_model]['AUC-ROC']})")
+    print(f"  Stages run: {', '.join(stages.runs) or 'none'}")
+    print(f"  Stages from cache: {', '.join(stages.hits) or 'none'}")
+    print(f"\n  models/versions/{version}/ (now CURRENT)")
+    print("\n  Launch the app:")
+    print("    python flask_app/server.py")
+    print("=" * 65)
+
+    return {
+        'version':    version,
+        'best_model': best_model,
+        'results':    RESULTS,
+        'thresholds': thresholds,
+        'calibration': calibration_report,
+        'timeline':   timeline,
+        'stages':     {'cached': stages.hits, 'run': stages.runs},
+    }
+
+
+if __name__ == '__main__':
+    args  = sys.argv[1:]
+    cache = '--no-cache' not in args
+    try:
+        if '--compare-calibration' in args:
+            compare_calibration(cache=cache)
+        else:
+            svm = next((a.split('=', 1)[1] for a in args if a.startswith('--svm=')), SVM_ENGINE)
+            train(cache=cache, calibration='cv' if '--calibration=cv' in args else CALIBRATION,
+                  svm_engine=svm)
+    except FileNotFoundError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -17,7 +17,7 @@ import os, sys
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
 
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Request, render_template, jsonify, request, send_file
 import pandas as pd
 import io
 import traceback
@@ -28,6 +28,24 @@ app = Flask(__name__,
             static_folder='static')
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB upload limit
+# Streamed batch scoring (/api/batch, /api/jobs kind=batch) takes larger rosters;
+# werkzeug spools uploads to a temp file, so this bounds disk, not memory.
+BATCH_UPLOAD_LIMIT = int(float(os.environ.get('EAPS_BATCH_UPLOAD_MB', 512)) * 1024 * 1024)
+BATCH_UPLOAD_ENDPOINTS = ('api_batch', 'api_submit_job')
+
+
+class EAPSRequest(Request):
+    """Upload limit per route: BATCH_UPLOAD_LIMIT for the streamed batch endpoints."""
+
+    @property
+    def max_content_length(self):
+        # Assigning request.max_content_length needs Flask >= 3.1; this works on 3.0 too
+        if self.endpoint in BATCH_UPLOAD_ENDPOINTS:
+            return BATCH_UPLOAD_LIMIT
+        return super().max_content_length
+
+
+app.request_class = EAPSRequest
 
 # ── CORS: allow same-origin API calls from browser ────────────────────────────
 @app.after_request
@@ -42,8 +60,14 @@ def options_handler(path):
     return '', 204
 
 # ── Helper: check if models exist ─────────────────────────────────────────────
+def _model_dir():
+    """Directory of the published model version (flat models/ before the first one)."""
+    from utils.model_registry import resolve_model_dir
+    return resolve_model_dir()[1]
+
+
 def get_models_status():
-    model_dir = os.path.join(PROJECT_ROOT, 'models')
+    model_dir = _model_dir()
     files = ['random_forest.pkl', 'xgboost.pkl',
              'logistic_regression.pkl', 'svm.pkl', 'scaler.pkl']
     found = [f for f in files if os.path.exists(os.path.join(model_dir, f))]
@@ -51,9 +75,9 @@ def get_models_status():
 
 
 def _load_meta(filename, default=None):
-    """Safely load a pickle metadata file from models/ directory."""
+    """Safely load a pickle metadata file from the published model version."""
     import joblib
-    path = os.path.join(PROJECT_ROOT, 'models', filename)
+    path = os.path.join(_model_dir(), filename)
     try:
         return joblib.load(path) if os.path.exists(path) else default
     except Exception:
@@ -91,38 +115,27 @@ def api_predict():
             return jsonify({'error': 'Invalid or empty JSON payload received.'}), 400
         model_name = data.pop('model_name', 'Random Forest')
 
-        from utils.model_loader  import predict_single, load_feature_names
-        from utils.preprocess    import encode_input
+        from utils.model_loader  import predict_single, load_feature_names, explain_single
+        from utils.preprocess    import encode_row
+        from utils.coalescer     import get_coalescer
+
+        # Encode categorical → numeric, straight into a feature_names-ordered row
+        x_row  = encode_row(data, load_feature_names())
 
-        # Encode categorical → numeric
-        X_enc  = encode_input(data)
-        result = predict_single(X_enc.iloc[0].to_dict(), model_name)
+        # Opt-in micro-batching: concurrent requests are scored as one matrix
+        coalescer = get_coalescer()
+        if coalescer is not None:
+            result = coalescer.predict(x_row, model_name)
+        else:
+            result = predict_single(x_row, model_name)
 
         if 'error' in result:
             return jsonify({'error': result['error']}), 400
 
-        # SHAP explanation (top 8 features)
+        # SHAP explanation (top 8 features) — explainer cached per model
         shap_data = []
         try:
-            import joblib, shap as shap_lib
-            import numpy as np
-            model_dir  = os.path.join(PROJECT_ROOT, 'models')
-            fname_map  = {'Random Forest': 'random_forest.pkl',
-                          'XGBoost': 'xgboost.pkl',
-                          'Logistic Regression': 'logistic_regression.pkl',
-                          'SVM': 'svm.pkl'}
-            clf        = joblib.load(os.path.join(model_dir, fname_map[model_name]))
-            feat_names = load_feature_names()
-            row_df     = X_enc[feat_names] if all(f in X_enc.columns for f in feat_names) \
-                         else X_enc.reindex(columns=feat_names, fill_value=0)
-
-            explainer  = shap_lib.TreeExplainer(clf)
-            sv         = explainer.shap_values(row_df)
-            sv         = sv[1][0] if isinstance(sv, list) else sv[0]
-
-            pairs = sorted(zip(feat_names, sv.tolist()),
-                           key=lambda x: abs(x[1]), reverse=True)[:8]
-            shap_data = [{'feature': f, 'shap': round(v, 5)} for f, v in pairs]
+            shap_data = explain_single(x_row.reshape(1, -1), model_name, top_n=8)
         except Exception:
             pass
 
@@ -133,6 +146,12 @@ def api_predict():
         return jsonify({'error': str(e)}), 500
 
 
+def _dedup_flag():
+    """Form field dedup=1/0 → True/False; absent → None (server default, EAPS_BATCH_DEDUP)."""
+    value = request.form.get('dedup')
+    return None if value is None else value in ('1', 'true')
+
+
 # ── API: Batch prediction ──────────────────────────────────────────────────────
 @app.route('/api/batch', methods=['POST'])
 def api_batch():
@@ -144,201 +163,92 @@ def api_batch():
         model_name = request.form.get('model_name', 'Random Forest')
         threshold  = float(request.form.get('threshold', 0.5))
 
-        df_raw     = pd.read_csv(file)
-
-        from utils.preprocess   import preprocess_uploaded_csv
-        from utils.model_loader import predict_batch, load_thresholds
-
-        df_feat    = preprocess_uploaded_csv(df_raw)
-        df_results = predict_batch(df_feat, model_name)
-
-        # Use the user-supplied threshold if different from optimal, else use model's optimal
-        saved_thresholds = load_thresholds()
-        optimal_thresh   = saved_thresholds.get(model_name, 0.5)
-        # If user passed threshold explicitly (not default 0.5), honour it; else use optimal
-        effective_thresh = threshold if threshold != 0.5 else optimal_thresh
-        df_results['Risk_Level'] = df_results['Probability'].apply(
-            lambda p: 'HIGH' if p >= 0.70 else ('MEDIUM' if p >= 0.40 else 'LOW'))
-
-        # Save to latest batch results for dashboard
-        df_export = df_raw.copy()
-        df_export['Prediction']  = df_results['Prediction'].values
-        df_export['Probability'] = df_results['Probability'].values
-        df_export['Risk_Level']  = df_results['Risk_Level'].values
-        latest_path = os.path.join(PROJECT_ROOT, 'data', 'latest_batch_results.csv')
-        df_export.to_csv(latest_path, index=False)
-
-        total   = len(df_results)
-        leavers = (df_results['Prediction'] == 'Leave').sum()
-        high_r  = (df_results['Risk_Level'] == 'HIGH').sum()
-        avg_p   = round(float(df_results['Probability'].mean() * 100), 1)
-
-        # Top 20 high-risk employees for table preview
-        preview_cols = ['Prediction', 'Probability', 'Risk_Level']
-        for col in ['Age', 'Department', 'JobRole', 'MonthlyIncome', 'OverTime']:
-            if col in df_raw.columns:
-                df_results[col] = df_raw[col].values
-                preview_cols    = [col] + preview_cols
-
-        high_risk = df_results[df_results['Risk_Level'] == 'HIGH']\
-                        .sort_values('Probability', ascending=False)\
-                        .head(20)[preview_cols].round({'Probability': 4})
-
-        # Full CSV as base64 for download
-        import base64
-        buf = io.BytesIO()
-        df_results.to_csv(buf, index=False)
-        csv_b64 = base64.b64encode(buf.getvalue()).decode()
+        passthrough = request.form.get('passthrough', '0') in ('1', 'true')
 
-        return jsonify({
-            'total':         total,
-            'leavers':       int(leavers),
-            'high_risk':     int(high_r),
-            'avg_prob':      avg_p,
-            'threshold_used': round(effective_thresh, 4),
-            'optimal_threshold': round(optimal_thresh, 4),
-            'risk_counts':   df_results['Risk_Level'].value_counts().to_dict(),
-            'high_risk_table': high_risk.to_dict(orient='records'),
-            'csv_b64':       csv_b64,
-        })
+        # The upload is read and scored CHUNK_ROWS rows at a time
+        from utils.batch import score_batch
+        return jsonify(score_batch(file.stream, model_name, threshold,
+                                   passthrough=passthrough, dedup=_dedup_flag()))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-# ── API: Dashboard chart data ──────────────────────────────────────────────────
-@app.route('/api/chart-data')
-def api_chart_data():
+# ── API: Stored batch results download ─────────────────────────────────────────
+@app.route('/api/results/<result_id>/download')
+def api_result_download(result_id):
+    """Stream a stored batch result: ?format=csv (default), csv.gz, parquet or arrow."""
     try:
-        data_dir  = os.path.join(PROJECT_ROOT, 'data')
-        latest_path = os.path.join(data_dir, 'latest_batch_results.csv')
+        from flask import Response
+        from utils.results_store import result_path, stream_result, MIMETYPES
 
-        if not os.path.exists(latest_path):
-            return jsonify({'error': 'No batch prediction results found. Please run a <a href="/batch" style="text-decoration:underline">Batch Prediction</a> first to populate the dashboard.'}), 404
+        path = result_path(result_id)
+        if path is None:
+            return jsonify({'error': 'Result not found or expired. Re-run the batch prediction.'}), 404
 
-        df = pd.read_csv(latest_path)
-        
-        # Normalize column names so raw aliases like 'Job_Role' become 'JobRole'
+        fmt = request.args.get('format', 'csv')
         try:
-            from utils.preprocess import COLUMN_ALIASES
-            df.rename(columns=COLUMN_ALIASES, inplace=True)
-            # Add some missing ones just in case the raw CSV uses slightly different casings
-            df.rename(columns={
-                'Years_at_Company': 'YearsAtCompany',
-                'Years_in_Current_Role': 'YearsInCurrentRole',
-                'Work_Environment_Satisfaction': 'EnvironmentSatisfaction',
-                'Relationship_with_Manager': 'RelationshipSatisfaction',
-                'Job_Involvement': 'JobInvolvement',
-                'Job_Level': 'JobLevel'
-            }, inplace=True)
-        except ImportError:
-            pass
+            chunks = stream_result(path, fmt)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
 
-        if 'Prediction' not in df.columns:
-            return jsonify({'error': 'Invalid batch results format. Expected Prediction column.'}), 400
-
-        # Map Prediction output ('Leave', 'Stay') back to Attrition format for legacy dashboard charts
-        df['Attrition'] = df['Prediction'].map({'Leave': 'Yes', 'Stay': 'No'})
-        df['Attrition_Num'] = df['Prediction'].map({'Leave': 1, 'Stay': 0})
-        charts = {}
-
-        # 1. Department attrition (Stacked)
-        if 'Department' in df.columns:
-            d_grp = df.groupby(['Department', 'Prediction']).size().unstack(fill_value=0)
-            charts['department'] = {
-                'labels': d_grp.index.tolist(),
-                'stay': d_grp.get('Stay', pd.Series(0, index=d_grp.index)).tolist(),
-                'leave': d_grp.get('Leave', pd.Series(0, index=d_grp.index)).tolist(),
-            }
+        filename = f'eaps_batch_predictions_{result_id[:8]}.{fmt}'
+        return Response(chunks, mimetype=MIMETYPES[fmt], headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+        })
 
-        # 2. JobRole attrition (Stacked)
-        if 'JobRole' in df.columns:
-            # Sort by total people in role or by leave count
-            j_grp = df.groupby(['JobRole', 'Prediction']).size().unstack(fill_value=0)
-            # Sort by highest leave count descending
-            if 'Leave' in j_grp.columns:
-                j_grp = j_grp.sort_values(by='Leave', ascending=True)
-            charts['jobrole'] = {
-                'labels': j_grp.index.tolist(),
-                'stay': j_grp.get('Stay', pd.Series(0, index=j_grp.index)).tolist(),
-                'leave': j_grp.get('Leave', pd.Series(0, index=j_grp.index)).tolist(),
-            }
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # 3. Age histogram
-        if 'Age' in df.columns:
-            stay   = df[df['Attrition'] == 'No']['Age'].tolist()
-            leave  = df[df['Attrition'] == 'Yes']['Age'].tolist()
-            charts['age'] = {'stay': stay, 'leave': leave}
-
-        # 4. Income box
-        if 'MonthlyIncome' in df.columns:
-            income_stay  = df[df['Attrition'] == 'No']['MonthlyIncome'].tolist()
-            income_leave = df[df['Attrition'] == 'Yes']['MonthlyIncome'].tolist()
-            charts['income'] = {'stay': income_stay, 'leave': income_leave}
-
-        # 5. Overtime
-        if 'OverTime' in df.columns:
-            ot = df.groupby(['OverTime', 'Attrition']).size().unstack(fill_value=0).reset_index()
-            charts['overtime'] = {
-                'labels': ot['OverTime'].tolist(),
-                'no':  ot.get('No', pd.Series([0]*len(ot))).tolist(),
-                'yes': ot.get('Yes', pd.Series([0]*len(ot))).tolist(),
-            }
 
-        # 6. Radar Chart Analytics
-        radar_cols = ['JobSatisfaction', 'EnvironmentSatisfaction', 'RelationshipSatisfaction', 'WorkLifeBalance', 'JobInvolvement']
-        if all(c in df.columns for c in radar_cols):
-            radar = df.groupby('Prediction')[radar_cols].mean().round(2)
-            charts['radar'] = {
-                'metrics': radar_cols,
-                'stay': radar.loc['Stay'].tolist() if 'Stay' in radar.index else [0]*len(radar_cols),
-                'leave': radar.loc['Leave'].tolist() if 'Leave' in radar.index else [0]*len(radar_cols),
-            }
+# ── API: Threshold what-if over a stored batch ────────────────────────────────
+@app.route('/api/results/<result_id>/whatif')
+def api_result_whatif(result_id):
+    """
+    Leavers, risk bands and precision / recall of a stored batch or compare
+    run at ?threshold= (repeatable, default 0.5); ?model= limits it to one model.
+    """
+    try:
+        from utils.whatif import what_if
 
-        # 7. Heatmap (Department vs JobLevel)
-        if 'Department' in df.columns and 'JobLevel' in df.columns:
-            val_col = 'Probability' if 'Probability' in df.columns else 'Attrition_Num'
-            hm = df.groupby(['Department', 'JobLevel'])[val_col].mean().unstack(fill_value=0)
-            charts['heatmap'] = {
-                'y': hm.index.tolist(),
-                'x': [f'Level {c}' for c in hm.columns],
-                'z': (hm.values * (100 if val_col == 'Probability' else 1)).tolist(),
-            }
+        try:
+            thresholds = [float(t) for t in request.args.getlist('threshold')] or [0.5]
+        except ValueError:
+            return jsonify({'error': 'threshold must be a number between 0 and 1'}), 400
+        if not all(0.0 <= t <= 1.0 for t in thresholds):
+            return jsonify({'error': 'threshold must be a number between 0 and 1'}), 400
 
-        # 8. Leaderboard (Department + JobRole)
-        if 'Department' in df.columns and 'JobRole' in df.columns:
-            val_col = 'Probability' if 'Probability' in df.columns else 'Attrition_Num'
-            df['Segment'] = df['Department'] + " — " + df['JobRole']
-            lb = df.groupby('Segment')[val_col].mean().sort_values(ascending=False).head(5)
-            lb = lb.iloc[::-1]
-            charts['leaderboard'] = {
-                'y': lb.index.tolist(),
-                'x': (lb.values * (100 if val_col == 'Probability' else 1)).round(1).tolist(),
-            }
+        try:
+            models = what_if(result_id, thresholds, request.args.get('model'))
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        if models is None:
+            return jsonify({'error': 'Result not found or expired. Re-run the batch prediction.'}), 404
+        return jsonify({'result_id': result_id, 'models': models})
 
-        # 9. Grouped Bar (Tenure Metrics)
-        tenure_cols = ['YearsAtCompany', 'YearsInCurrentRole', 'YearsSinceLastPromotion']
-        if all(c in df.columns for c in tenure_cols):
-            tb = df.groupby('Prediction')[tenure_cols].mean().round(1)
-            charts['tenure'] = {
-                'metrics': ['Company Tenure', 'Current Role Tenure', 'Years Since Promo'],
-                'stay': tb.loc['Stay'].tolist() if 'Stay' in tb.index else [0]*3,
-                'leave': tb.loc['Leave'].tolist() if 'Leave' in tb.index else [0]*3,
-            }
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # 10. KPIs
-        total    = len(df)
-        attrited = (df['Attrition'] == 'Yes').sum()
-        charts['kpis'] = {
-            'total':   total,
-            'attrited': int(attrited),
-            'rate':    round(attrited / total * 100, 1) if total > 0 else 0,
-            'avg_income': round(float(df['MonthlyIncome'].mean()), 0) if 'MonthlyIncome' in df.columns else None,
-            'avg_age':    round(float(df['Age'].mean()), 1) if 'Age' in df.columns else None,
-        }
 
-        return jsonify(charts)
+# ── API: Dashboard chart data ──────────────────────────────────────────────────
+@app.route('/api/chart-data')
+def api_chart_data():
+    try:
+        from flask import Response
+        from utils.dashboard import get_dashboard
+
+        body, etag = get_dashboard()
+        if body is None:
+            return jsonify({'error': 'No batch prediction results found. Please run a <a href="/batch" style="text-decoration:underline">Batch Prediction</a> first to populate the dashboard.'}), 404
 
+        # Aggregates are materialized per batch; browsers revalidate with If-None-Match
+        resp = Response(body, mimetype='application/json')
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp.make_conditional(request)
+
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -349,46 +259,33 @@ def api_compare_predict():
     try:
         data = request.get_json()
 
-        from utils.model_loader import predict_single, load_feature_names
-        from utils.preprocess   import encode_input
+        from utils.model_loader import (predict_single, load_feature_names,
+                                        explain_single, TREE_MODELS, fan_out)
+        from utils.preprocess   import encode_row
 
-        X_enc      = encode_input(data)
-        feat_names = load_feature_names()
-        emp_dict   = X_enc.iloc[0].to_dict()
+        x_row = encode_row(data, load_feature_names())
 
         model_names = ['Random Forest', 'XGBoost', 'SVM', 'Logistic Regression']
-        results     = {}
-
-        for mname in model_names:
-            res = predict_single(emp_dict, mname)
-            if 'error' not in res:
-                results[mname] = res
-            else:
-                results[mname] = {'prediction': 'N/A', 'probability': 0.0,
-                                  'risk_level': 'N/A', 'error': res['error']}
-
-        # SHAP for tree models only
-        shap_all = {}
-        try:
-            import joblib, shap as shap_lib
-            import numpy as np
-            model_dir = os.path.join(PROJECT_ROOT, 'models')
-            fname_map = {'Random Forest': 'random_forest.pkl',
-                         'XGBoost': 'xgboost.pkl'}
-            row_df = X_enc.reindex(columns=feat_names, fill_value=0)
-            for mname, fname in fname_map.items():
-                try:
-                    clf       = joblib.load(os.path.join(model_dir, fname))
-                    explainer = shap_lib.TreeExplainer(clf)
-                    sv        = explainer.shap_values(row_df)
-                    sv        = sv[1][0] if isinstance(sv, list) else sv[0]
-                    pairs     = sorted(zip(feat_names, sv.tolist()),
-                                       key=lambda x: abs(x[1]), reverse=True)[:8]
-                    shap_all[mname] = [{'feature': f, 'shap': round(v, 5)} for f, v in pairs]
-                except Exception:
-                    pass
-        except Exception:
-            pass
+
+        def run(task):
+            kind, mname = task
+            if kind == 'predict':
+                res = predict_single(x_row, mname)
+                if 'error' not in res:
+                    return res
+                return {'prediction': 'N/A', 'probability': 0.0,
+                        'risk_level': 'N/A', 'error': res['error']}
+            # SHAP for tree models only (explainers cached in utils.model_loader)
+            try:
+                return explain_single(x_row.reshape(1, -1), mname, top_n=8)
+            except Exception:
+                return None
+
+        # Predictions and SHAP explanations run side by side, one task each
+        tasks    = [('predict', m) for m in model_names] + [('shap', m) for m in TREE_MODELS]
+        outputs  = dict(zip(tasks, fan_out(run, tasks)))
+        results  = {m: outputs[('predict', m)] for m in model_names}
+        shap_all = {m: outputs[('shap', m)] for m in TREE_MODELS if outputs[('shap', m)]}
 
         return jsonify({'results': results, 'shap': shap_all})
 
@@ -405,55 +302,74 @@ def api_compare_batch():
 
         file      = request.files['file']
         threshold = float(request.form.get('threshold', 0.5))
-        df_raw    = pd.read_csv(file)
+        from utils.batch import compare_batch
+        # Read (and scored) only for models without cached probabilities
+        return jsonify(compare_batch(file.stream, threshold, dedup=_dedup_flag()))
 
-        from utils.preprocess   import preprocess_uploaded_csv
-        from utils.model_loader import predict_batch
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        df_feat     = preprocess_uploaded_csv(df_raw)
-        model_names = ['Random Forest', 'XGBoost', 'SVM', 'Logistic Regression']
-        summary     = {}
 
-        for mname in model_names:
-            try:
-                df_res = predict_batch(df_feat, mname)
-                df_res['Risk_Level'] = df_res['Probability'].apply(
-                    lambda p: 'HIGH' if p >= threshold else ('MEDIUM' if p >= 0.4 else 'LOW'))
-                total   = len(df_res)
-                leavers = int((df_res['Prediction'] == 'Leave').sum())
-                high_r  = int((df_res['Risk_Level'] == 'HIGH').sum())
-                avg_p   = round(float(df_res['Probability'].mean() * 100), 2)
-                # Probability histogram buckets (0-10%, 10-20%, ... 90-100%)
-                buckets = [0] * 10
-                for p in df_res['Probability']:
-                    idx = min(int(p * 10), 9)
-                    buckets[idx] += 1
-                summary[mname] = {
-                    'total':   total,
-                    'leavers': leavers,
-                    'attrition_rate': round(leavers / total * 100, 2) if total else 0,
-                    'high_risk':  high_r,
-                    'medium_risk': int((df_res['Risk_Level'] == 'MEDIUM').sum()),
-                    'low_risk':   int((df_res['Risk_Level'] == 'LOW').sum()),
-                    'avg_prob': avg_p,
-                    'risk_counts': df_res['Risk_Level'].value_counts().to_dict(),
-                    'prob_buckets': buckets,
-                }
-            except Exception as me:
-                summary[mname] = {'error': str(me)}
-
-        saved_thresholds = {}
-        try:
-            from utils.model_loader import load_thresholds
-            saved_thresholds = load_thresholds()
-        except Exception:
-            pass
+# ── API: Background batch jobs ────────────────────────────────────────────────
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Queue /api/batch (kind=batch) or /api/compare-batch (kind=compare) work; returns 202 + job id."""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
 
+        from utils.jobs import submit_job, JOB_KINDS
+
+        kind = request.form.get('kind', 'batch')
+        if kind not in JOB_KINDS:
+            return jsonify({'error': f'kind must be one of {list(JOB_KINDS)}'}), 400
+        # Only batch jobs stream their input; compare jobs keep the default limit
+        if kind != 'batch' and (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File too large for a compare job (16 MB limit).'}), 413
+
+        params = {'threshold': float(request.form.get('threshold', 0.5)), 'dedup': _dedup_flag()}
+        if kind == 'batch':
+            params['model_name']  = request.form.get('model_name', 'Random Forest')
+            params['passthrough'] = request.form.get('passthrough', '0') in ('1', 'true')
+
+        job_id = submit_job(kind, request.files['file'], params)
         return jsonify({
-            'total':    len(df_raw),
-            'summary':  summary,
-            'thresholds': saved_thresholds,
-        })
+            'job_id':     job_id,
+            'state':      'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result',
+        }), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    try:
+        from utils.jobs import job_status
+        status = job_status(job_id)
+        if status is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(status)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/result')
+def api_job_result(job_id):
+    try:
+        from utils.jobs import job_status, job_result
+        status = job_status(job_id)
+        if status is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if status.get('state') == 'failed':
+            return jsonify({'error': status.get('error', 'Job failed')}), 500
+        result = job_result(job_id) if status.get('state') == 'done' else None
+        if result is None:
+            return jsonify({'error': 'Job not finished', 'state': status.get('state')}), 409
+        return jsonify(result)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -483,9 +399,11 @@ def api_model_diagnostics():
             'Logistic Regression': 'logistic_regression.pkl',
             'SVM':                 'svm.pkl',
         }
+        from utils.model_registry import resolve_model_dir
+        version, model_dir = resolve_model_dir()
         models_info = {}
         for name, fname in model_files.items():
-            path = os.path.join(PROJECT_ROOT, 'models', fname)
+            path = os.path.join(model_dir, fname)
             exists = os.path.exists(path)
             models_info[name] = {
                 'exists':      exists,
@@ -501,7 +419,32 @@ def api_model_diagnostics():
             'best_model':   best_model,
             'feature_count': len(feature_names),
             'feature_names': feature_names,
-            'debiased':     os.path.exists(os.path.join(PROJECT_ROOT, 'models', 'threshold.pkl')),
+            'debiased':     os.path.exists(os.path.join(model_dir, 'threshold.pkl')),
+            'model_version': version,
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ── API: Serving metrics ──────────────────────────────────────────────────────
+@app.route('/api/metrics')
+def api_metrics():
+    """Runtime serving metrics for this worker process."""
+    try:
+        from utils.coalescer    import get_coalescer
+        from utils.model_loader import (get_inference_engine, current_model_version,
+                                        svm_engine)
+        from utils.memory       import process_memory
+
+        coalescer = get_coalescer()
+        return jsonify({
+            'pid':              os.getpid(),
+            'memory':           process_memory(),
+            'inference_engine': get_inference_engine(),
+            'model_version':    current_model_version(),
+            'svm_engine':       svm_engine(),
+            'coalescer':        coalescer.stats() if coalescer is not None else None,
         })
 
     except Exception as e:
@@ -518,7 +461,7 @@ if __name__ == '__main__':
     print("=" * 55)
 
     # ── Startup validation ────────────────────────────────────────────────────
-    model_dir = os.path.join(PROJECT_ROOT, 'models')
+    model_dir = _model_dir()
     required  = ['random_forest.pkl', 'xgboost.pkl',
                  'logistic_regression.pkl', 'svm.pkl', 'scaler.pkl']
     missing   = [f for f in required if not os.path.exists(os.path.join(model_dir, f))]
@@ -526,7 +469,7 @@ if __name__ == '__main__':
     if missing:
         print("\n⚠️  WARNING: The following model files are missing:")
         for f in missing:
-            print(f"   ✗ models/{f}")
+            print(f"   ✗ {os.path.join(model_dir, f)}")
         print("\n   Run eaps_ml_pipeline.py first to train the models.")
         print("   The server will still start but predictions will fail.\n")
     else:
@@ -26,3 +26,70 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   }
 });
+
+// ── Background batch jobs (/api/jobs) ─────────────────────────────────────────
+// Submits the upload as a job, polls its status (passed to onProgress) and
+// resolves with the same result body the synchronous endpoint returns.
+async function runJob(formData, onProgress) {
+  const resp = await fetch('/api/jobs', { method: 'POST', body: formData });
+  const job  = await resp.json();
+  if (job.error) throw new Error(job.error);
+
+  while (true) {
+    await new Promise(r => setTimeout(r, 750));
+    const st = await (await fetch(job.status_url)).json();
+    if (st.error) throw new Error(st.error);
+    if (onProgress) onProgress(st);
+    if (st.state === 'done') break;
+  }
+
+  const data = await (await fetch(job.result_url)).json();
+  if (data.error) throw new Error(data.error);
+  return data;
+}
+
+function jobProgressText(st) {
+  if (st.state === 'queued') return '⏳ Queued…';
+  if (!st.rows_total) return '⚙️ Reading file…';
+  const pct = Math.round(st.rows_done / st.rows_total * 100);
+  return `⚙️ Scoring${st.stage ? ' · ' + st.stage : ''} — ${pct}% (${st.rows_done.toLocaleString()} / ${st.rows_total.toLocaleString()})`;
+}
+
+// ── Threshold what-if (/api/results/<id>/whatif) ──────────────────────────────
+// Live slider over a finished batch: at most one request in flight, and only
+// the latest threshold is fetched once it returns. onResult gets
+// {model: [result at threshold]}. attach(url, thresholdUsed) only arms the
+// slider — the batch response already describes the current position — and
+// while the slider sits at its default the what-if asks for thresholdUsed,
+// the threshold the server applied for it (the model's optimal one).
+function whatIfSlider(slider, onResult) {
+  const state = { url: null, base: null, busy: false, pending: false };
+  function threshold() {
+    const atDefault = slider.value === slider.defaultValue;
+    return atDefault && state.base != null ? state.base : slider.value / 100;
+  }
+  async function refresh() {
+    if (!state.url) return;
+    if (state.busy) { state.pending = true; return; }
+    state.busy = true;
+    try {
+      const resp = await fetch(`${state.url}?threshold=${threshold()}`);
+      const body = await resp.json();
+      if (!body.error) onResult(body.models);
+    } catch (err) {
+      // keep showing the last answer
+    } finally {
+      state.busy = false;
+      if (state.pending) { state.pending = false; refresh(); }
+    }
+  }
+  slider.addEventListener('input', refresh);
+  return { attach(url, thresholdUsed = null) { state.url = url; state.base = thresholdUsed; } };
+}
+
+function whatIfMetricsText(w) {
+  const m   = w.actual || w.expected;
+  const pct = v => v == null ? '—' : (v * 100).toFixed(1) + '%';
+  return `At ${Math.round(w.threshold * 100)}%: precision ${pct(m.precision)} · recall ${pct(m.recall)}` +
+         (w.actual ? ' (vs uploaded Attrition)' : ' (expected from probabilities)');
+}
@@ -0,0 +1,40 @@
+"""
+gunicorn.conf.py
+Production serving config for the EAPS Flask app.
+
+    gunicorn -c gunicorn.conf.py flask_app.server:app
+
+Memory sharing across workers:
+  EAPS_PRELOAD_MODELS=1 (default) — models are loaded once in the master
+    before forking; workers share those pages copy-on-write instead of each
+    unpickling RF/XGBoost/SVM again, and no worker pays the load on its
+    first request.
+  EAPS_MMAP_MODELS=1 — arrays inside the pickles are memory-mapped from the
+    page cache, so they stay shared even after worker restarts.
+
+Compare per-worker RSS/PSS/USS with:  python memory_report.py --compare
+"""
+
+import gc
+import os
+
+bind        = os.environ.get('EAPS_BIND', '0.0.0.0:5000')
+workers     = int(os.environ.get('EAPS_WORKERS', 3))
+threads     = int(os.environ.get('EAPS_THREADS', 1))
+timeout     = 120
+preload_app = os.environ.get('EAPS_PRELOAD_MODELS', '1') == '1'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from utils.model_loader import preload_models
+    preload_models()
+    server.log.info('EAPS models preloaded in master (pid %s)', os.getpid())
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's tracked generations, so
+    # collections in the workers do not write to (and un-share) those pages.
+    if preload_app:
+        gc.freeze()
@@ -0,0 +1,119 @@
+"""
+memory_report.py
+=================
+EAPS — Employee Attrition Prediction System
+Per-worker memory report for the gunicorn deployment.
+
+Usage:
+    python memory_report.py <gunicorn_master_pid>   # report a running server
+    python memory_report.py --compare               # launch gunicorn with and
+                                                    # without preload/mmap and
+                                                    # compare worker memory
+
+USS (private pages) is what each extra worker really costs; PSS spreads
+shared copy-on-write / mmapped pages across the processes sharing them.
+"""
+
+import os, sys, time, json, socket, subprocess
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from utils.memory import process_memory, child_pids
+
+SAMPLE_EMPLOYEE = {
+    'Age': 35, 'Gender': 'Male', 'MaritalStatus': 'Single',
+    'Department': 'Sales', 'JobRole': 'Sales Executive', 'JobLevel': 2,
+    'OverTime': 'Yes', 'BusinessTravel': 'Travel_Frequently', 'MonthlyIncome': 2500,
+}
+
+
+def print_report(master_pid: int, title: str = ''):
+    workers = child_pids(master_pid)
+    rows = [('master', master_pid, process_memory(master_pid))]
+    rows += [(f'worker {i + 1}', pid, process_memory(pid)) for i, pid in enumerate(workers)]
+
+    if title:
+        print(f"\n  {title}")
+    print(f"  {'process':<10}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}{'shared MB':>11}")
+    for label, pid, mem in rows:
+        print(f"  {label:<10}{pid:>8}{mem.get('rss_mb', 0):>10}{mem.get('pss_mb', 0):>10}"
+              f"{mem.get('uss_mb', 0):>10}{mem.get('shared_mb', 0):>11}")
+    total_pss = sum(m.get('pss_mb', 0) for _, _, m in rows)
+    worker_uss = [m.get('uss_mb', 0) for _, _, m in rows[1:]]
+    print(f"  total PSS: {total_pss:.1f} MB   "
+          f"mean worker USS: {sum(worker_uss) / max(len(worker_uss), 1):.1f} MB")
+    return total_pss
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    return json.loads(urllib.request.urlopen(req, timeout=60).read())
+
+
+def _warm_all_workers(port: int, n_workers: int, model_names):
+    """Send predictions until every worker has served each model at least once."""
+    from concurrent.futures import ThreadPoolExecutor
+    base = f'http://127.0.0.1:{port}'
+    seen = {}
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        def hit(name):
+            _post(f'{base}/api/predict', dict(SAMPLE_EMPLOYEE, model_name=name))
+            return json.loads(urllib.request.urlopen(f'{base}/api/metrics', timeout=60).read())['pid']
+        with ThreadPoolExecutor(n_workers * 2) as pool:
+            for name in model_names:
+                for pid in pool.map(hit, [name] * n_workers * 2):
+                    seen.setdefault(pid, set()).add(name)
+        if len(seen) >= n_workers and all(len(v) == len(model_names) for v in seen.values()):
+            return
+
+
+def compare(n_workers: int = 3):
+    from utils.model_loader import MODELS
+    modes = [
+        ('per-worker load (no preload)', {'EAPS_PRELOAD_MODELS': '0', 'EAPS_MMAP_MODELS': '0'}),
+        ('preload in master (copy-on-write)', {'EAPS_PRELOAD_MODELS': '1', 'EAPS_MMAP_MODELS': '0'}),
+        ('preload + mmap artifacts', {'EAPS_PRELOAD_MODELS': '1', 'EAPS_MMAP_MODELS': '1'}),
+    ]
+    results = {}
+    for title, env_over in modes:
+        port = _free_port()
+        env = dict(os.environ, **env_over, EAPS_BIND=f'127.0.0.1:{port}',
+                   EAPS_WORKERS=str(n_workers))
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'flask_app.server:app'],
+            cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(120):
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/api/metrics', timeout=5)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+            _warm_all_workers(port, n_workers, list(MODELS))
+            results[title] = print_report(proc.pid, title)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print()
+    for title, pss in results.items():
+        print(f"  {title:<36} total PSS {pss:8.1f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--compare':
+        compare()
+    elif len(sys.argv) > 1:
+        print_report(int(sys.argv[1]))
+    else:
+        print(__doc__)
@@ -1,6 +1,7 @@
 """
 pages/2_📂_Batch.py
-Batch CSV upload → predict attrition for all employees → download results.
+Batch upload (CSV, Parquet, Arrow IPC or Feather) → predict attrition for all
+employees → download results in the uploaded format.
 """
 
 import sys, os
@@ -11,6 +12,11 @@ import pandas as pd
 import io
 from utils.model_loader import predict_batch, MODELS
 from utils.preprocess import preprocess_uploaded_csv
+from utils.batch import read_roster
+from utils.roster_io import detect_format, RESULT_FORMATS
+from utils.results_store import MIMETYPES
+
+FORMAT_LABELS = {'csv': 'CSV', 'parquet': 'Parquet', 'arrow': 'Arrow IPC (Feather)'}
 
 st.set_page_config(page_title="Batch Predict | EAPS", page_icon="📂", layout="wide")
 st.title("📂 Batch Employee Attrition Prediction")
@@ -28,12 +34,13 @@ with col2:
 # ── File upload ───────────────────────────────────────────────────────────────
 uploaded = st.file_uploader(
     "Upload Employee CSV",
-    type=["csv"],
-    help="CSV should have the same columns as the IBM HR dataset (Attrition column optional)"
+    type=["csv", "parquet", "arrow", "feather", "ipc"],
+    help="CSV (or Parquet / Arrow IPC / Feather) with the same columns as the IBM HR dataset (Attrition column optional)"
 )
 
 if uploaded:
-    df_raw = pd.read_csv(uploaded)
+    upload_format = detect_format(uploaded)
+    df_raw = read_roster(uploaded, passthrough=True)
     st.success(f"Loaded {len(df_raw):,} employees with {df_raw.shape[1]} columns.")
 
     with st.expander("Preview uploaded data (first 5 rows)"):
@@ -108,14 +115,20 @@ if uploaded:
                 with st.expander("View full results table"):
                     st.dataframe(df_out, use_container_width=True)
 
-                # ── Download button
-                csv_buffer = io.BytesIO()
-                df_out.to_csv(csv_buffer, index=False)
+                # ── Download button (same format as the upload)
+                out_format = RESULT_FORMATS[upload_format]
+                out_buffer = io.BytesIO()
+                if out_format == 'parquet':
+                    df_out.to_parquet(out_buffer, index=False)
+                elif out_format == 'arrow':
+                    df_out.to_feather(out_buffer)
+                else:
+                    df_out.to_csv(out_buffer, index=False)
                 st.download_button(
-                    label="⬇️ Download Full Results as CSV",
-                    data=csv_buffer.getvalue(),
-                    file_name="eaps_batch_predictions.csv",
-                    mime="text/csv",
+                    label=f"⬇️ Download Full Results as {FORMAT_LABELS[out_format]}",
+                    data=out_buffer.getvalue(),
+                    file_name=f"eaps_batch_predictions.{out_format}",
+                    mime=MIMETYPES[out_format],
                     use_container_width=True
                 )
 
@@ -0,0 +1,28 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from utils import model_loader
+
+
+def test_upload_is_scored_by_the_snapshot_taken_at_the_start(monkeypatch):
+    from benchmark import synthetic_employees
+    from utils import batch
+
+    roster   = synthetic_employees(120, seed=3)
+    snapshot = model_loader.current_snapshot()
+    expected = np.concatenate([p for _, _, p in batch._scored_chunks(
+        batch.iter_chunks(roster, chunk_rows=40), 'Logistic Regression', snapshot=snapshot)])
+
+    def swapped():
+        raise AssertionError('served snapshot read mid-upload')
+
+    # A hot-swap after the first chunk: later chunks must not see it
+    chunks = batch._scored_chunks(batch.iter_chunks(roster, chunk_rows=40, plan=snapshot['feature_plan']),
+                                  'Logistic Regression', snapshot=snapshot)
+    scored = [next(chunks)[2]]
+    monkeypatch.setattr(model_loader, '_snapshot', swapped)
+    scored += [p for _, _, p in chunks]
+    assert len(scored) == 3
+    np.testing.assert_array_equal(np.concatenate(scored), expected)
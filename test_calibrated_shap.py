@@ -0,0 +1,37 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+import pandas as pd
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from utils.calibrated_shap import CalibratedTreeExplainer
+
+
+def _data(n=400, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, n_features)),
+                     columns=[f'f{i}' for i in range(n_features)])
+    y = (X['f0'] + 0.5 * X['f1'] + rng.normal(scale=0.5, size=n) > 0.8).astype(int)
+    return X, y
+
+
+def _check_additive(base):
+    X, y = _data()
+    model = CalibratedClassifierCV(base, method='isotonic', cv=3).fit(X, y)
+    explainer = CalibratedTreeExplainer(model)
+
+    sv = explainer.shap_values(X.head(50))
+    assert sv.shape == (50, X.shape[1])
+    recon = explainer.expected_value + sv.sum(axis=1)
+    np.testing.assert_allclose(recon, model.predict_proba(X.head(50))[:, 1], atol=1e-4)
+
+
+def test_calibrated_random_forest_is_additive():
+    _check_additive(RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0))
+
+
+def test_calibrated_xgboost_is_additive():
+    _check_additive(XGBClassifier(n_estimators=30, max_depth=3, verbosity=0, random_state=0))
@@ -0,0 +1,75 @@
+import sys
+sys.path.insert(0, '.')
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from utils import model_loader
+from utils.coalescer import PredictionCoalescer
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """predict_rows stub: records each (model, batch) and answers row → its first value."""
+    seen = []
+
+    def predict_rows(X, model_name):
+        seen.append((model_name, X.copy()))
+        if model_name == 'Broken':
+            raise ValueError('model exploded')
+        return [{'value': float(row[0])} for row in X]
+
+    # The dispatcher thread imports predict_rows when it starts
+    monkeypatch.setattr(model_loader, 'predict_rows', predict_rows)
+    return seen
+
+
+def _submit(coalescer, rows, model_name='Random Forest'):
+    """predict() for each row from its own thread; returns the futures in row order."""
+    pool = ThreadPoolExecutor(len(rows))
+    futures = [pool.submit(coalescer.predict, np.array([r, 0.0]), model_name) for r in rows]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_rows_within_the_window_share_one_call(calls):
+    coalescer = PredictionCoalescer(window_ms=300, max_rows=64)
+    try:
+        futures = _submit(coalescer, [1, 2, 3, 4, 5])
+        assert [f.result(timeout=5) for f in futures] == [{'value': float(r)} for r in (1, 2, 3, 4, 5)]
+        assert len(calls) == 1 and calls[0][1].shape == (5, 2)
+
+        stats = coalescer.stats()
+        assert (stats['batches'], stats['rows'], stats['max_batch_size']) == (1, 5, 5)
+        assert stats['mean_batch_size'] == 5 and stats['batch_size_hist']['<=8'] == 1
+        assert stats['queued'] == 0
+    finally:
+        coalescer.close()
+
+
+def test_full_batch_is_dispatched_before_the_window(calls):
+    coalescer = PredictionCoalescer(window_ms=20_000, max_rows=3)
+    try:
+        start = time.perf_counter()
+        futures = _submit(coalescer, [1, 2, 3])
+        assert sorted(f.result(timeout=5)['value'] for f in futures) == [1.0, 2.0, 3.0]
+        assert time.perf_counter() - start < 5
+        assert [X.shape[0] for _, X in calls] == [3]
+    finally:
+        coalescer.close()
+
+
+def test_batch_error_reaches_every_waiter(calls):
+    coalescer = PredictionCoalescer(window_ms=300, max_rows=64)
+    try:
+        futures = _submit(coalescer, [1, 2, 3], model_name='Broken')
+        for future in futures:
+            with pytest.raises(ValueError, match='model exploded'):
+                future.result(timeout=5)
+        assert len(calls) == 1
+        assert coalescer.stats()['rows'] == 3
+    finally:
+        coalescer.close()
@@ -0,0 +1,27 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from utils.dashboard import _box_stats, _shared_histogram
+
+
+def test_shared_histogram_counts_every_row_on_common_edges():
+    rng = np.random.default_rng(0)
+    stay, leave = rng.integers(18, 61, 5000), rng.integers(18, 61, 700)
+    h = _shared_histogram({'stay': stay, 'leave': leave})
+    assert len(h['edges']) <= 26
+    assert sum(h['stay']) == 5000 and sum(h['leave']) == 700
+    np.testing.assert_array_equal(h['stay'], np.histogram(stay, bins=h['edges'])[0])
+
+
+def test_box_stats_match_tukey_definition_and_cap_outliers():
+    rng = np.random.default_rng(1)
+    v = np.concatenate([rng.normal(5000, 800, 20000), rng.normal(30000, 2000, 500)])
+    b = _box_stats(v, max_outliers=50)
+    q1, med, q3 = np.percentile(v, [25, 50, 75])
+    assert (b['q1'], b['median'], b['q3']) == tuple(round(x, 2) for x in (q1, med, q3))
+    assert b['upperfence'] == round(v[v <= q3 + 1.5 * (q3 - q1)].max(), 2)
+    out = np.array(b['outliers'])
+    assert len(out) == 50 and np.all((out < b['lowerfence']) | (out > b['upperfence']))
+    assert len(b['density']['y']) == len(b['density']['w']) == 64
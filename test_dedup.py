@@ -0,0 +1,51 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from utils.model_loader import unique_rows, dedup_stats
+
+
+def test_unique_rows_scatter_back_to_every_row():
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0], [0.0, -0.0], [3.0, 4.0]])
+    first, inverse = unique_rows(X)
+    assert first.tolist() == [0, 1, 3]
+    np.testing.assert_array_equal(X[first][inverse], X)
+    assert dedup_stats(len(X), len(first)) == {'rows': 5, 'unique_rows': 3, 'ratio': 1.667}
+
+
+def test_memo_scores_rows_repeated_across_calls_once():
+    import pandas as pd
+    from benchmark import synthetic_employees
+    from utils.model_loader import score_rows
+    from utils.preprocess import preprocess_uploaded_csv
+
+    X = preprocess_uploaded_csv(synthetic_employees(50, seed=5))
+    memo = {}
+    first, scored = score_rows(X, 'Logistic Regression', dedup=True, memo=memo)
+    assert scored == 50 and len(memo) == 50
+    np.testing.assert_array_equal(first, score_rows(X, 'Logistic Regression', dedup=False)[0])
+
+    # A later chunk repeating earlier rows scores nothing new
+    again, scored = score_rows(pd.concat([X.iloc[:10]] * 2), 'Logistic Regression', dedup=True, memo=memo)
+    assert scored == 0
+    np.testing.assert_array_equal(again, np.tile(first[:10], 2))
+
+
+def test_memo_matches_rows_exactly_when_hashes_collide(monkeypatch):
+    from benchmark import synthetic_employees
+    from utils import model_loader
+    from utils.preprocess import preprocess_uploaded_csv
+
+    X = preprocess_uploaded_csv(synthetic_employees(30, seed=6))
+    chunks   = (X.iloc[:15], X.iloc[15:])
+    expected = np.concatenate([model_loader.score_rows(c, 'Logistic Regression', dedup=False)[0] for c in chunks])
+
+    # Every row hashes alike: dedup falls back to scoring all rows, never to sharing one probability
+    monkeypatch.setattr(model_loader, 'row_hashes', lambda X: np.zeros(len(X), dtype=np.uint64))
+    memo = {}
+    for chunk in chunks:
+        model_loader.score_rows(chunk, 'Logistic Regression', dedup=True, memo=memo)
+    probs, scored = model_loader.score_rows(X, 'Logistic Regression', dedup=True, memo=memo)
+    assert scored == 0 and len(memo) == 30
+    np.testing.assert_array_equal(probs, expected)
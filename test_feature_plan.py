@@ -0,0 +1,51 @@
+import sys
+sys.path.insert(0, '.')
+
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from utils.feature_plan import FeaturePlan
+
+FEATURES = ['Age', 'OverTime', 'BusinessTravel', 'MonthlyRate']
+
+
+def _plan():
+    encoders = {col: LabelEncoder().fit(vals) for col, vals in {
+        'OverTime':       ['No', 'Yes'],
+        'BusinessTravel': ['Non-Travel', 'Travel_Frequently', 'Travel_Rarely'],
+    }.items()}
+    return FeaturePlan(FEATURES, encoders,
+                       aliases={'Average_Hours_Worked_Per_Week': 'MonthlyRate'},
+                       defaults={'BusinessTravel': 'Travel_Rarely', 'MonthlyRate': 14000})
+
+
+def test_row_and_frame_share_aliases_defaults_and_encoders():
+    plan = _plan()
+    payloads = [
+        {'Age': 41, 'Overtime': 'Yes', 'Average_Hours_Worked_Per_Week': 45},
+        {'Age': '29', 'OverTime': 'Maybe', 'BusinessTravel': 'Non-Travel'},
+    ]
+    np.testing.assert_array_equal(plan.encode_row(payloads[0]), [41, 1, 2, 45])
+    np.testing.assert_array_equal(plan.encode_row(payloads[1]), [29, 0, 0, 14000])
+
+    frame = plan.encode_frame(pd.DataFrame([payloads[0]]))
+    assert list(frame.columns) == FEATURES
+    np.testing.assert_array_equal(frame.to_numpy(dtype=float)[0], plan.encode_row(payloads[0]))
+
+
+def test_pickle_round_trip_rebuilds_lookups():
+    plan = pickle.loads(pickle.dumps(_plan()))
+    codes = plan.encode_column('OverTime', pd.Series(['Yes', 'No', None]))
+    assert codes.tolist() == [1, 0, 0]
+    np.testing.assert_array_equal(plan.encode_row({}), [0, 0, 2, 14000])
+
+
+def test_category_dtype_encodes_like_strings():
+    plan = _plan()
+    values = pd.Series(['Travel_Rarely', None, 'Non-Travel', 'Space', 'Travel_Rarely'])
+    expected = plan.encode_column('BusinessTravel', values)
+    assert plan.encode_column('BusinessTravel', values.astype('category')).tolist() == expected.tolist()
+    assert expected.tolist() == [2, 0, 0, 0, 2]
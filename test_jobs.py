@@ -0,0 +1,38 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+import subprocess
+import uuid
+
+from utils import jobs
+
+
+def _job(tmp_path, **status):
+    job_id = uuid.uuid4().hex
+    os.makedirs(tmp_path / job_id)
+    jobs._write_json(str(tmp_path / job_id / jobs.STATUS_FILE),
+                     {'job_id': job_id, 'updated_at': jobs._now(), **status})
+    return job_id
+
+
+def test_job_of_an_exited_worker_reads_as_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOBS_DIR', str(tmp_path))
+    gone = subprocess.Popen([sys.executable, '-c', 'pass'])
+    gone.wait()
+
+    live    = _job(tmp_path, state='running', pid=os.getpid())
+    running = _job(tmp_path, state='running', pid=gone.pid)
+    queued  = _job(tmp_path, state='queued', pid=gone.pid)
+    assert jobs.job_status(live)['state'] == 'running'
+    for job_id in (running, queued):
+        status = jobs.job_status(job_id)
+        assert status['state'] == 'failed' and str(gone.pid) in status['error']
+        assert jobs._read_json(str(tmp_path / job_id / jobs.STATUS_FILE))['state'] == 'failed'
+
+
+def test_running_job_without_heartbeat_reads_as_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOBS_DIR', str(tmp_path))
+    stale = _job(tmp_path, state='running', pid=os.getpid(), updated_at='2020-01-01T00:00:00+00:00')
+    status = jobs.job_status(stale)
+    assert status['state'] == 'failed' and 'heartbeat' in status['error']
@@ -0,0 +1,61 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+
+from utils import model_registry as reg
+
+
+def _stage(root, payload):
+    version, staging = reg.begin_version(str(root))
+    with open(os.path.join(staging, 'random_forest.pkl'), 'w') as fh:
+        fh.write(payload)
+    return version, staging
+
+
+def test_staged_version_is_not_served_until_committed(tmp_path):
+    version, staging = _stage(tmp_path, 'v1')
+    assert reg.resolve_model_dir(str(tmp_path)) == (None, str(tmp_path))
+    assert reg.list_versions(str(tmp_path)) == []
+
+    final_dir = reg.commit_version(staging, version, root=str(tmp_path))
+    assert reg.resolve_model_dir(str(tmp_path)) == (version, final_dir)
+    assert 'random_forest.pkl' in reg.read_manifest(version, str(tmp_path))['files']
+
+
+def test_publish_rolls_back_and_changes_stamp(tmp_path):
+    v1, s1 = _stage(tmp_path, 'v1')
+    reg.commit_version(s1, v1, root=str(tmp_path))
+    v2, s2 = _stage(tmp_path, 'v2')
+    reg.commit_version(s2, v2, root=str(tmp_path))
+    assert reg.current_version(str(tmp_path)) == v2
+    assert reg.list_versions(str(tmp_path)) == [v1, v2]
+
+    stamp = reg.current_stamp(str(tmp_path))
+    reg.publish(v1, str(tmp_path))
+    assert reg.current_version(str(tmp_path)) == v1
+    assert reg.current_stamp(str(tmp_path)) != stamp   # CURRENT rewritten → new mtime
+
+
+def test_truncated_version_is_rejected(tmp_path):
+    version, staging = _stage(tmp_path, 'complete')
+    reg.commit_version(staging, version, root=str(tmp_path))
+    with open(os.path.join(reg.version_dir(version, str(tmp_path)), 'random_forest.pkl'), 'w') as fh:
+        fh.write('cut')
+    assert reg.read_manifest(version, str(tmp_path)) is None
+    assert reg.resolve_model_dir(str(tmp_path)) == (None, str(tmp_path))
+
+
+def test_abandoned_staging_directories_are_removed(tmp_path):
+    version, staging = _stage(tmp_path, 'failed run')
+    reg.abort_version(staging)
+    assert not os.path.exists(staging)
+
+    # A run killed mid-write: left alone while recent, removed once stale
+    _, killed = _stage(tmp_path, 'killed run')
+    _, fresh  = _stage(tmp_path, 'writing now')
+    assert os.path.isdir(killed)
+    old = reg.STAGING_MAX_AGE_S + 60
+    os.utime(killed, (os.path.getatime(killed) - old, os.path.getmtime(killed) - old))
+    assert reg.prune_versions(root=str(tmp_path)) == [os.path.basename(killed)]
+    assert not os.path.exists(killed) and os.path.isdir(fresh)
@@ -0,0 +1,19 @@
+import sys
+sys.path.insert(0, '.')
+
+import pandas as pd
+
+from utils import results_store
+
+
+def test_writer_falls_back_to_csv_when_a_later_chunk_changes_type(tmp_path, monkeypatch):
+    monkeypatch.setattr(results_store, 'RESULTS_DIR', str(tmp_path))
+    writer = results_store.ResultWriter()
+    writer.write(pd.DataFrame({'Age': [30, 41], 'Probability': [0.2, 0.9]}))
+    writer.write(pd.DataFrame({'Age': ['unknown', 52], 'Probability': [0.5, 0.1]}))
+    path = results_store.result_path(writer.close())
+
+    assert path.endswith('.csv')
+    out = pd.read_csv(path)
+    assert out['Age'].astype(str).tolist() == ['30', '41', 'unknown', '52']
+    assert out['Probability'].tolist() == [0.2, 0.9, 0.5, 0.1]
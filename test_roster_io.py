@@ -0,0 +1,38 @@
+import sys
+sys.path.insert(0, '.')
+
+import io
+
+import pandas as pd
+import pyarrow as pa
+
+from utils import roster_io
+
+
+def _uploads(df):
+    csv, parquet, arrow, stream = io.BytesIO(), io.BytesIO(), io.BytesIO(), io.BytesIO()
+    df.to_csv(csv, index=False)
+    df.to_parquet(parquet, index=False)
+    df.to_feather(arrow)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table, max_chunksize=2)
+    return {'csv': csv, 'parquet': parquet, 'arrow': arrow, 'arrow-stream': stream}
+
+
+def test_formats_are_detected_by_content_and_read_alike():
+    df = pd.DataFrame({'Age': [30, 41, 52, 25, 38], 'OverTime': ['Yes', 'No', 'No', None, 'Yes'],
+                       'Extra': [1.5, 2.5, 3.5, 4.5, 5.5]})
+    for fmt, upload in _uploads(df).items():
+        upload.seek(0)
+        assert roster_io.detect_format(upload) == fmt
+        assert roster_io.read_columns(upload, fmt) == list(df.columns)
+
+        frame = roster_io.read_frame(upload, fmt, ['Age', 'OverTime'], ['OverTime'])
+        assert list(frame.columns) == ['Age', 'OverTime']
+        assert isinstance(frame['OverTime'].dtype, pd.CategoricalDtype), fmt
+        assert frame['OverTime'].astype(object).fillna('-').tolist() == df['OverTime'].fillna('-').tolist()
+
+        chunks = list(roster_io.iter_frames(upload, fmt, 2, ['Age']))
+        assert [len(c) for c in chunks] == [2, 2, 1]
+        assert pd.concat(chunks)['Age'].tolist() == df['Age'].tolist()
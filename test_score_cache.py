@@ -0,0 +1,32 @@
+import sys
+sys.path.insert(0, '.')
+
+import io
+import os
+
+import numpy as np
+
+from utils import score_cache
+
+
+def test_round_trip_and_least_recently_used_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(score_cache, 'CACHE_BYTES', 2500)   # room for two 1,000-byte entries
+
+    path = tmp_path / 'roster.csv'
+    path.write_bytes(b'Age,OverTime\n41,Yes\n')
+    key = score_cache.upload_key(str(path))
+    assert key == score_cache.upload_key(io.BytesIO(path.read_bytes()))
+
+    probs = {m: np.full(110, i / 10) for i, m in enumerate(('RF', 'SVM', 'LR'))}
+    score_cache.store(key, 'v1', 'proba', probs['RF'], 'RF')
+    score_cache.store(key, 'v1', 'proba', probs['SVM'], 'SVM')
+    for entry in os.listdir(tmp_path):                       # make RF the most recently used
+        os.utime(tmp_path / entry, (1, 1))
+    np.testing.assert_array_equal(score_cache.load(key, 'v1', 'proba', 'RF'), probs['RF'])
+    score_cache.store(key, 'v1', 'proba', probs['LR'], 'LR')
+
+    assert score_cache.load(key, 'v1', 'proba', 'SVM') is None
+    assert score_cache.load(key, 'v1', 'proba', 'RF') is not None
+    assert score_cache.load(key, 'v2', 'proba', 'LR') is None
+    np.testing.assert_array_equal(score_cache.load(key, 'v1', 'proba', 'LR'), probs['LR'])
@@ -0,0 +1,51 @@
+import sys
+sys.path.insert(0, '.')
+
+import importlib
+
+from utils.stage_cache import StageCache
+
+STAGES = '''
+from stage_helpers import scale
+
+
+def _offset():
+    return {offset}
+
+
+def stage(x):
+    return scale(x) + _offset()
+'''
+
+
+def _write(path, text):
+    path.write_text(text)
+    importlib.invalidate_caches()
+
+
+def test_editing_a_helper_misses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    _write(tmp_path / 'stage_helpers.py', 'def scale(x):\n    return 2 * x\n')
+    _write(tmp_path / 'stage_module.py', STAGES.format(offset=1))
+    import stage_helpers, stage_module
+
+    def run():
+        stages = StageCache(str(tmp_path / 'cache'), code=['stage_helpers'])
+        output, _ = stages.run('stage', [], stage_module.stage, 5)
+        return output, stages.runs
+
+    assert run() == (11, ['stage'])
+    assert run() == (11, [])
+
+    # A helper in the stage's own module
+    _write(tmp_path / 'stage_module.py', STAGES.format(offset=100))
+    importlib.reload(stage_module)
+    assert run() == (110, ['stage'])
+
+    # Repo code the stage calls, listed in code=
+    _write(tmp_path / 'stage_helpers.py', 'def scale(x):\n    return 3 * x\n')
+    importlib.reload(stage_helpers)
+    importlib.reload(stage_module)
+    assert run() == (115, ['stage'])
+    assert run() == (115, [])
@@ -0,0 +1,75 @@
+import sys
+sys.path.insert(0, '.')
+
+import io
+from contextlib import redirect_stdout
+
+import joblib
+import numpy as np
+
+from benchmark import synthetic_employees
+from eaps_ml_pipeline import train
+from utils import model_registry as reg
+
+# Small trees keep the three training runs fast
+FAST = {'Random Forest': {'n_estimators': 10}, 'XGBoost': {'n_estimators': 10}}
+
+
+def _train(tmp_path, params):
+    with redirect_stdout(io.StringIO()):
+        return train(data_files=[str(tmp_path / 'roster.csv')], params=params,
+                     model_root=str(tmp_path / 'models'),
+                     results_dir=str(tmp_path / 'results'))
+
+
+def test_only_changed_model_is_retrained(tmp_path):
+    df = synthetic_employees(400, seed=3)
+    df['Attrition'] = np.where(np.random.default_rng(3).random(400) < 0.2, 'Yes', 'No')
+    df.to_csv(tmp_path / 'roster.csv', index=False)
+
+    first = _train(tmp_path, FAST)
+    assert first['stages']['cached'] == []
+    assert reg.current_version(str(tmp_path / 'models')) == first['version']
+    assert (tmp_path / 'results' / 'roc_curves.png').exists()
+
+    # Prefit calibration: a single calibrated ensemble in the artifact
+    version_dir = reg.version_dir(first['version'], str(tmp_path / 'models'))
+    rf = joblib.load(f'{version_dir}/random_forest.pkl')
+    assert len(rf.calibrated_classifiers_) == 1
+    assert set(first['calibration']) == {'Random Forest', 'XGBoost'}
+
+    again = _train(tmp_path, FAST)
+    assert again['stages']['run'] == []
+    assert again['results'] == first['results']
+
+    tuned = _train(tmp_path, {**FAST, 'Logistic Regression': {'C': 0.1}})
+    assert tuned['stages']['run'] == ['fit Logistic Regression',
+                                      'evaluate Logistic Regression', 'plot']
+    assert tuned['results']['XGBoost'] == first['results']['XGBoost']
+
+
+def test_failed_plot_publishes_nothing(tmp_path, monkeypatch):
+    import pytest
+    import eaps_ml_pipeline
+
+    df = synthetic_employees(300, seed=4)
+    df['Attrition'] = np.where(np.random.default_rng(4).random(300) < 0.2, 'Yes', 'No')
+    df.to_csv(tmp_path / 'roster.csv', index=False)
+
+    def plot(*args):
+        raise RuntimeError('plotting failed')
+
+    monkeypatch.setattr(eaps_ml_pipeline, 'plot', plot)
+    with pytest.raises(RuntimeError, match='plotting failed'):
+        _train(tmp_path, FAST)
+    assert reg.current_version(str(tmp_path / 'models')) is None
+    assert not (tmp_path / 'models' / 'versions').exists()
+
+
+def test_thread_budgets_give_single_threaded_fits_one_core():
+    from eaps_ml_pipeline import thread_budgets
+    names = ['Logistic Regression', 'SVM', 'Random Forest', 'XGBoost']
+    assert thread_budgets(names, 8) == {'Logistic Regression': 1, 'SVM': 1,
+                                        'Random Forest': 3, 'XGBoost': 3}
+    assert thread_budgets(names, 9)['Random Forest'] == 4
+    assert thread_budgets(names, 2) == dict.fromkeys(names, 1)
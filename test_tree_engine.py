@@ -0,0 +1,72 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+import pandas as pd
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from utils.tree_engine import CompiledTreeEnsemble, InplaceBooster
+
+
+def _data(n=500, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, n_features)),
+                     columns=[f'f{i}' for i in range(n_features)])
+    y = (X['f0'] - X['f2'] + rng.normal(scale=0.7, size=n) > 0.5).astype(int)
+    return X, y
+
+
+def _assert_parity(model, X, atol):
+    native = CompiledTreeEnsemble(model).predict_proba(X.values)
+    np.testing.assert_allclose(native, model.predict_proba(X), atol=atol)
+
+
+def test_calibrated_random_forest_parity():
+    X, y = _data()
+    rf = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0)
+    model = CalibratedClassifierCV(rf, method='isotonic', cv=3).fit(X, y)
+    _assert_parity(model, X, atol=1e-12)
+
+
+def test_calibrated_xgboost_parity():
+    X, y = _data()
+    xgb = XGBClassifier(n_estimators=40, max_depth=4, verbosity=0, random_state=0)
+    model = CalibratedClassifierCV(xgb, method='isotonic', cv=3).fit(X, y)
+    # XGBoost accumulates leaf values in float32
+    _assert_parity(model, X, atol=1e-4)
+
+
+def test_uncalibrated_and_sigmoid_models():
+    X, y = _data()
+    rf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    _assert_parity(rf, X, atol=1e-12)
+
+    xgb = XGBClassifier(n_estimators=20, max_depth=3, verbosity=0, random_state=0)
+    sig = CalibratedClassifierCV(xgb, method='sigmoid', cv=3).fit(X, y)
+    _assert_parity(sig, X, atol=1e-4)
+
+
+def test_missing_values_follow_learned_direction():
+    X, y = _data()
+    xgb = XGBClassifier(n_estimators=20, max_depth=3, verbosity=0, random_state=0).fit(X, y)
+    X_nan = X.copy()
+    X_nan.iloc[::5, 0] = np.nan
+    _assert_parity(xgb, X_nan, atol=1e-4)
+
+
+def test_inplace_booster_uses_early_stopped_rounds():
+    X, y = _data(800)
+    xgb = XGBClassifier(n_estimators=300, max_depth=3, tree_method='hist', early_stopping_rounds=10,
+                        verbosity=0, random_state=0)
+    xgb.fit(X[:600], y[:600], eval_set=[(X[600:], y[600:])], verbose=False)
+    assert xgb.best_iteration + 1 < xgb.get_booster().num_boosted_rounds()
+
+    # eaps_ml_pipeline's prefit calibration (FrozenEstimator, or cv='prefit' before
+    # scikit-learn 1.6): the early-stopped booster stays inside
+    from eaps_ml_pipeline import _prefit_calibrator
+    model = _prefit_calibrator(xgb).fit(X[600:], y[600:])
+    for fitted in (xgb, model):
+        inplace = InplaceBooster(fitted, nthread=2).predict_proba(X)
+        np.testing.assert_allclose(inplace, fitted.predict_proba(X), atol=1e-6)
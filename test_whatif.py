@@ -0,0 +1,33 @@
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+import pandas as pd
+
+from utils.whatif import ThresholdIndex, actual_labels
+
+
+def test_index_matches_brute_force_counts_and_metrics():
+    rng    = np.random.default_rng(3)
+    probs  = np.round(rng.random(2_000), 2)           # plenty of ties at the thresholds
+    actual = (rng.random(2_000) < probs).astype(np.int8)
+    index  = ThresholdIndex(probs, actual)
+
+    for t in (0.0, 0.25, 0.4, 0.55, 1.0):
+        got     = index.at(t)
+        flagged = probs >= t
+        assert got['leavers'] == flagged.sum()
+        assert got['risk_counts'] == {'HIGH':   int(flagged.sum()),
+                                      'MEDIUM': int(((probs >= 0.4) & ~flagged).sum()),
+                                      'LOW':    int(((probs < 0.4) & ~flagged).sum())}
+        tp = int(actual[flagged].sum())
+        assert got['actual']['recall'] == round(tp / actual.sum(), 4)
+        assert got['actual']['precision'] == (round(tp / flagged.sum(), 4) if flagged.any() else None)
+        assert got['expected']['recall'] == round(probs[flagged].sum() / probs.sum(), 4)
+
+
+def test_actual_labels_follow_the_training_pipeline_mapping():
+    df = pd.DataFrame({'Attrition': ['Yes', 'No', ' yes', '1', 'true', 0]})
+    assert actual_labels(df).tolist() == [1, 0, 1, 1, 1, 0]
+    assert actual_labels(pd.DataFrame({'Attrition': ['Yes', None]})) is None
+    assert actual_labels(pd.DataFrame({'Age': [30]})) is None
@@ -0,0 +1,432 @@
+"""
+utils/batch.py
+Batch scoring behind /api/batch and /api/compare-batch.
+
+The same functions serve the synchronous endpoints and background jobs
+(utils/jobs.py). Rows are scored in chunks of CHUNK_ROWS so a job can report
+progress; scoring is row-independent, so chunking does not change results.
+
+score_batch streams: a roster (DataFrame, or a path / file object in any
+utils/roster_io.py format) is read CHUNK_ROWS at a time and each chunk is
+preprocessed, scored, labelled and written out (results file,
+latest_batch_results.csv) before the next one is read. The summary is
+accumulated on the way, so memory stays bounded by the chunk size however
+large the upload is.
+
+Uploads given as a path or file object are content-addressed
+(utils/score_cache.py): scoring the same bytes again with the same model
+version reuses the stored probabilities instead of running inference.
+"""
+
+import heapq
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR    = os.path.join(os.path.dirname(__file__), '..', 'data')
+LATEST_FILE = 'latest_batch_results.csv'
+CHUNK_ROWS  = 5_000
+PREVIEW_ROWS = 20
+
+COMPARE_MODELS = ['Random Forest', 'XGBoost', 'SVM', 'Logistic Regression']
+PREVIEW_COLUMNS = ['Age', 'Department', 'JobRole', 'MonthlyIncome', 'OverTime']
+RISK_LEVELS     = ('HIGH', 'MEDIUM', 'LOW')
+
+
+def _risk_level(p: float) -> str:
+    return 'HIGH' if p >= 0.70 else ('MEDIUM' if p >= 0.40 else 'LOW')
+
+
+def _risk_levels(probs) -> np.ndarray:
+    """Vectorized _risk_level."""
+    probs = np.asarray(probs)
+    return np.select([probs >= 0.70, probs >= 0.40], ['HIGH', 'MEDIUM'], 'LOW')
+
+
+def _plain(values: pd.Series) -> pd.Series:
+    """Categorical (as parsed by read projection) → its plain dtype, for stored results."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(values.cat.categories.dtype)
+    return values
+
+
+def _noop(done, total, stage=None):
+    pass
+
+
+def _projection(columns, passthrough: bool = False, plan=None):
+    """
+    (usecols, dtype) for reading a roster with this header. Aliases are
+    resolved against the header first; only feature and display (preview /
+    dashboard) columns are parsed unless passthrough is set, and the encoded
+    categorical features are parsed as category. plan defaults to the served
+    model's feature plan.
+    """
+    from utils.preprocess import current_feature_plan
+    from utils.dashboard  import CHART_ALIASES, CHART_COLUMNS
+    from utils.whatif     import ACTUAL_COLUMNS
+
+    plan   = plan or current_feature_plan()
+    source = plan.source_columns(columns)
+    dtype  = {raw: 'category' for feat, raw in source.items() if feat in plan.categories}
+    if passthrough:
+        return list(columns), dtype
+
+    aliases = {**plan.aliases, **CHART_ALIASES}
+    display = CHART_COLUMNS.union(PREVIEW_COLUMNS, ACTUAL_COLUMNS)
+    keep    = set(source.values()) | {c for c in columns if aliases.get(c, c) in display}
+    return [c for c in columns if c in keep], dtype
+
+
+def read_roster(source, passthrough: bool = False, plan=None) -> pd.DataFrame:
+    """A whole roster (path or file object in any utils.roster_io format), projected like iter_chunks."""
+    from utils import roster_io
+
+    fmt = roster_io.detect_format(source)
+    usecols, dtype = _projection(roster_io.read_columns(source, fmt), passthrough, plan)
+    return roster_io.read_frame(source, fmt, usecols, list(dtype))
+
+
+def iter_chunks(source, chunk_rows: int = CHUNK_ROWS, passthrough: bool = False, plan=None):
+    """
+    DataFrame slices of a roster: an in-memory DataFrame, or a path / file
+    object in any utils.roster_io format (CSV, Parquet, Arrow IPC, Feather),
+    read lazily. Only the columns scoring and the export need are kept
+    unless passthrough is set (see _projection).
+    """
+    if isinstance(source, pd.DataFrame):
+        usecols, _ = _projection(source.columns, passthrough, plan)
+        source = source[usecols]
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+        return
+
+    from utils import roster_io
+    fmt = roster_io.detect_format(source)
+    usecols, dtype = _projection(roster_io.read_columns(source, fmt), passthrough, plan)
+    yield from roster_io.iter_frames(source, fmt, chunk_rows, usecols, list(dtype))
+
+
+def proba_chunked(df_feat, model_name: str, progress=_noop, done: int = 0, total: int = None,
+                  snapshot: dict = None):
+    """
+    Raw probabilities (model_loader.score_rows) over CHUNK_ROWS slices,
+    calling progress(rows_done, rows_total, model_name). Every slice is
+    scored by the same model snapshot (default: the one served at the start).
+    """
+    from utils.model_loader import score_rows, current_snapshot
+
+    snapshot = snapshot or current_snapshot()
+    total = len(df_feat) if total is None else total
+    parts = []
+    for start in range(0, len(df_feat), CHUNK_ROWS):
+        parts.append(score_rows(df_feat.iloc[start:start + CHUNK_ROWS], model_name, dedup=False,
+                                snapshot=snapshot)[0])
+        progress(done + start + len(parts[-1]), total, model_name)
+    if not parts:
+        return score_rows(df_feat, model_name, dedup=False, snapshot=snapshot)[0]
+    return np.concatenate(parts)
+
+
+def _scored_chunks(chunks, model_name: str, dedup: bool = None, cached=None, snapshot: dict = None):
+    """
+    Generator stage: raw chunk → (raw chunk, results with Risk_Level, raw
+    probabilities). With cached probabilities (utils.score_cache) chunks are
+    only encoded and labelled. Dedup shares one row → probability memo
+    across chunks, so a row repeated anywhere in the upload is scored once.
+    Every chunk is encoded, scored and labelled by one model snapshot
+    (default: the one served when the first chunk is read).
+    """
+    from utils.model_loader import score_rows, label_batch, dedup_stats, current_snapshot
+
+    snapshot = snapshot or current_snapshot()
+    plan  = snapshot['feature_plan']
+    start = 0
+    memo  = {}
+    for df_raw in chunks:
+        df_feat = plan.encode_frame(df_raw)
+        if cached is None:
+            probs, unique = score_rows(df_feat, model_name, dedup, memo, snapshot)
+        else:
+            probs, unique = np.asarray(cached[start:start + len(df_feat)]), None
+        start += len(df_feat)
+
+        df_results = label_batch(df_feat, probs, model_name, snapshot)
+        if unique is not None:
+            df_results.attrs['dedup'] = dedup_stats(len(df_results), unique)
+        df_results['Risk_Level'] = _risk_levels(df_results['Probability'].to_numpy())
+        yield df_raw, df_results, probs
+
+
+class _Summary:
+    """Running /api/batch summary: counts, probability sum and the top high-risk rows."""
+
+    def __init__(self):
+        self.total    = 0
+        self.leavers  = 0
+        self.prob_sum = 0.0
+        self.risk     = dict.fromkeys(RISK_LEVELS, 0)
+        self._top     = []    # heap of (probability, -row number, record)
+        self.unique   = None  # distinct rows scored, when predict_batch deduplicated
+
+    def add(self, df_results, preview_cols: list):
+        if 'dedup' in df_results.attrs:
+            self.unique = (self.unique or 0) + df_results.attrs['dedup']['unique_rows']
+        probs = df_results['Probability'].to_numpy()
+        self.leavers  += int((df_results['Prediction'] == 'Leave').sum())
+        self.prob_sum += float(probs.sum())
+        levels, counts = np.unique(df_results['Risk_Level'].to_numpy(), return_counts=True)
+        for level, n in zip(levels, counts):
+            self.risk[level] += int(n)
+
+        # Top high-risk rows of this chunk, then merge into the running top list
+        pos = np.flatnonzero(df_results['Risk_Level'].to_numpy() == 'HIGH')
+        pos = pos[np.lexsort((pos, -probs[pos]))][:PREVIEW_ROWS]
+        recs = df_results.iloc[pos][preview_cols].round({'Probability': 4}).to_dict(orient='records')
+        for p, rec in zip(pos, recs):
+            # Highest probability first; ties keep upload order
+            item = (float(probs[p]), -(self.total + int(p)), rec)
+            if len(self._top) < PREVIEW_ROWS:
+                heapq.heappush(self._top, item)
+            elif item[:2] > self._top[0][:2]:
+                heapq.heapreplace(self._top, item)
+        self.total += len(df_results)
+
+    def top(self) -> list:
+        return [rec for *_, rec in sorted(self._top, key=lambda t: t[:2], reverse=True)]
+
+
+def score_batch(source, model_name: str = 'Random Forest', threshold: float = 0.5,
+                progress=_noop, total_rows: int = None, passthrough: bool = False,
+                dedup: bool = None) -> dict:
+    """
+    Score an uploaded roster with one model, CHUNK_ROWS at a time. source is a
+    DataFrame, or a path / file object in CSV, Parquet, Arrow IPC or Feather
+    format. Writes data/latest_batch_results.csv for the dashboard, stores the
+    full results (utils/results_store.py) and returns the /api/batch response
+    body: summary plus a download link (result_format matches the upload).
+    The export keeps feature and display columns; passthrough=True keeps every
+    uploaded column. dedup (default model_loader.DEDUP_ROWS) scores identical
+    encoded rows once per upload, across chunks, and adds a 'dedup' report to
+    the response.
+    Probabilities of an upload already scored with this model version come
+    from utils.score_cache ('cached': true) — the roster is still read for
+    the export, but nothing is re-scored. whatif_url answers other thresholds
+    from the stored probabilities (utils/whatif.py).
+    """
+    from utils.model_loader  import current_snapshot
+    from utils.results_store import ResultWriter
+    from utils.dashboard     import materialize
+    from utils.roster_io     import detect_format, RESULT_FORMATS
+    from utils.whatif        import actual_labels, save_indexes
+    from utils import score_cache
+
+    if isinstance(source, pd.DataFrame):
+        total_rows    = len(source) if total_rows is None else total_rows
+        result_format = 'csv'
+    else:
+        result_format = RESULT_FORMATS[detect_format(source)]
+
+    # One model snapshot for the whole upload: a hot-swap mid-upload must not mix versions
+    snapshot = current_snapshot()
+    key      = score_cache.upload_key(source)
+    version  = snapshot['fingerprint']
+    cached   = score_cache.load(key, version, 'proba', model_name)
+    scored  = []      # raw probabilities, for the what-if index and the cache
+    actual  = []      # uploaded Attrition labels, while every chunk has them
+
+    latest     = os.path.join(DATA_DIR, LATEST_FILE)
+    latest_tmp = f'{latest}.{uuid.uuid4().hex}.tmp'
+    writer     = ResultWriter()
+    summary    = _Summary()
+    chunks     = iter_chunks(source, passthrough=passthrough, plan=snapshot['feature_plan'])
+    try:
+        for df_raw, df_results, probs in _scored_chunks(chunks, model_name, dedup, cached, snapshot):
+            scored.append(probs)
+            if actual is not None:
+                labels = actual_labels(df_raw)
+                actual = None if labels is None else actual + [labels]
+            # Latest batch results for the dashboard: upload + prediction columns
+            df_export = df_raw.copy()
+            for col in ('Prediction', 'Probability', 'Risk_Level'):
+                df_export[col] = df_results[col].values
+            df_export.to_csv(latest_tmp, mode='a', header=summary.total == 0, index=False)
+
+            # Full results keep the preview columns of the upload
+            preview_cols = ['Prediction', 'Probability', 'Risk_Level']
+            for col in PREVIEW_COLUMNS:
+                if col in df_raw.columns:
+                    df_results[col] = _plain(df_raw[col]).values
+                    preview_cols    = [col] + preview_cols
+            writer.write(df_results)
+            summary.add(df_results, preview_cols)
+            progress(summary.total, total_rows or summary.total, model_name)
+        if summary.total == 0:
+            raise ValueError('The uploaded file has no rows.')
+    except BaseException:
+        writer.discard()
+        if os.path.exists(latest_tmp):
+            os.remove(latest_tmp)
+        raise
+
+    os.replace(latest_tmp, latest)
+    scored = np.concatenate(scored)
+    if cached is None:
+        score_cache.store(key, version, 'proba', scored, model_name)
+    materialize()
+    result_id = writer.close()
+    save_indexes(result_id, {model_name: scored}, None if actual is None else np.concatenate(actual))
+
+    # Use the user-supplied threshold if different from optimal, else use model's optimal
+    saved_thresholds = snapshot['thresholds']
+    optimal_thresh   = saved_thresholds.get(model_name, 0.5)
+    # If user passed threshold explicitly (not default 0.5), honour it; else use optimal
+    effective_thresh = threshold if threshold != 0.5 else optimal_thresh
+
+    response = {
+        'total':         summary.total,
+        'leavers':       summary.leavers,
+        'high_risk':     summary.risk['HIGH'],
+        'avg_prob':      round(summary.prob_sum / summary.total * 100, 1),
+        'threshold_used': round(effective_thresh, 4),
+        'optimal_threshold': round(optimal_thresh, 4),
+        'risk_counts':   {k: v for k, v in summary.risk.items() if v},
+        'high_risk_table': summary.top(),
+        'result_id':     result_id,
+        'download_url':  f'/api/results/{result_id}/download',
+        'whatif_url':    f'/api/results/{result_id}/whatif',
+        'result_format': result_format,
+        'cached':        cached is not None,
+    }
+    if summary.unique is not None:
+        from utils.model_loader import dedup_stats
+        response['dedup'] = dedup_stats(summary.total, summary.unique)
+    return response
+
+
+def _compare_summary(proba, model_threshold: float, threshold: float) -> dict:
+    """
+    One model's /api/compare-batch summary, vectorized. Leavers use the raw
+    probability at the model's saved threshold (like predict_batch); risk
+    bands and histogram buckets the 4-dp Probability shown to users, with
+    HIGH from the requested threshold.
+    """
+    rounded = np.round(proba, 4)
+    total   = len(rounded)
+    leavers = int((proba >= model_threshold).sum())
+    high    = int((rounded >= threshold).sum())
+    medium  = int(((rounded >= 0.4) & (rounded < threshold)).sum())
+    low     = total - high - medium
+    # Probability histogram buckets (0-10%, 10-20%, ... 90-100%); bucket = floor(p * 10), 1.0 in the last
+    buckets, _ = np.histogram(rounded * 10, bins=10, range=(0, 10))
+    return {
+        'total':   total,
+        'leavers': leavers,
+        'attrition_rate': round(leavers / total * 100, 2) if total else 0,
+        'high_risk':  high,
+        'medium_risk': medium,
+        'low_risk':   low,
+        'avg_prob': round(float(rounded.mean() * 100), 2),
+        'risk_counts': {k: n for k, n in (('HIGH', high), ('MEDIUM', medium), ('LOW', low)) if n},
+        'prob_buckets': buckets.tolist(),
+    }
+
+
+def compare_batch(source, threshold: float = 0.5, progress=_noop, dedup: bool = None) -> dict:
+    """
+    Score an uploaded roster (DataFrame, or path / file object as for
+    score_batch) with every model; the /api/compare-batch response body.
+    With dedup (default model_loader.DEDUP_ROWS) each distinct encoded row is
+    scored once per model and the response carries a 'dedup' report.
+
+    Per-model probabilities and the encoded matrix are cached by upload
+    (utils/score_cache.py): the roster is only read and encoded when some
+    model still has to score it, and a repeat upload at another threshold
+    runs no inference at all ('cached': true). whatif_url answers other
+    thresholds for every model from the probabilities (utils/whatif.py).
+    """
+    from utils import score_cache
+    from utils.whatif       import actual_labels, save_indexes
+    from utils.model_loader import (DEDUP_ROWS, unique_rows, dedup_stats,
+                                    current_snapshot, fan_out)
+
+    # One model snapshot for every model and chunk of the upload
+    snapshot = current_snapshot()
+    key      = score_cache.upload_key(source)
+    version  = snapshot['fingerprint']
+    probs   = {m: score_cache.load(key, version, 'proba', m) for m in COMPARE_MODELS}
+    missing = [m for m in COMPARE_MODELS if probs[m] is None]
+
+    # Uploaded Attrition labels (empty entry: the upload has none)
+    actual = score_cache.load(key, version, 'actual')
+    actual = np.asarray(actual, dtype=np.int8) if actual is not None and len(actual) else None
+
+    df_scored, inverse = None, None
+    X = score_cache.load(key, version, 'features') if missing else None
+    if missing and X is None:
+        df_raw = source if isinstance(source, pd.DataFrame) else read_roster(source, plan=snapshot['feature_plan'])
+        X      = snapshot['feature_plan'].encode_frame(df_raw).to_numpy(dtype=np.float64)
+        actual = actual_labels(df_raw)
+        score_cache.store(key, version, 'features', X)
+        score_cache.store(key, version, 'actual', np.empty(0) if actual is None else actual)
+    if missing:
+        n_rows    = len(X)
+        df_scored = pd.DataFrame(np.asarray(X), columns=snapshot['feature_plan'].feature_names)
+        if (DEDUP_ROWS if dedup is None else dedup) and n_rows:
+            # One dedup pass shared by all models still to score
+            first, inverse = unique_rows(df_scored.to_numpy())
+            df_scored = df_scored.iloc[first]
+    else:
+        n_rows = len(probs[COMPARE_MODELS[0]])
+
+    saved_thresholds = snapshot['thresholds']
+
+    n_scored   = n_rows if df_scored is None else len(df_scored)
+    total_rows = n_scored * len(COMPARE_MODELS)
+    rows_done  = dict.fromkeys(COMPARE_MODELS, 0)
+    lock       = threading.Lock()
+
+    def model_progress(mname):
+        # Models report from their own threads; progress sees the rows done over all of them
+        def report(done, total=None, stage=None):
+            with lock:
+                rows_done[mname] = done
+                progress(sum(rows_done.values()), total_rows, mname)
+        return report
+
+    def run(mname):
+        """(summary, raw probabilities or None) of one model."""
+        try:
+            proba = probs[mname]
+            if proba is None:
+                proba = proba_chunked(df_scored, mname, model_progress(mname), snapshot=snapshot)
+                if inverse is not None:
+                    proba = proba[inverse]
+                score_cache.store(key, version, 'proba', proba, mname)
+            return _compare_summary(proba, saved_thresholds.get(mname, 0.5), threshold), proba
+        except Exception as me:
+            return {'error': str(me)}, None
+        finally:
+            model_progress(mname)(n_scored)
+
+    # One task per model on the shared, read-only encoded matrix
+    outcomes = fan_out(run, COMPARE_MODELS)
+    summary  = {m: s for m, (s, _) in zip(COMPARE_MODELS, outcomes)}
+    scored   = {m: p for m, (_, p) in zip(COMPARE_MODELS, outcomes) if p is not None}
+
+    whatif_id = uuid.uuid4().hex
+    save_indexes(whatif_id, scored, actual)
+
+    response = {
+        'total':    n_rows,
+        'summary':  summary,
+        'thresholds': saved_thresholds,
+        'cached':   not missing,
+        'whatif_url': f'/api/results/{whatif_id}/whatif',
+    }
+    if inverse is not None:
+        response['dedup'] = dedup_stats(n_rows, n_scored)
+    return response
@@ -0,0 +1,135 @@
+"""
+utils/calibrated_shap.py
+SHAP attributions for the calibrated tree ensembles saved by eaps_ml_pipeline.py.
+
+shap.TreeExplainer cannot take CalibratedClassifierCV directly, so each fold is
+explained separately:
+  1. TreeSHAP on the fold's base estimator (RF → probability, XGBoost → log-odds)
+  2. The fold's attributions are mapped through its isotonic calibrator by
+     rescaling them so they still sum to  iso(f(x)) - iso(f(base))
+  3. Folds are averaged, exactly like CalibratedClassifierCV.predict_proba
+
+The result is additive in calibrated-probability space:
+    expected_value + shap_values(X).sum(axis=1) == model.predict_proba(X)[:, 1]
+"""
+
+import numpy as np
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _unwrap(estimator):
+    """Strip sklearn's FrozenEstimator (prefit calibration) if present."""
+    if type(estimator).__name__ == 'FrozenEstimator':
+        return estimator.estimator
+    return estimator
+
+
+def calibrated_folds(model):
+    """
+    Return [(base_estimator, isotonic_calibrator), ...] for a fitted
+    CalibratedClassifierCV, handling attribute names across sklearn versions.
+    """
+    folds = []
+    for cc in model.calibrated_classifiers_:
+        base = getattr(cc, 'estimator', None) or getattr(cc, 'base_estimator', None)
+        calibrators = getattr(cc, 'calibrators', None) or getattr(cc, 'calibrators_', None)
+        folds.append((_unwrap(base), calibrators[0]))
+    return folds
+
+
+def isotonic_table(calibrator):
+    """
+    (x, y) breakpoints of a fitted IsotonicRegression.
+    np.interp(v, x, y) reproduces IsotonicRegression.predict with
+    out_of_bounds='clip' without sklearn's per-call validation.
+    Returns None for non-isotonic calibrators.
+    """
+    if hasattr(calibrator, 'X_thresholds_'):
+        return (np.asarray(calibrator.X_thresholds_, dtype=np.float64),
+                np.asarray(calibrator.y_thresholds_, dtype=np.float64))
+    return None
+
+
+class _FoldExplainer:
+    """TreeSHAP for one fold plus the link from explainer output to calibrator input."""
+
+    def __init__(self, base, calibrator):
+        import shap
+        self.explainer = shap.TreeExplainer(base)
+        # XGBoost is explained in margin (log-odds) space; sklearn trees in probability space
+        self.logit_output = hasattr(base, 'get_booster')
+        self.table = isotonic_table(calibrator)
+        self.calibrator = calibrator
+
+        ev = np.asarray(self.explainer.expected_value, dtype=np.float64).ravel()
+        self.base_value = float(ev[-1])
+
+        # Some shap/xgboost combinations report expected_value with the wrong
+        # base_score; anchor it on the model's actual output for a reference row.
+        n_features = getattr(base, 'n_features_in_', None)
+        if n_features:
+            ref = np.zeros((1, n_features))
+            true_out = self._raw_predict(base, ref)[0]
+            self.base_value += true_out - (self.base_value + self.raw_shap(ref).sum())
+
+    def _raw_predict(self, base, X):
+        if self.logit_output:
+            return np.asarray(base.predict(X, output_margin=True), dtype=np.float64)
+        return np.asarray(base.predict_proba(X)[:, 1], dtype=np.float64)
+
+    def _calibrate(self, raw):
+        raw = np.asarray(raw, dtype=np.float64)
+        p = _sigmoid(raw) if self.logit_output else raw
+        if self.table is not None:
+            return np.interp(p, *self.table)
+        return np.asarray(self.calibrator.predict(p), dtype=np.float64)
+
+    def raw_shap(self, X):
+        """(n_rows, n_features) attributions in the base model's output space."""
+        sv = self.explainer.shap_values(X, check_additivity=False)
+        if isinstance(sv, list):
+            sv = sv[1]
+        sv = np.asarray(sv, dtype=np.float64)
+        if sv.ndim == 3:
+            sv = sv[:, :, 1]
+        return sv
+
+
+class CalibratedTreeExplainer:
+    """
+    Drop-in replacement for shap.TreeExplainer on CalibratedClassifierCV models
+    whose folds are tree ensembles (Random Forest, XGBoost).
+    Exposes .expected_value and .shap_values(X) like the SHAP explainers.
+    """
+
+    # Rows whose raw output is this close to the fold's base value get zero attribution
+    _EPS = 1e-9
+
+    def __init__(self, model):
+        self.folds = [_FoldExplainer(base, cal) for base, cal in calibrated_folds(model)]
+        self.expected_value = float(np.mean([
+            fold._calibrate(fold.base_value) for fold in self.folds
+        ]))
+
+    def shap_values(self, X):
+        """Calibrated-probability attributions, shape (n_rows, n_features)."""
+        total = None
+        for fold in self.folds:
+            phi = fold.raw_shap(X)
+            raw_out = fold.base_value + phi.sum(axis=1)
+            delta = raw_out - fold.base_value
+            cal_delta = fold._calibrate(raw_out) - fold._calibrate(fold.base_value)
+
+            # Rescale attributions per row so they sum to the calibrated delta.
+            # Rows sitting exactly at the base value have nothing to distribute.
+            safe = np.abs(delta) > self._EPS
+            scale = np.zeros_like(delta)
+            scale[safe] = cal_delta[safe] / delta[safe]
+            phi_cal = phi * scale[:, None]
+
+            total = phi_cal if total is None else total + phi_cal
+
+        return total / len(self.folds)
@@ -0,0 +1,178 @@
+"""
+utils/coalescer.py
+Micro-batching request coalescer in front of utils.model_loader.predict_single.
+
+Concurrent single-employee requests (e.g. a manager opening a team view) are
+held for a short window, scored as one matrix per model via predict_rows, and
+the results fanned back out to the waiting request threads.
+
+Opt-in: set EAPS_COALESCE_WINDOW_MS (e.g. 2–5) and run a threaded server
+(Flask dev server, or gunicorn --threads N). EAPS_COALESCE_MAX_ROWS caps the
+batch size; a full batch is dispatched immediately without waiting.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# Histogram bucket upper bounds for batch sizes
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Recent queue-wait samples kept for percentile estimates
+_WAIT_SAMPLES = 2048
+
+
+class _Pending:
+    __slots__ = ('row', 'model_name', 'future', 'enqueued')
+
+    def __init__(self, row, model_name):
+        self.row = row
+        self.model_name = model_name
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class PredictionCoalescer:
+    """
+    Collects rows for up to window_ms (or max_rows rows, whichever comes
+    first), then scores each model's rows with one predict_rows call.
+    """
+
+    def __init__(self, window_ms: float = 3.0, max_rows: int = 64, timeout_s: float = 30.0):
+        self.window_s = window_ms / 1000.0
+        self.max_rows = max(1, int(max_rows))
+        self.timeout_s = timeout_s
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch = 0
+        self._size_hist = [0] * (len(_SIZE_BUCKETS) + 1)
+        self._waits_ms = deque(maxlen=_WAIT_SAMPLES)
+        self._score_ms = deque(maxlen=_WAIT_SAMPLES)
+
+        self._thread = threading.Thread(target=self._run, name='eaps-coalescer', daemon=True)
+        self._thread.start()
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    def predict(self, row: np.ndarray, model_name: str = 'Random Forest') -> dict:
+        """Blocking drop-in for predict_single(row, model_name)."""
+        item = _Pending(np.asarray(row, dtype=np.float64).ravel(), model_name)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Prediction coalescer is closed.')
+            self._queue.append(item)
+            if len(self._queue) == 1 or len(self._queue) >= self.max_rows:
+                self._cond.notify()
+        return item.future.result(timeout=self.timeout_s)
+
+    def stats(self) -> dict:
+        """Batch-size and queue-wait metrics for tuning the window against p99 latency."""
+        with self._stats_lock:
+            waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+            score = np.array(self._score_ms) if self._score_ms else np.zeros(1)
+            labels = [f'<={b}' for b in _SIZE_BUCKETS] + [f'>{_SIZE_BUCKETS[-1]}']
+            return {
+                'window_ms':       round(self.window_s * 1000, 3),
+                'max_rows':        self.max_rows,
+                'batches':         self._batches,
+                'rows':            self._rows,
+                'mean_batch_size': round(self._rows / self._batches, 2) if self._batches else 0,
+                'max_batch_size':  self._max_batch,
+                'batch_size_hist': dict(zip(labels, self._size_hist)),
+                'queue_wait_ms':   {f'p{q}': round(float(np.percentile(waits, q)), 3)
+                                    for q in (50, 95, 99)},
+                'score_ms':        {f'p{q}': round(float(np.percentile(score, q)), 3)
+                                    for q in (50, 95, 99)},
+                'queued':          len(self._queue),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+    # ── Dispatcher ────────────────────────────────────────────────────────────
+    def _take_batch(self) -> list:
+        """Block until a batch is ready: window elapsed since the first row, or max_rows reached."""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed and not self._queue:
+                return []
+
+            deadline = self._queue[0].enqueued + self.window_s
+            while len(self._queue) < self.max_rows and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            n = min(len(self._queue), self.max_rows)
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        from utils.model_loader import predict_rows
+
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            started = time.perf_counter()
+
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item.model_name, []).append(item)
+
+            for model_name, items in by_model.items():
+                try:
+                    results = predict_rows(np.vstack([it.row for it in items]), model_name)
+                except Exception as exc:
+                    for it in items:
+                        it.future.set_exception(exc)
+                    continue
+                for it, res in zip(items, results):
+                    it.future.set_result(res)
+
+            self._record(batch, started, time.perf_counter())
+
+    def _record(self, batch, started, finished):
+        size = len(batch)
+        bucket = next((i for i, b in enumerate(_SIZE_BUCKETS) if size <= b), len(_SIZE_BUCKETS))
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += size
+            self._max_batch = max(self._max_batch, size)
+            self._size_hist[bucket] += 1
+            self._score_ms.append((finished - started) * 1000)
+            self._waits_ms.extend((started - it.enqueued) * 1000 for it in batch)
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    """
+    Process-wide coalescer configured from the environment, or None when
+    EAPS_COALESCE_WINDOW_MS is unset / 0. Created lazily so each gunicorn
+    worker starts its own dispatcher thread after forking.
+    """
+    global _coalescer
+    window_ms = float(os.environ.get('EAPS_COALESCE_WINDOW_MS', 0) or 0)
+    if window_ms <= 0:
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                max_rows = int(os.environ.get('EAPS_COALESCE_MAX_ROWS', 64))
+                _coalescer = PredictionCoalescer(window_ms, max_rows)
+    return _coalescer
@@ -0,0 +1,332 @@
+"""
+utils/dashboard.py
+Materialized dashboard aggregates for /api/chart-data.
+
+The charts are computed once per batch (score_batch calls materialize) and
+written to data/dashboard_charts.json together with the identity of the
+latest_batch_results.csv they were built from. Each server process keeps
+the serialized response in memory; a request costs one os.stat, and repeat
+views are answered 304 Not Modified via the ETag.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR    = os.path.join(os.path.dirname(__file__), '..', 'data')
+LATEST_FILE = 'latest_batch_results.csv'
+CHARTS_FILE = 'dashboard_charts.json'
+# Bump when the chart payload changes shape; older materialized files are rebuilt
+CHARTS_FORMAT = 2
+
+# Extra raw spellings seen in custom rosters, on top of preprocess.COLUMN_ALIASES
+CHART_ALIASES = {
+    'Years_at_Company': 'YearsAtCompany',
+    'Years_in_Current_Role': 'YearsInCurrentRole',
+    'Work_Environment_Satisfaction': 'EnvironmentSatisfaction',
+    'Relationship_with_Manager': 'RelationshipSatisfaction',
+    'Job_Involvement': 'JobInvolvement',
+    'Job_Level': 'JobLevel'
+}
+# Every column compute_charts reads; re-reading a large result file loads only these
+CHART_COLUMNS = {
+    'Prediction', 'Probability', 'Department', 'JobRole', 'Age', 'MonthlyIncome',
+    'OverTime', 'JobLevel', 'JobSatisfaction', 'EnvironmentSatisfaction',
+    'RelationshipSatisfaction', 'WorkLifeBalance', 'JobInvolvement',
+    'YearsAtCompany', 'YearsInCurrentRole', 'YearsSinceLastPromotion',
+}
+
+_memory = {'stamp': None, 'body': None, 'etag': None}
+_lock = threading.Lock()
+
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _builtin(obj):
+    """json default= for NumPy scalars that slip into the aggregates."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def _serialize(charts: dict) -> bytes:
+    # Same compact, key-sorted form Flask's jsonify produces
+    return json.dumps(charts, sort_keys=True, separators=(',', ':'), default=_builtin).encode()
+
+
+# Distribution summaries: payload size is fixed, whatever the headcount
+AGE_MAX_BINS    = 25
+DENSITY_POINTS  = 64
+MAX_OUTLIERS    = 100
+
+
+def _clean(values) -> np.ndarray:
+    v = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    return v[np.isfinite(v)]
+
+
+def _shared_histogram(groups: dict, max_bins: int = AGE_MAX_BINS) -> dict:
+    """
+    Counts per group over one set of bin edges, like Plotly's overlaid
+    histograms. Integer data gets whole-number-wide bins centred on integers.
+    """
+    arrays = {k: _clean(v) for k, v in groups.items()}
+    both = np.concatenate(list(arrays.values()))
+    if both.size == 0:
+        edges = np.array([0.0, 1.0])
+    elif np.all(both == np.round(both)):
+        lo, hi = both.min(), both.max()
+        width = max(1.0, np.ceil((hi - lo + 1) / max_bins))
+        edges = np.arange(lo - 0.5, hi + 0.5 + width, width)
+    else:
+        edges = np.histogram_bin_edges(both, bins=max_bins)
+    out = {'edges': np.round(edges, 4).tolist()}
+    for k, v in arrays.items():
+        out[k] = np.histogram(v, bins=edges)[0].tolist()
+    return out
+
+
+def _box_stats(values, max_outliers: int = MAX_OUTLIERS) -> dict:
+    """
+    Tukey box-plot statistics (whiskers at the last points within 1.5 IQR),
+    a density profile for the violin outline, and an evenly spaced sample of
+    at most max_outliers outliers.
+    """
+    v = np.sort(_clean(values))
+    if v.size == 0:
+        return None
+    q1, median, q3 = np.percentile(v, [25, 50, 75])
+    iqr = q3 - q1
+    inside = v[(v >= q1 - 1.5 * iqr) & (v <= q3 + 1.5 * iqr)]
+    outliers = v[(v < inside[0]) | (v > inside[-1])]
+    if outliers.size > max_outliers:
+        outliers = outliers[np.linspace(0, outliers.size - 1, max_outliers).round().astype(int)]
+
+    return {
+        'n':          int(v.size),
+        'mean':       round(float(v.mean()), 2),
+        'q1':         round(float(q1), 2),
+        'median':     round(float(median), 2),
+        'q3':         round(float(q3), 2),
+        'lowerfence': round(float(inside[0]), 2),
+        'upperfence': round(float(inside[-1]), 2),
+        'outliers':   np.round(outliers, 2).tolist(),
+        'density':    _density(v),
+    }
+
+
+def _density(v: np.ndarray, points: int = DENSITY_POINTS) -> dict:
+    """Gaussian KDE (Scott's bandwidth) on a fixed grid, via a binned convolution."""
+    lo, hi = float(v[0]), float(v[-1])
+    bw = 1.06 * v.std() * v.size ** (-1 / 5) if v.size > 1 else 0.0
+    if bw <= 0 or hi <= lo:
+        return {'y': [round(lo, 2)], 'w': [1.0]}
+
+    grid = np.linspace(lo, hi, points)
+    # Bin at 4× grid resolution, smooth, then sample at the grid points
+    fine_edges = np.linspace(lo, hi, points * 4 + 1)
+    counts = np.histogram(v, bins=fine_edges)[0].astype(np.float64)
+    centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+    step = centers[1] - centers[0]
+    half = int(np.ceil(4 * bw / step))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * step / bw) ** 2)
+    smooth = np.convolve(np.pad(counts, half), kernel, mode='valid')
+    dens = np.interp(grid, centers, smooth)
+    return {
+        'y': np.round(grid, 2).tolist(),
+        'w': np.round(dens / dens.max(), 4).tolist() if dens.max() > 0 else [0.0] * points,
+    }
+
+
+def compute_charts(df) -> dict:
+    """All dashboard aggregates for one batch result table."""
+    df = df.copy()
+
+    # Normalize column names so raw aliases like 'Job_Role' become 'JobRole'
+    try:
+        from utils.preprocess import COLUMN_ALIASES
+        df.rename(columns=COLUMN_ALIASES, inplace=True)
+        # Add some missing ones just in case the raw CSV uses slightly different casings
+        df.rename(columns=CHART_ALIASES, inplace=True)
+    except ImportError:
+        pass
+
+    if 'Prediction' not in df.columns:
+        raise ValueError('Invalid batch results format. Expected Prediction column.')
+
+    # Map Prediction output ('Leave', 'Stay') back to Attrition format for legacy dashboard charts
+    df['Attrition'] = df['Prediction'].map({'Leave': 'Yes', 'Stay': 'No'})
+    df['Attrition_Num'] = df['Prediction'].map({'Leave': 1, 'Stay': 0})
+    charts = {}
+
+    # 1. Department attrition (Stacked)
+    if 'Department' in df.columns:
+        d_grp = df.groupby(['Department', 'Prediction']).size().unstack(fill_value=0)
+        charts['department'] = {
+            'labels': d_grp.index.tolist(),
+            'stay': d_grp.get('Stay', pd.Series(0, index=d_grp.index)).tolist(),
+            'leave': d_grp.get('Leave', pd.Series(0, index=d_grp.index)).tolist(),
+        }
+
+    # 2. JobRole attrition (Stacked)
+    if 'JobRole' in df.columns:
+        # Sort by total people in role or by leave count
+        j_grp = df.groupby(['JobRole', 'Prediction']).size().unstack(fill_value=0)
+        # Sort by highest leave count descending
+        if 'Leave' in j_grp.columns:
+            j_grp = j_grp.sort_values(by='Leave', ascending=True)
+        charts['jobrole'] = {
+            'labels': j_grp.index.tolist(),
+            'stay': j_grp.get('Stay', pd.Series(0, index=j_grp.index)).tolist(),
+            'leave': j_grp.get('Leave', pd.Series(0, index=j_grp.index)).tolist(),
+        }
+
+    # 3. Age histogram (bin counts on shared edges)
+    if 'Age' in df.columns:
+        charts['age'] = _shared_histogram({
+            'stay':  df.loc[df['Attrition'] == 'No', 'Age'],
+            'leave': df.loc[df['Attrition'] == 'Yes', 'Age'],
+        })
+
+    # 4. Income box / violin (quartiles, whiskers, outlier sample, density)
+    if 'MonthlyIncome' in df.columns:
+        charts['income'] = {
+            'stay':  _box_stats(df.loc[df['Attrition'] == 'No', 'MonthlyIncome']),
+            'leave': _box_stats(df.loc[df['Attrition'] == 'Yes', 'MonthlyIncome']),
+        }
+
+    # 5. Overtime
+    if 'OverTime' in df.columns:
+        ot = df.groupby(['OverTime', 'Attrition']).size().unstack(fill_value=0).reset_index()
+        charts['overtime'] = {
+            'labels': ot['OverTime'].tolist(),
+            'no':  ot.get('No', pd.Series([0]*len(ot))).tolist(),
+            'yes': ot.get('Yes', pd.Series([0]*len(ot))).tolist(),
+        }
+
+    # 6. Radar Chart Analytics
+    radar_cols = ['JobSatisfaction', 'EnvironmentSatisfaction', 'RelationshipSatisfaction', 'WorkLifeBalance', 'JobInvolvement']
+    if all(c in df.columns for c in radar_cols):
+        radar = df.groupby('Prediction')[radar_cols].mean().round(2)
+        charts['radar'] = {
+            'metrics': radar_cols,
+            'stay': radar.loc['Stay'].tolist() if 'Stay' in radar.index else [0]*len(radar_cols),
+            'leave': radar.loc['Leave'].tolist() if 'Leave' in radar.index else [0]*len(radar_cols),
+        }
+
+    # 7. Heatmap (Department vs JobLevel)
+    if 'Department' in df.columns and 'JobLevel' in df.columns:
+        val_col = 'Probability' if 'Probability' in df.columns else 'Attrition_Num'
+        hm = df.groupby(['Department', 'JobLevel'])[val_col].mean().unstack(fill_value=0)
+        charts['heatmap'] = {
+            'y': hm.index.tolist(),
+            'x': [f'Level {c}' for c in hm.columns],
+            'z': (hm.values * (100 if val_col == 'Probability' else 1)).tolist(),
+        }
+
+    # 8. Leaderboard (Department + JobRole)
+    if 'Department' in df.columns and 'JobRole' in df.columns:
+        val_col = 'Probability' if 'Probability' in df.columns else 'Attrition_Num'
+        df['Segment'] = df['Department'] + " — " + df['JobRole']
+        lb = df.groupby('Segment')[val_col].mean().sort_values(ascending=False).head(5)
+        lb = lb.iloc[::-1]
+        charts['leaderboard'] = {
+            'y': lb.index.tolist(),
+            'x': (lb.values * (100 if val_col == 'Probability' else 1)).round(1).tolist(),
+        }
+
+    # 9. Grouped Bar (Tenure Metrics)
+    tenure_cols = ['YearsAtCompany', 'YearsInCurrentRole', 'YearsSinceLastPromotion']
+    if all(c in df.columns for c in tenure_cols):
+        tb = df.groupby('Prediction')[tenure_cols].mean().round(1)
+        charts['tenure'] = {
+            'metrics': ['Company Tenure', 'Current Role Tenure', 'Years Since Promo'],
+            'stay': tb.loc['Stay'].tolist() if 'Stay' in tb.index else [0]*3,
+            'leave': tb.loc['Leave'].tolist() if 'Leave' in tb.index else [0]*3,
+        }
+
+    # 10. KPIs
+    total    = len(df)
+    attrited = (df['Attrition'] == 'Yes').sum()
+    charts['kpis'] = {
+        'total':   total,
+        'attrited': int(attrited),
+        'rate':    round(attrited / total * 100, 1) if total > 0 else 0,
+        'avg_income': round(float(df['MonthlyIncome'].mean()), 0) if 'MonthlyIncome' in df.columns else None,
+        'avg_age':    round(float(df['Age'].mean()), 1) if 'Age' in df.columns else None,
+    }
+    return charts
+
+
+def _read_chart_columns(path: str) -> pd.DataFrame:
+    """latest_batch_results.csv restricted to the columns the charts use."""
+    from utils.preprocess import COLUMN_ALIASES
+    aliases = {**COLUMN_ALIASES, **CHART_ALIASES}
+    return pd.read_csv(path, usecols=lambda c: aliases.get(c, c) in CHART_COLUMNS)
+
+
+def materialize(df=None) -> str:
+    """
+    Compute and persist the aggregates for the current latest_batch_results.csv.
+    Pass the in-memory result table to skip re-reading it. Returns the ETag.
+    """
+    latest = os.path.join(DATA_DIR, LATEST_FILE)
+    source = _stamp(latest)
+    if df is None:
+        df = _read_chart_columns(latest)
+
+    body = _serialize(compute_charts(df))
+    etag = hashlib.sha1(body).hexdigest()[:20]
+    path = os.path.join(DATA_DIR, CHARTS_FILE)
+    tmp  = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as fh:
+        header = {'source': source, 'etag': etag, 'format': CHARTS_FORMAT}
+        fh.write(json.dumps(header).encode() + b'\n' + body)
+    os.replace(tmp, path)
+    return etag
+
+
+def get_dashboard():
+    """
+    (body_bytes, etag) for the latest batch, or (None, None) if there is none.
+    Recomputes only when latest_batch_results.csv no longer matches the
+    materialized file (e.g. results written by an older version).
+    """
+    latest = os.path.join(DATA_DIR, LATEST_FILE)
+    path   = os.path.join(DATA_DIR, CHARTS_FILE)
+    source = _stamp(latest)
+    if source is None:
+        return None, None
+
+    stamp = (tuple(source), tuple(_stamp(path) or ()))
+    if _memory['stamp'] == stamp:
+        return _memory['body'], _memory['etag']
+
+    with _lock:
+        meta, body = _read_charts(path)
+        if meta is None or meta.get('source') != source or meta.get('format') != CHARTS_FORMAT:
+            materialize()
+            meta, body = _read_charts(path)
+            stamp = (tuple(source), tuple(_stamp(path) or ()))
+        _memory.update(stamp=stamp, body=body, etag=meta['etag'])
+        return body, meta['etag']
+
+
+def _read_charts(path: str):
+    try:
+        with open(path, 'rb') as fh:
+            header, _, body = fh.read().partition(b'\n')
+        return json.loads(header), body
+    except (OSError, ValueError):
+        return None, None
@@ -0,0 +1,159 @@
+"""
+utils/feature_plan.py
+FeaturePlan — the single description of how raw employee data becomes a
+model row, written by eaps_ml_pipeline.py as feature_plan.pkl next to the
+models of each version.
+
+It holds:
+  - feature_names   column order the models were trained on
+  - aliases         raw column name → feature name (inference aliases merged
+                    with the training pipeline's COLUMN_RENAME_MAP)
+  - categories      per categorical feature, the training LabelEncoder classes
+                    (code = position), or the CATEGORICAL_MAPS fallback
+  - defaults        raw value used when a feature is absent from the input,
+                    as filled in at training time
+
+Lookup tables are compiled when the plan is built or unpickled and kept in
+the instance, which model_loader caches per model version — so neither
+single-row nor batch preprocessing reads from disk or rebuilds anything
+per call.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class FeaturePlan:
+    """Encodes single payloads (encode_row) and uploaded tables (encode_frame)."""
+
+    def __init__(self, feature_names, label_encoders=None, aliases=None, defaults=None):
+        from utils.preprocess import COLUMN_ALIASES, CATEGORICAL_MAPS
+
+        self.feature_names = list(feature_names)
+        self.aliases = {**COLUMN_ALIASES, **(aliases or {})}
+
+        encoders = label_encoders or {}
+        self.categories = {}
+        for col in self.feature_names:
+            if col in encoders:
+                self.categories[col] = {str(c): i for i, c in enumerate(encoders[col].classes_)}
+            elif col in CATEGORICAL_MAPS:
+                self.categories[col] = dict(CATEGORICAL_MAPS[col])
+
+        self.defaults = {col: 0 for col in self.feature_names}
+        self.defaults.update({k: v for k, v in (defaults or {}).items() if k in self.defaults})
+        self._compiled = self._compile()
+
+    @classmethod
+    def from_artifacts(cls, feature_names, label_encoders=None):
+        """Plan for model versions trained before feature_plan.pkl existed."""
+        return cls(feature_names, label_encoders)
+
+    # ── Pickling: only the plan itself, lookup tables are rebuilt on load ─────
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_compiled']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compiled = self._compile()
+
+    def _compile(self) -> dict:
+        indexes = {col: (pd.Index(list(lookup)), np.fromiter(lookup.values(), dtype=np.int64))
+                   for col, lookup in self.categories.items()}
+        encoded_defaults = {}
+        for col, raw in self.defaults.items():
+            if col in self.categories:
+                encoded_defaults[col] = self.categories[col].get(str(raw), 0)
+            else:
+                encoded_defaults[col] = raw
+        # Raw payload key → feature, only for aliases of model features
+        aliases = {k: v for k, v in self.aliases.items() if v in self.defaults}
+        return {
+            'indexes':   indexes,
+            'defaults':  encoded_defaults,
+            'aliases':   aliases,
+            'alias_set': frozenset(aliases),
+            'row_plan':  [(pos, col, self.categories.get(col))
+                          for pos, col in enumerate(self.feature_names)],
+        }
+
+    # ── Single row ────────────────────────────────────────────────────────────
+    def encode_row(self, payload: dict) -> np.ndarray:
+        """Raw JSON/form payload → float64 row in feature_names order."""
+        c = self._compiled
+        aliased = payload.keys() & c['alias_set']
+        if aliased:
+            payload = dict(payload)
+            for key in aliased:
+                payload.setdefault(c['aliases'][key], payload[key])
+
+        defaults = c['defaults']
+        row = np.empty(len(self.feature_names))
+        for pos, col, lookup in c['row_plan']:
+            if col not in payload:
+                row[pos] = defaults[col]
+                continue
+            val = payload[col]
+            if lookup is not None:
+                row[pos] = lookup.get(str(val), 0)
+            else:
+                try:
+                    row[pos] = float(val)
+                except (ValueError, TypeError):
+                    row[pos] = 0
+        return row
+
+    # ── Batch ─────────────────────────────────────────────────────────────────
+    def encode_column(self, col: str, values: pd.Series) -> pd.Series:
+        """
+        Categorical column → codes in one hash-lookup pass. Values are
+        compared as str (like training); unknown values encode to 0.
+        """
+        index, codes = self._compiled['indexes'][col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Parsed as category (utils.batch read projection): look up each
+            # category once, then gather by the per-row category codes
+            pos = index.get_indexer(values.cat.categories.astype(str))
+            lut = np.append(np.where(pos < 0, 0, codes[pos]), 0)   # code -1 (NaN) → lut[-1] = 0
+            return pd.Series(lut[values.cat.codes.to_numpy()], index=values.index)
+        pos = index.get_indexer(values.astype(str))
+        return pd.Series(np.where(pos < 0, 0, codes[pos]), index=values.index)
+
+    @staticmethod
+    def _numeric_column(values: pd.Series) -> pd.Series:
+        if pd.api.types.is_numeric_dtype(values):
+            return values.fillna(0)
+        converted = pd.to_numeric(values, errors='coerce')
+        textual   = values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+        if textual and converted.notna().mean() <= 0.5:
+            # Mostly text in a numeric feature: stable alphabetical codes
+            cats = sorted(values.dropna().unique())
+            return values.map({v: i for i, v in enumerate(cats)}).fillna(0).astype(int)
+        return converted.fillna(0)
+
+    def source_columns(self, columns) -> dict:
+        """{feature: raw column} for the first column of a header that resolves to each feature."""
+        source = {}
+        for raw in columns:
+            name = self.aliases.get(raw, raw)
+            if name in self.defaults:
+                source.setdefault(name, raw)
+        return source
+
+    def encode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Uploaded table (raw or aliased column names) → model matrix in feature_names order."""
+        c = self._compiled
+        source = self.source_columns(df.columns)
+
+        out = {}
+        for col in self.feature_names:
+            raw = source.get(col)
+            if raw is None:
+                out[col] = np.full(len(df), c['defaults'][col])
+            elif col in self.categories:
+                out[col] = self.encode_column(col, df[raw])
+            else:
+                out[col] = self._numeric_column(df[raw])
+        return pd.DataFrame(out, index=df.index)
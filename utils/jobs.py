@@ -0,0 +1,253 @@
+"""
+utils/jobs.py
+Background batch-scoring jobs.
+
+A job is a directory under data/jobs/<job_id>/:
+    input         the uploaded roster, saved as-is by the submitting request
+                  (CSV, Parquet, Arrow IPC or Feather; see utils/roster_io.py)
+    status.json   state, rows_done / rows_total (row × model passes for
+                  compare jobs), current model (stage), timestamps, error
+    result.json   the /api/batch or /api/compare-batch response body when done
+
+Batch jobs stream the saved upload through utils.batch.score_batch, so
+their memory does not grow with the roster size. Jobs run in a small process
+pool (EAPS_JOB_WORKERS processes per server worker, default 1), so a large
+roster neither hits gunicorn's request timeout nor holds a request worker.
+Status lives on disk, so any server worker can answer a status or result
+request for any job.
+
+status.json carries the pid of the process that owns the job (the server
+worker while queued, the pool worker while running), and a running job
+refreshes updated_at every JOB_HEARTBEAT_S. A job whose process is gone or
+whose heartbeat is older than JOB_STALE_S — its server worker was recycled
+or killed — is reported as failed instead of staying queued / running.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+JOBS_DIR        = os.path.join(os.path.dirname(__file__), '..', 'data', 'jobs')
+JOB_KINDS       = ('batch', 'compare')
+JOB_WORKERS     = int(os.environ.get('EAPS_JOB_WORKERS', 1))
+JOB_TTL_S       = float(os.environ.get('EAPS_JOB_TTL_HOURS', 24)) * 3600
+JOB_HEARTBEAT_S = 10
+JOB_STALE_S     = float(os.environ.get('EAPS_JOB_STALE_S', 120))
+INPUT_FILE      = 'input'
+STATUS_FILE     = 'status.json'
+RESULT_FILE     = 'result.json'
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+_TERMINAL = ('done', 'failed')
+
+_executor = None
+_executor_lock = threading.Lock()
+_status_lock   = threading.Lock()      # progress callbacks vs the heartbeat thread
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _job_dir(job_id: str):
+    """Directory of a job, or None for ids that are not ours (no path tricks)."""
+    if not _JOB_ID.match(job_id or ''):
+        return None
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _write_json(path: str, data: dict):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh, default=str)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _update_status(job_dir: str, **fields):
+    path = os.path.join(job_dir, STATUS_FILE)
+    with _status_lock:
+        status = _read_json(path) or {}
+        status.update(fields, updated_at=_now())
+        _write_json(path, status)
+    return status
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass                    # exists, owned by another user
+    return True
+
+
+def _orphaned(status: dict) -> str:
+    """Why a queued / running job can no longer finish, or '' if it still can."""
+    if status.get('state') not in ('queued', 'running'):
+        return ''
+    if 'pid' in status and not _pid_alive(status['pid']):
+        return f'Job {status["state"]} in process {status["pid"]}, which has exited'
+    if status.get('state') == 'running':
+        try:
+            beat = datetime.fromisoformat(status['updated_at']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return ''
+        if time.time() - beat > JOB_STALE_S:
+            return f'Job worker stopped responding (no heartbeat for {JOB_STALE_S:.0f} s)'
+    return ''
+
+
+def _reap(job_dir: str, status: dict) -> dict:
+    """status, recorded as failed first if the job's process is gone (see _orphaned)."""
+    reason = _orphaned(status)
+    if not reason:
+        return status
+    return _update_status(job_dir, state='failed', error=reason, finished_at=_now())
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Lazily created per server process. 'spawn' workers start clean instead of
+    forking a threaded server process that already holds OpenMP pools.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                import multiprocessing
+                _executor = ProcessPoolExecutor(max_workers=max(1, JOB_WORKERS),
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+# ── Submitting side (request handlers) ────────────────────────────────────────
+def submit_job(kind: str, upload, params: dict = None) -> str:
+    """
+    Save the upload (a werkzeug FileStorage, or anything with .save(path))
+    and queue the job. Returns the job id immediately.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f'Unknown job kind "{kind}". Choose from {JOB_KINDS}.')
+    prune_jobs()
+
+    job_id  = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir)
+    upload.save(os.path.join(job_dir, INPUT_FILE))
+    _write_json(os.path.join(job_dir, STATUS_FILE), {
+        'job_id':     job_id,
+        'kind':       kind,
+        'params':     params or {},
+        'state':      'queued',
+        'rows_done':  0,
+        'rows_total': None,
+        'pid':        os.getpid(),
+        'created_at': _now(),
+        'updated_at': _now(),
+    })
+
+    future = _get_executor().submit(run_job, job_dir, kind, params or {})
+    future.add_done_callback(lambda f: _on_job_exit(job_dir, f))
+    return job_id
+
+
+def _on_job_exit(job_dir: str, future):
+    """Record jobs whose worker process died (e.g. killed for memory) as failed."""
+    exc = future.exception()
+    if exc is None:
+        return
+    status = _read_json(os.path.join(job_dir, STATUS_FILE)) or {}
+    if status.get('state') not in _TERMINAL:
+        _update_status(job_dir, state='failed', error=f'Job worker crashed: {exc}',
+                       finished_at=_now())
+
+
+def job_status(job_id: str):
+    """Status dict of a job, or None if it does not exist. Orphaned jobs read as failed."""
+    job_dir = _job_dir(job_id)
+    status  = _read_json(os.path.join(job_dir, STATUS_FILE)) if job_dir else None
+    return None if status is None else _reap(job_dir, status)
+
+
+def job_result(job_id: str):
+    """Result dict of a finished job, or None if it is not available (yet)."""
+    job_dir = _job_dir(job_id)
+    return _read_json(os.path.join(job_dir, RESULT_FILE)) if job_dir else None
+
+
+def prune_jobs(ttl_s: float = JOB_TTL_S) -> int:
+    """Delete finished (or orphaned) jobs older than ttl_s seconds. Returns the number removed."""
+    if not os.path.isdir(JOBS_DIR):
+        return 0
+    cutoff  = time.time() - ttl_s
+    removed = 0
+    for name in os.listdir(JOBS_DIR):
+        job_dir = _job_dir(name)
+        if job_dir is None:
+            continue
+        status = _reap(job_dir, _read_json(os.path.join(job_dir, STATUS_FILE)) or {})
+        try:
+            old = os.path.getmtime(job_dir) < cutoff
+        except OSError:
+            continue
+        if old and status.get('state') in _TERMINAL:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+# ── Worker side (runs in the process pool) ────────────────────────────────────
+def run_job(job_dir: str, kind: str, params: dict):
+    """Execute one job; every outcome is recorded in status.json."""
+    from utils.batch import score_batch, compare_batch
+    from utils.roster_io import detect_format, count_rows
+
+    _update_status(job_dir, state='running', started_at=_now(), pid=os.getpid())
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(JOB_HEARTBEAT_S):
+            _update_status(job_dir)
+
+    threading.Thread(target=heartbeat, daemon=True, name='job-heartbeat').start()
+    try:
+        input_path = os.path.join(job_dir, INPUT_FILE)
+        rows = count_rows(input_path, detect_format(input_path))
+        _update_status(job_dir, rows=rows)
+
+        def progress(done, total, stage=None):
+            _update_status(job_dir, rows_done=int(done), rows_total=int(total), stage=stage)
+
+        threshold = float(params.get('threshold', 0.5))
+        if kind == 'compare':
+            result = compare_batch(input_path, threshold, progress, dedup=params.get('dedup'))
+        else:
+            # Streamed from disk chunk by chunk; the roster is never loaded whole
+            result = score_batch(input_path, params.get('model_name', 'Random Forest'),
+                                 threshold, progress, total_rows=rows,
+                                 passthrough=bool(params.get('passthrough')),
+                                 dedup=params.get('dedup'))
+
+        _write_json(os.path.join(job_dir, RESULT_FILE), result)
+        _update_status(job_dir, state='done', finished_at=_now())
+    except Exception as e:
+        _update_status(job_dir, state='failed', error=str(e), finished_at=_now())
+    finally:
+        stop.set()
@@ -0,0 +1,125 @@
+"""
+utils/kernel_svm.py
+Scalable stand-in for SVC(kernel='rbf', probability=True) on large training sets.
+
+NystroemSVC approximates the RBF kernel with a Nystroem feature map on
+n_components sampled training rows, trains a linear SVM on that map and
+Platt-scales its decision values on a held-out slice:
+    fit      O(n · n_components) instead of SVC's O(n²)–O(n³), and one
+             Platt fit instead of SVC's internal 5-fold refits
+    predict  n_components kernel evaluations per row, however many support
+             vectors the exact SVM would have kept
+The feature map is computed in CHUNK_ROWS blocks; when the map of the
+training rows would exceed MAX_DENSE_BYTES the linear SVM is fit by SGD over
+chunks instead of liblinear, so memory stays bounded at millions of rows.
+After fit the map and the linear weights are folded into one vector per
+component (kernel_coef_), so scoring is a kernel evaluation and a dot product.
+
+eaps_ml_pipeline.py trains it as the SVM when the training split is larger
+than SVM_EXACT_MAX_ROWS (or with --svm=nystroem); model_loader serves it like
+any svm.pkl (svm_engine() reports which one is loaded).
+"""
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.svm import LinearSVC
+from sklearn.utils.class_weight import compute_class_weight
+
+N_COMPONENTS    = 500
+CHUNK_ROWS      = 20_000
+MAX_DENSE_BYTES = 512 * 2**20
+
+
+class NystroemSVC(ClassifierMixin, BaseEstimator):
+    """
+    Approximate RBF SVM with Platt-scaled probabilities. C, gamma ('scale'
+    as in SVC) and class_weight mean what they mean for SVC; calibration_size
+    is the share of the rows held out for Platt scaling and max_iter the
+    epochs of the SGD fit used above MAX_DENSE_BYTES.
+    """
+
+    def __init__(self, C=1.0, gamma='scale', n_components=N_COMPONENTS, class_weight=None,
+                 calibration_size=0.2, max_iter=5, random_state=None):
+        self.C = C
+        self.gamma = gamma
+        self.n_components = n_components
+        self.class_weight = class_weight
+        self.calibration_size = calibration_size
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        self.classes_, y = np.unique(np.asarray(y), return_inverse=True)
+        if len(self.classes_) != 2:
+            raise ValueError(f'NystroemSVC is binary; got {len(self.classes_)} classes.')
+        self.n_features_in_ = X.shape[1]
+        self.gamma_ = (1.0 / (X.shape[1] * X.var()) if self.gamma == 'scale'
+                       else float(self.gamma))
+
+        fit_rows, cal_rows = train_test_split(
+            np.arange(len(X)), test_size=self.calibration_size, stratify=y,
+            random_state=self.random_state)
+
+        feature_map = Nystroem(kernel='rbf', gamma=self.gamma_,
+                               n_components=min(self.n_components, len(fit_rows)),
+                               random_state=self.random_state).fit(X[fit_rows])
+        self.components_ = feature_map.components_
+        normalization    = feature_map.normalization_
+
+        def features(rows):
+            return self._kernel(X[rows]) @ normalization.T
+
+        weights = (compute_class_weight(self.class_weight, classes=np.array([0, 1]), y=y[fit_rows])
+                   if self.class_weight is not None else np.ones(2))
+        if len(fit_rows) * len(self.components_) * 8 <= MAX_DENSE_BYTES:
+            svm = LinearSVC(C=self.C, class_weight=dict(enumerate(weights)),
+                            random_state=self.random_state)
+            svm.fit(features(fit_rows), y[fit_rows])
+        else:
+            # Same objective as LinearSVC (hinge + L2, alpha = 1 / (C·n)), streamed;
+            # averaged SGD settles far closer to the optimum in a few epochs
+            svm = SGDClassifier(loss='hinge', alpha=1.0 / (self.C * len(fit_rows)),
+                                average=True, random_state=self.random_state)
+            rng = np.random.default_rng(self.random_state)
+            for _ in range(self.max_iter):
+                order = rng.permutation(fit_rows)
+                for start in range(0, len(order), CHUNK_ROWS):
+                    rows = np.sort(order[start:start + CHUNK_ROWS])
+                    svm.partial_fit(features(rows), y[rows], classes=np.array([0, 1]),
+                                    sample_weight=weights[y[rows]])
+
+        # decision(x) = k(x, components) · normalizationᵀ · w + b
+        self.kernel_coef_ = normalization.T @ svm.coef_.ravel()
+        self.intercept_   = float(svm.intercept_[0])
+
+        # Platt scaling: 1-D logistic regression on held-out decision values
+        platt = LogisticRegression(C=1e4).fit(
+            self.decision_function(X[cal_rows]).reshape(-1, 1), y[cal_rows])
+        self.platt_ = (float(platt.coef_[0, 0]), float(platt.intercept_[0]))
+        return self
+
+    def _kernel(self, X):
+        """RBF kernel between rows of X and the components."""
+        sq = ((X * X).sum(axis=1)[:, None] - 2.0 * (X @ self.components_.T)
+              + (self.components_ * self.components_).sum(axis=1)[None, :])
+        return np.exp(-self.gamma_ * np.maximum(sq, 0.0))
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty(len(X))
+        for start in range(0, len(X), CHUNK_ROWS):
+            block = X[start:start + CHUNK_ROWS]
+            out[start:start + len(block)] = self._kernel(block) @ self.kernel_coef_ + self.intercept_
+        return out
+
+    def predict_proba(self, X):
+        a, b = self.platt_
+        p = 1.0 / (1.0 + np.exp(-(a * self.decision_function(X) + b)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) >= 0).astype(int)]
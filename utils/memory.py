@@ -0,0 +1,56 @@
+"""
+utils/memory.py
+Per-process memory accounting (Linux /proc) for the gunicorn worker report.
+
+  rss     — resident pages, counting shared pages in full
+  pss     — proportional set size: shared pages divided among their sharers
+  uss     — unique set size: private pages only (what a worker really costs)
+  shared  — resident pages shared with other processes (copy-on-write / mmap)
+"""
+
+import os
+
+_FIELDS = {
+    'Rss': 'rss', 'Pss': 'pss',
+    'Shared_Clean': 'shared_clean', 'Shared_Dirty': 'shared_dirty',
+    'Private_Clean': 'private_clean', 'Private_Dirty': 'private_dirty',
+}
+
+
+def process_memory(pid='self') -> dict:
+    """Memory breakdown in MB for a process, or {} where /proc is unavailable."""
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        return {}
+
+    kb = {}
+    with open(path) as fh:
+        for line in fh:
+            key, _, rest = line.partition(':')
+            if key in _FIELDS:
+                kb[_FIELDS[key]] = int(rest.split()[0])
+
+    mb = lambda v: round(v / 1024, 1)
+    return {
+        'rss_mb':    mb(kb.get('rss', 0)),
+        'pss_mb':    mb(kb.get('pss', 0)),
+        'uss_mb':    mb(kb.get('private_clean', 0) + kb.get('private_dirty', 0)),
+        'shared_mb': mb(kb.get('shared_clean', 0) + kb.get('shared_dirty', 0)),
+    }
+
+
+def child_pids(pid: int) -> list:
+    """Direct children of a process (e.g. gunicorn workers of the master)."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                # Field 4 is the parent pid; comm (field 2) may contain spaces
+                ppid = int(fh.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
@@ -10,11 +10,19 @@ Key fixes (debiased version):
   - predict_single / predict_batch use probability >= threshold
 """
 
+import hashlib
 import os
+import threading
+import time
+import uuid
+import warnings
+from contextlib import contextmanager
 import joblib
 import numpy as np
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+from utils import model_registry
+
+MODEL_DIR = model_registry.MODEL_DIR
 
 MODELS = {
     'Random Forest':       'random_forest.pkl',
@@ -28,17 +36,225 @@ BEST_MODEL_FILE      = 'best_model_name.pkl'
 LABEL_ENCODERS_FILE  = 'label_encoders.pkl'
 THRESHOLD_FILE       = 'threshold.pkl'
 CLASS_RATIO_FILE     = 'class_ratio.pkl'
+FEATURE_PLAN_FILE    = 'feature_plan.pkl'
 
 # Models that need scaled input
 SCALED_MODELS = {'Logistic Regression', 'SVM'}
 
-# Module-level cache (replaces @st.cache_resource)
+# Models that SHAP's TreeExplainer and the native tree engine can handle
+TREE_MODELS = {'Random Forest', 'XGBoost'}
+
+# Inference engines for tree models (see utils/tree_engine.py):
+#   'sklearn' — model.predict_proba (default); XGBoost goes through
+#               Booster.inplace_predict on float32 rows with XGB_NTHREAD threads
+#   'native'  — flattened NumPy trees + np.interp calibration for RF/XGBoost
+#   'auto'    — native up to NATIVE_MAX_ROWS rows, sklearn for larger batches
+ENGINES = ('sklearn', 'native', 'auto')
+NATIVE_MAX_ROWS = 500
+_engine = os.environ.get('EAPS_INFERENCE_ENGINE', 'sklearn')
+# Threads per XGBoost inplace_predict call; 1 suits several workers per host
+XGB_NTHREAD = int(os.environ.get('EAPS_XGB_NTHREAD', 1))
+
+# Serving memory (see gunicorn.conf.py). With EAPS_MMAP_MODELS=1, numpy arrays
+# inside the pickles (SVM support vectors or Nystroem components, scaler, native
+# engine node arrays) are mapped from the page cache and shared by all workers.
+# Copy-on-write mode ('c') because libsvm insists on writable buffers, though it
+# never writes.
+MMAP_MODELS   = os.environ.get('EAPS_MMAP_MODELS', '0') == '1'
+NATIVE_SUFFIX = '.native.pkl'
+
+# Hot-swap (see utils/model_registry.py): at most once per POLL_SECONDS a
+# request stats models/CURRENT; a new version is loaded on a background thread
+# and swapped in when complete. Negative disables polling.
+POLL_SECONDS = float(os.environ.get('EAPS_MODEL_POLL_SECONDS', 5))
+
+# Batch dedup: predict_batch scores each distinct encoded row once and scatters
+# the probabilities back (repeated snapshots, coarse extracts). Off by default;
+# callers can also ask per call.
+DEDUP_ROWS = os.environ.get('EAPS_BATCH_DEDUP', '0') == '1'
+
+# Compare fan-out (/api/compare-batch, /api/compare-predict): one thread per
+# model over the same read-only encoded matrix. Tree traversal, libsvm,
+# XGBoost and SHAP release the GIL, so wall time tends to the slowest model
+# given enough cores. 1 runs the models one after another.
+COMPARE_WORKERS = int(os.environ.get('EAPS_COMPARE_WORKERS', min(4, os.cpu_count() or 1)))
+_fanout      = {'pid': None, 'pool': None}
+_fanout_lock = threading.Lock()
+
+# Module-level cache (replaces @st.cache_resource). Holds one model version:
+# models, scaler, feature names, encoders, thresholds, plus explainers,
+# compiled engines and XGBoost inplace boosters built lazily. A new version is loaded into a fresh dict and
+# published by rebinding _cache, so in-flight requests finish on the snapshot
+# they started with.
 _cache = {}
+_build_lock = threading.Lock()
+_swap_lock  = threading.Lock()
+_watch      = {'stamp': None, 'checked': 0.0, 'loading': False}
+
+FALLBACK_FEATURE_NAMES = [
+    'Age', 'MaritalStatus', 'Department', 'JobRole', 'JobLevel',
+    'MonthlyIncome', 'HourlyRate', 'YearsAtCompany', 'YearsInCurrentRole',
+    'YearsSinceLastPromotion', 'WorkLifeBalance', 'JobSatisfaction',
+    'PerformanceRating', 'TrainingTimesLastYear', 'EnvironmentSatisfaction',
+    'RelationshipSatisfaction', 'JobInvolvement', 'DistanceFromHome',
+    'NumCompaniesWorked', 'Gender', 'OverTime',
+    'MonthlyRate', 'StockOptionLevel', 'PercentSalaryHike', 'BusinessTravel',
+]
 
 
 def _reset_cache():
-    """Clear in-memory model cache (call after retraining)."""
-    _cache.clear()
+    """Drop the in-memory model snapshot; the next call reloads the current version.
+    Explainers live inside the same snapshot, so they are dropped too."""
+    global _cache
+    _cache = {}
+    _watch['stamp'] = None
+
+
+def _load_pickle(path):
+    """joblib.load honouring EAPS_MMAP_MODELS."""
+    return joblib.load(path, mmap_mode='c' if MMAP_MODELS else None)
+
+
+def _load_optional(model_dir: str, fname: str, default, loader=joblib.load):
+    path = os.path.join(model_dir, fname)
+    return loader(path) if os.path.exists(path) else default
+
+
+def _fingerprint(version, model_dir: str) -> str:
+    """
+    Identity of the artifacts a snapshot is loaded from, for on-disk caches
+    (utils/score_cache.py): the registry version, which is immutable once
+    sealed, or for the flat models/ layout the names, sizes and mtimes of
+    its pickles.
+    """
+    if version:
+        return str(version)
+    stats = []
+    if os.path.isdir(model_dir):
+        for fname in sorted(os.listdir(model_dir)):
+            if fname.endswith('.pkl') and not fname.endswith(NATIVE_SUFFIX):
+                st = os.stat(os.path.join(model_dir, fname))
+                stats.append((fname, st.st_size, st.st_mtime_ns))
+    return 'flat-' + hashlib.sha256(repr(stats).encode()).hexdigest()[:16]
+
+
+def _load_snapshot(version, model_dir: str) -> dict:
+    """Load every serving artifact of one model version into a new cache dict."""
+    from utils.feature_plan import FeaturePlan
+
+    models = {name: _load_optional(model_dir, fname, None, _load_pickle)
+              for name, fname in MODELS.items()}
+    # Fallback: 25-column FINAL_FEATURES from pipeline
+    feature_names  = _load_optional(model_dir, FEATURE_NAMES_FILE, FALLBACK_FEATURE_NAMES)
+    label_encoders = _load_optional(model_dir, LABEL_ENCODERS_FILE, {})
+    # Versions trained before feature_plan.pkl: same encoding, zero defaults
+    feature_plan   = _load_optional(model_dir, FEATURE_PLAN_FILE, None) \
+                     or FeaturePlan.from_artifacts(feature_names, label_encoders)
+    return {
+        'version':        version,
+        'fingerprint':    _fingerprint(version, model_dir),
+        'model_dir':      model_dir,
+        'models':         models,
+        'scaler':         _load_optional(model_dir, SCALER_FILE, None, _load_pickle),
+        'feature_names':  feature_names,
+        'label_encoders': label_encoders,
+        'feature_plan':   feature_plan,
+        'thresholds':     _load_optional(model_dir, THRESHOLD_FILE, {}),
+        'best_model':     _load_optional(model_dir, BEST_MODEL_FILE, 'Random Forest'),
+        'explainers':     {},
+        'compiled':       {},
+        'boosters':       {},
+    }
+
+
+def _publish(snapshot: dict, stamp):
+    global _cache
+    _cache = snapshot
+    _watch['stamp'] = stamp
+
+
+def _snapshot() -> dict:
+    """
+    The model snapshot to serve this call from. Loaded synchronously on first
+    use; afterwards a changed CURRENT pointer only triggers a background load.
+    """
+    cache = _cache
+    if 'models' in cache:
+        _maybe_reload(cache)
+        return cache
+
+    with _swap_lock:
+        if 'models' not in _cache:
+            stamp = model_registry.current_stamp(MODEL_DIR)
+            _publish(_load_snapshot(*model_registry.resolve_model_dir(MODEL_DIR)), stamp)
+        return _cache
+
+
+def _maybe_reload(cache: dict):
+    """Rate-limited check of models/CURRENT; starts a background load on change."""
+    now = time.monotonic()
+    if POLL_SECONDS < 0 or now - _watch['checked'] < POLL_SECONDS or _watch['loading']:
+        return
+    with _swap_lock:
+        if _watch['loading'] or now - _watch['checked'] < POLL_SECONDS:
+            return
+        _watch['checked'] = now
+        stamp = model_registry.current_stamp(MODEL_DIR)
+        if stamp == _watch['stamp']:
+            return
+        version, model_dir = model_registry.resolve_model_dir(MODEL_DIR)
+        if version == cache.get('version'):
+            _watch['stamp'] = stamp
+            return
+        _watch['loading'] = True
+
+    threading.Thread(target=_background_load, args=(stamp, version, model_dir),
+                     name='eaps-model-reload', daemon=True).start()
+
+
+def _background_load(stamp, version, model_dir: str):
+    """Load and warm a new version off the request path, then swap it in."""
+    try:
+        snapshot = _load_snapshot(version, model_dir)
+        if _engine != 'sklearn':
+            for name in TREE_MODELS:
+                _compiled_for(snapshot, name)
+        _booster_for(snapshot, 'XGBoost')
+        for name in TREE_MODELS:
+            _explainer_for(snapshot, name)
+        _publish(snapshot, stamp)
+        print(f'[model_loader] serving model version {version or "(flat models/)"}')
+    except Exception as exc:
+        # Keep serving the old version; retry when CURRENT changes again
+        _watch['stamp'] = stamp
+        print(f'[model_loader] failed to load model version {version}: {exc}')
+    finally:
+        _watch['loading'] = False
+
+
+def current_snapshot() -> dict:
+    """
+    The served model snapshot (models, feature plan, thresholds, fingerprint).
+    Work spanning several calls — the chunks of one upload — takes it once
+    and passes it to score_rows / label_batch, so a hot-swap mid-upload
+    cannot mix model versions in one result.
+    """
+    return _snapshot()
+
+
+def current_model_version():
+    """Registry version being served, or None for the flat models/ layout."""
+    return _snapshot()['version']
+
+
+def model_fingerprint() -> str:
+    """Cache key of the served model version (see _fingerprint)."""
+    return _snapshot()['fingerprint']
+
+
+def current_model_dir() -> str:
+    """Directory holding the artifacts of the version being served."""
+    return _snapshot()['model_dir']
 
 
 def load_all_models():
@@ -46,82 +262,268 @@ def load_all_models():
     Load all trained models and the scaler. Cached after first call.
     Returns: (loaded_models_dict, scaler)
     """
-    if 'models' in _cache:
-        return _cache['models'], _cache['scaler']
+    cache = _snapshot()
+    return cache['models'], cache['scaler']
 
-    loaded = {}
-    for name, fname in MODELS.items():
-        path = os.path.join(MODEL_DIR, fname)
-        if os.path.exists(path):
-            loaded[name] = joblib.load(path)
-        else:
-            loaded[name] = None
 
-    scaler_path = os.path.join(MODEL_DIR, SCALER_FILE)
-    scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+def get_explainer(model_name: str):
+    """
+    Return the SHAP explainer for a model, built once and reused across requests.
+    Returns None when the model is missing or SHAP cannot explain it; that
+    outcome is cached as well so the failed construction is not retried per call.
+    """
+    return _explainer_for(_snapshot(), model_name)
 
-    _cache['models'] = loaded
-    _cache['scaler'] = scaler
-    return loaded, scaler
 
+def _explainer_for(cache: dict, model_name: str):
+    explainers = cache['explainers']
+    if model_name in explainers:
+        return explainers[model_name]
 
-def load_feature_names():
-    """Load the exact feature names the models were trained on."""
-    if 'feature_names' in _cache:
-        return _cache['feature_names']
+    with _build_lock:
+        if model_name in explainers:
+            return explainers[model_name]
+
+        model = cache['models'].get(model_name)
+        explainer = None
+        if model is not None and model_name in TREE_MODELS:
+            try:
+                if hasattr(model, 'calibrated_classifiers_'):
+                    # CalibratedClassifierCV: explain each fold through its calibrator
+                    from utils.calibrated_shap import CalibratedTreeExplainer
+                    explainer = CalibratedTreeExplainer(model)
+                else:
+                    import shap
+                    explainer = shap.TreeExplainer(model)
+            except Exception:
+                explainer = None
+
+        explainers[model_name] = explainer
+        return explainer
+
+
+def set_inference_engine(name: str):
+    """Select the tree inference engine: 'sklearn', 'native' or 'auto'."""
+    global _engine
+    if name not in ENGINES:
+        raise ValueError(f'Unknown inference engine "{name}". Choose from {ENGINES}.')
+    _engine = name
+
+
+def get_inference_engine() -> str:
+    return _engine
+
+
+def svm_engine():
+    """
+    The served SVM: {'engine': 'rbf', 'support_vectors': n} for an exact SVC,
+    {'engine': 'nystroem', 'components': n} for utils.kernel_svm.NystroemSVC,
+    or None if there is no SVM. Both score through predict_proba on scaled rows.
+    """
+    model = _snapshot()['models'].get('SVM')
+    if model is None:
+        return None
+    if hasattr(model, 'kernel_coef_'):
+        return {'engine': 'nystroem', 'components': int(len(model.components_))}
+    return {'engine': 'rbf', 'support_vectors': int(len(getattr(model, 'support_vectors_', ())))}
+
+
+def _native_path(model_dir: str, model_name: str) -> str:
+    stem = os.path.splitext(MODELS[model_name])[0]
+    return os.path.join(model_dir, stem + NATIVE_SUFFIX)
+
+
+def _load_persisted_native(model_dir: str, model_name: str):
+    """Load a previously compiled engine if it is newer than its model pickle."""
+    path = _native_path(model_dir, model_name)
+    model_path = os.path.join(model_dir, MODELS[model_name])
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(model_path):
+            return _load_pickle(path)
+    except OSError:
+        pass
+    return None
+
+
+def _persist_native(model_dir: str, model_name: str, engine):
+    """Write the compiled engine next to its model so other workers can mmap it."""
+    path = _native_path(model_dir, model_name)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        joblib.dump(engine, tmp)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def get_compiled_model(model_name: str):
+    """
+    Return the native CompiledTreeEnsemble for a tree model, compiled once and
+    cached with the models. Compiled engines are persisted as
+    <model dir>/<model>.native.pkl, so other workers (and restarts) load — or
+    mmap — the node arrays instead of recompiling. Returns None if not compilable.
+    """
+    return _compiled_for(_snapshot(), model_name)
+
+
+def _compiled_for(cache: dict, model_name: str):
+    compiled = cache['compiled']
+    if model_name in compiled:
+        return compiled[model_name]
+
+    with _build_lock:
+        if model_name in compiled:
+            return compiled[model_name]
+
+        model_dir = cache['model_dir']
+        engine = _load_persisted_native(model_dir, model_name) if model_name in TREE_MODELS else None
+        if engine is None:
+            model = cache['models'].get(model_name)
+            if model is not None and model_name in TREE_MODELS:
+                try:
+                    from utils.tree_engine import CompiledTreeEnsemble
+                    engine = CompiledTreeEnsemble(model)
+                    _persist_native(model_dir, model_name, engine)
+                except Exception:
+                    engine = None
+
+        compiled[model_name] = engine
+        return engine
+
+
+def _booster_for(cache: dict, model_name: str):
+    """The InplaceBooster of an XGBoost model, built once per snapshot; None otherwise."""
+    boosters = cache['boosters']
+    if model_name in boosters:
+        return boosters[model_name]
+
+    with _build_lock:
+        if model_name in boosters:
+            return boosters[model_name]
+        model = cache['models'].get(model_name)
+        try:
+            from utils.tree_engine import InplaceBooster
+            booster = InplaceBooster(model, XGB_NTHREAD) if model is not None else None
+        except Exception:
+            booster = None
+        boosters[model_name] = booster
+        return booster
+
+
+def preload_models():
+    """
+    Load every serving artifact into the module cache. Called in the gunicorn
+    master (preload_app) so workers inherit the models copy-on-write instead
+    of unpickling their own copies. Only loads — nothing here runs inference,
+    so no OpenMP thread pools exist in the master before it forks.
+    """
+    cache = _snapshot()
+    try:
+        import shap  # noqa: F401 — heavy import (numba/llvmlite), shared by all workers
+    except ImportError:
+        pass
+    if _engine != 'sklearn':
+        for name in TREE_MODELS:
+            engine = _load_persisted_native(cache['model_dir'], name)
+            if engine is not None:
+                cache['compiled'][name] = engine
+
+
+def _predictor(cache: dict, model_name: str, n_rows: int):
+    """Pick the object whose predict_proba scores this call."""
+    model = cache['models'].get(model_name)
+    if model_name not in TREE_MODELS:
+        return model
+    if _engine == 'sklearn' or (_engine == 'auto' and n_rows > NATIVE_MAX_ROWS):
+        return _booster_for(cache, model_name) or model
+    return _compiled_for(cache, model_name) or model
+
+
+def explain_single(X_row, model_name: str, top_n: int = 8) -> list:
+    """
+    Top-N SHAP contributions for one encoded row (array or DataFrame, feature_names order).
+    Returns [{'feature', 'shap'}, ...] sorted by |shap|, or [] if unavailable.
+    """
+    cache = _snapshot()
+    explainer = _explainer_for(cache, model_name)
+    if explainer is None:
+        return []
+
+    feature_names = cache['feature_names']
+    with _numpy_rows():
+        sv = explainer.shap_values(X_row)
+    sv = sv[1][0] if isinstance(sv, list) else sv[0]
+    sv = np.asarray(sv)
+    if sv.ndim == 2:
+        # Newer SHAP returns (n_features, n_classes) for classifiers
+        sv = sv[:, 1]
+
+    pairs = sorted(zip(feature_names, sv.tolist()),
+                   key=lambda x: abs(x[1]), reverse=True)[:top_n]
+    return [{'feature': f, 'shap': round(v, 5)} for f, v in pairs]
 
-    path = os.path.join(MODEL_DIR, FEATURE_NAMES_FILE)
-    if os.path.exists(path):
-        names = joblib.load(path)
-    else:
-        # Fallback: 25-column FINAL_FEATURES from pipeline
-        names = [
-            'Age', 'MaritalStatus', 'Department', 'JobRole', 'JobLevel',
-            'MonthlyIncome', 'HourlyRate', 'YearsAtCompany', 'YearsInCurrentRole',
-            'YearsSinceLastPromotion', 'WorkLifeBalance', 'JobSatisfaction',
-            'PerformanceRating', 'TrainingTimesLastYear', 'EnvironmentSatisfaction',
-            'RelationshipSatisfaction', 'JobInvolvement', 'DistanceFromHome',
-            'NumCompaniesWorked', 'Gender', 'OverTime',
-            'MonthlyRate', 'StockOptionLevel', 'PercentSalaryHike', 'BusinessTravel',
-        ]
 
-    _cache['feature_names'] = names
-    return names
+def load_feature_names():
+    """Load the exact feature names the models were trained on."""
+    return _snapshot()['feature_names']
 
 
 def load_label_encoders():
     """Load the LabelEncoders saved during training for consistent encoding."""
-    if 'label_encoders' in _cache:
-        return _cache['label_encoders']
+    return _snapshot()['label_encoders']
 
-    path = os.path.join(MODEL_DIR, LABEL_ENCODERS_FILE)
-    le = joblib.load(path) if os.path.exists(path) else {}
-    _cache['label_encoders'] = le
-    return le
+
+def load_feature_plan():
+    """FeaturePlan (utils/feature_plan.py) of the served model version."""
+    return _snapshot()['feature_plan']
 
 
 def load_thresholds():
     """Load per-model optimal thresholds (Youden's J) from training."""
-    if 'thresholds' in _cache:
-        return _cache['thresholds']
-
-    path = os.path.join(MODEL_DIR, THRESHOLD_FILE)
-    thresholds = joblib.load(path) if os.path.exists(path) else {}
-    _cache['thresholds'] = thresholds
-    return thresholds
+    return _snapshot()['thresholds']
 
 
 def load_best_model_name():
     """Return the name of the best-performing model from training."""
-    path = os.path.join(MODEL_DIR, BEST_MODEL_FILE)
-    if os.path.exists(path):
-        return joblib.load(path)
-    return 'Random Forest'
+    return _snapshot()['best_model']
 
 
 def models_exist() -> bool:
     """Check if at least the Random Forest model file exists."""
-    return os.path.exists(os.path.join(MODEL_DIR, 'random_forest.pkl'))
+    _, model_dir = model_registry.resolve_model_dir(MODEL_DIR)
+    return os.path.exists(os.path.join(model_dir, 'random_forest.pkl'))
+
+
+def fan_out(fn, items) -> list:
+    """
+    [fn(item) for item in items], run on a shared thread pool of
+    COMPARE_WORKERS threads. Results keep the order of items; the first
+    exception is re-raised, so per-model error handling belongs in fn.
+    """
+    items = list(items)
+    if COMPARE_WORKERS <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    with _fanout_lock:
+        if _fanout['pid'] != os.getpid():
+            # Created per process: pool threads do not survive a fork
+            from concurrent.futures import ThreadPoolExecutor
+            _fanout['pool'] = ThreadPoolExecutor(COMPARE_WORKERS, thread_name_prefix='eaps-fanout')
+            _fanout['pid']  = os.getpid()
+        pool = _fanout['pool']
+    return [f.result() for f in [pool.submit(fn, item) for item in items]]
+
+
+@contextmanager
+def _numpy_rows():
+    """
+    Context for scoring plain NumPy rows: models fitted on DataFrames would
+    otherwise warn on every call. Scoped, so importers keep their filters.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        yield
 
 
 def _risk_label(prob: float) -> str:
@@ -133,77 +535,184 @@ def _risk_label(prob: float) -> str:
     return 'LOW'
 
 
-def predict_single(employee_dict: dict, model_name: str = 'Random Forest') -> dict:
+def _scale(X, scaler):
+    """StandardScaler.transform without sklearn's per-call validation."""
+    if not hasattr(scaler, 'scale_'):
+        return scaler.transform(X)
+    if scaler.with_mean:
+        X = X - scaler.mean_
+    if scaler.with_std:
+        X = X / scaler.scale_
+    return X
+
+
+def predict_single(employee, model_name: str = 'Random Forest') -> dict:
     """
     Predict attrition for one employee.
-    employee_dict should already be numerically encoded (via encode_input).
+    employee is either a numerically encoded dict (via encode_input) or a
+    float NumPy row already in feature_names order (via encode_row).
     Returns: { prediction, probability, risk_level, threshold_used }
     """
-    import pandas as pd
+    if isinstance(employee, np.ndarray):
+        x = employee.reshape(1, -1)
+    else:
+        # One row in feature_names order, filling missing columns with 0
+        x = np.array([[float(employee.get(col, 0)) for col in load_feature_names()]])
+    return predict_rows(x, model_name)[0]
 
-    models, scaler = load_all_models()
-    model = models.get(model_name)
 
-    if model is None:
-        return {'error': f'Model "{model_name}" not found. Run eaps_ml_pipeline.py first.'}
+def predict_rows(X, model_name: str = 'Random Forest') -> list:
+    """
+    Score an encoded float matrix (rows in feature_names order) and return one
+    predict_single-style result dict per row. Used to score coalesced requests
+    as a single matrix.
+    """
+    cache  = _snapshot()
+    model  = cache['models'].get(model_name)
+    scaler = cache['scaler']
 
-    feature_names = load_feature_names()
-    thresholds    = load_thresholds()
-    threshold     = thresholds.get(model_name, 0.5)
+    X = np.asarray(X, dtype=np.float64)
+    if model is None:
+        error = {'error': f'Model "{model_name}" not found. Run eaps_ml_pipeline.py first.'}
+        return [dict(error) for _ in range(len(X))]
 
-    # Build DataFrame with correct column order, filling missing columns with 0
-    row = {col: employee_dict.get(col, 0) for col in feature_names}
-    df  = pd.DataFrame([row])
+    threshold = cache['thresholds'].get(model_name, 0.5)
 
     if model_name in SCALED_MODELS and scaler:
-        df = pd.DataFrame(scaler.transform(df), columns=df.columns)
+        X = _scale(X, scaler)
 
     # Use probability >= threshold (NOT model.predict directly, avoids threshold mismatch)
-    prob  = float(model.predict_proba(df)[0][1])
-    pred  = 1 if prob >= threshold else 0
+    with _numpy_rows():
+        probs = _predictor(cache, model_name, len(X)).predict_proba(X)[:, 1]
 
-    return {
-        'prediction':      'Leave' if pred == 1 else 'Stay',
-        'probability':     round(prob, 4),
+    return [{
+        'prediction':      'Leave' if prob >= threshold else 'Stay',
+        'probability':     round(float(prob), 4),
         'risk_level':      _risk_label(prob),
         'threshold_used':  threshold,
-    }
+    } for prob in probs]
+
+
+def row_hashes(X: np.ndarray) -> np.ndarray:
+    """uint64 hash of each row of a 2-D float matrix (pd.util.hash_pandas_object)."""
+    import pandas as pd
+    return pd.util.hash_pandas_object(pd.DataFrame(X, copy=False), index=False).to_numpy()
 
 
-def predict_batch(df_input, model_name: str = 'Random Forest'):
+def unique_rows(X: np.ndarray):
     """
-    Predict attrition for a DataFrame of employees.
-    Returns df_input with added columns:
-        Prediction, Probability, Risk_Level, Threshold_Used
+    (first, inverse) for a 2-D float matrix: X[first] are its distinct rows in
+    order of first appearance and X[first][inverse] == X. Rows are hashed
+    (row_hashes) and factorized in one pass; the result is checked exactly,
+    so a hash collision only means no dedup (first = all rows).
     """
     import pandas as pd
 
-    models, scaler = load_all_models()
-    model = models.get(model_name)
+    n = len(X)
+    inverse, _ = pd.factorize(row_hashes(X))
+    _, first = np.unique(inverse, return_index=True)
+    if len(first) < n and not np.array_equal(X[first][inverse], X):
+        return np.arange(n), np.arange(n)
+    return first, inverse
+
+
+def dedup_stats(rows: int, unique: int) -> dict:
+    """Dedup report: rows scored by the caller vs distinct rows the model actually saw."""
+    return {'rows': int(rows), 'unique_rows': int(unique),
+            'ratio': round(rows / unique, 3) if unique else 1.0}
+
 
+def _score(cache: dict, df_input, model_name: str, dedup: bool = None, memo: dict = None):
+    """(raw probabilities, distinct rows scored or None without dedup) of an encoded frame."""
+    import pandas as pd
+
+    model  = cache['models'].get(model_name)
+    scaler = cache['scaler']
     if model is None:
         raise ValueError(f'Model "{model_name}" not found. Run eaps_ml_pipeline.py first.')
 
-    feature_names = load_feature_names()
-    thresholds    = load_thresholds()
-    threshold     = thresholds.get(model_name, 0.5)
-
     # Align columns: keep only known features, fill missing with 0
-    df = df_input.copy()
-    for col in feature_names:
-        if col not in df.columns:
-            df[col] = 0
-    X = df[feature_names]
+    feature_names = cache['feature_names']
+    missing = [col for col in feature_names if col not in df_input.columns]
+    X = df_input.assign(**dict.fromkeys(missing, 0)) if missing else df_input
+    X = X[feature_names]
+
+    dedup = (DEDUP_ROWS if dedup is None else dedup) and len(X) > 0
+    if dedup and memo is not None:
+        return _score_memo(cache, X, model_name, memo)
+    if dedup:
+        first, inverse = unique_rows(X.to_numpy(dtype=np.float64))
+        X = X.iloc[first]
 
     if model_name in SCALED_MODELS and scaler:
         X = pd.DataFrame(scaler.transform(X), columns=X.columns)
 
-    probs  = model.predict_proba(X)[:, 1]
-    preds  = (probs >= threshold).astype(int)
+    probs = _predictor(cache, model_name, len(X)).predict_proba(X)[:, 1]
+    if dedup:
+        return probs[inverse], len(X)
+    return probs, None
+
+
+def _score_memo(cache: dict, X, model_name: str, memo: dict):
+    """
+    _score with dedup across calls: memo maps a row's bytes → probability and
+    is extended with the rows scored here, so only rows not seen in earlier
+    chunks reach the model. Rows are matched exactly (unique_rows within the
+    call, row bytes across calls). Returns (probabilities, rows scored).
+    """
+    values = X.to_numpy(dtype=np.float64)
+    first, inverse = unique_rows(values)
+    keys = [row.tobytes() for row in values[first]]
+    new  = [i for i, k in enumerate(keys) if k not in memo]
+    if new:
+        probs = _score(cache, X.iloc[first[new]], model_name, dedup=False)[0]
+        memo.update(zip((keys[i] for i in new), probs.tolist()))
+    return np.array([memo[k] for k in keys])[inverse], len(new)
+
+
+def _label(cache: dict, df_input, probs, model_name: str):
+    """df_input plus the prediction columns for raw probabilities, at the model's saved threshold."""
+    threshold = cache['thresholds'].get(model_name, 0.5)
+    probs     = np.asarray(probs)
+    preds     = (probs >= threshold).astype(int)
 
     df_out = df_input.copy()
     df_out['Prediction']     = ['Leave' if p == 1 else 'Stay' for p in preds]
     df_out['Probability']    = np.round(probs, 4)
-    df_out['Risk_Level']     = [_risk_label(p) for p in probs]
+    df_out['Risk_Level']     = np.select([probs >= 0.70, probs >= 0.40], ['HIGH', 'MEDIUM'], 'LOW').astype(object)
     df_out['Threshold_Used'] = threshold
     return df_out
+
+
+def score_rows(df_input, model_name: str = 'Random Forest', dedup: bool = None,
+               memo: dict = None, snapshot: dict = None):
+    """
+    Raw P(leave) of each row of an encoded frame, before thresholding or
+    rounding (what utils.score_cache stores). Returns (probs, unique): unique
+    is the number of distinct rows scored with dedup, else None. Pass the
+    same memo dict (row bytes → probability) to dedup across calls, e.g. the
+    chunks of one upload: rows seen before are not scored again. snapshot
+    (current_snapshot()) pins the model version; default: the served one.
+    """
+    return _score(snapshot or _snapshot(), df_input, model_name, dedup, memo)
+
+
+def label_batch(df_input, probs, model_name: str = 'Random Forest', snapshot: dict = None):
+    """predict_batch's output for probabilities already computed by score_rows."""
+    return _label(snapshot or _snapshot(), df_input, probs, model_name)
+
+
+def predict_batch(df_input, model_name: str = 'Random Forest', dedup: bool = None):
+    """
+    Predict attrition for a DataFrame of employees.
+    Returns df_input with added columns:
+        Prediction, Probability, Risk_Level, Threshold_Used
+    With dedup (default DEDUP_ROWS) only distinct encoded rows are scored;
+    df_out.attrs['dedup'] then holds dedup_stats.
+    """
+    cache = _snapshot()
+    probs, unique = _score(cache, df_input, model_name, dedup)
+    df_out = _label(cache, df_input, probs, model_name)
+    if unique is not None:
+        df_out.attrs['dedup'] = dedup_stats(len(df_out), unique)
+    return df_out
@@ -0,0 +1,219 @@
+"""
+utils/model_registry.py
+Versioned model directories with a manifest and an atomic "current" pointer.
+
+Layout (under models/):
+    versions/<version>/          one complete training run (*.pkl + manifest.json)
+    versions/.staging-<version>/ a run still being written — never served
+    CURRENT                      name of the live version (replaced atomically)
+
+The pipeline writes a run into a staging directory, writes manifest.json last,
+renames the directory into versions/ and only then flips CURRENT. Readers
+therefore never see a half-written mix of old and new pickles. A run that
+fails removes its staging directory (abort_version); ones left by a killed
+process are deleted after STAGING_MAX_AGE_S by the next begin_version or
+prune_versions. When no CURRENT file exists the legacy flat models/*.pkl
+layout is served as-is.
+
+CLI:
+    python -m utils.model_registry list
+    python -m utils.model_registry publish <version>     # promote / roll back
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+
+MODEL_DIR     = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
+VERSIONS_DIR  = 'versions'
+CURRENT_FILE  = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+STAGING_PREFIX = '.staging-'
+STAGING_MAX_AGE_S = 24 * 3600     # older unsealed staging directories are abandoned runs
+
+
+def _versions_root(root: str = MODEL_DIR) -> str:
+    return os.path.join(root, VERSIONS_DIR)
+
+
+def version_dir(version: str, root: str = MODEL_DIR) -> str:
+    return os.path.join(_versions_root(root), version)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w') as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+# ── Writing (training side) ───────────────────────────────────────────────────
+def begin_version(root: str = MODEL_DIR):
+    """
+    Create a staging directory for a new training run.
+    Returns (version, staging_dir); write all artifacts into staging_dir.
+    """
+    prune_staging(root=root)
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f') + f'-{os.getpid()}'
+    staging = os.path.join(_versions_root(root), STAGING_PREFIX + version)
+    os.makedirs(staging, exist_ok=False)
+    return version, staging
+
+
+def commit_version(staging_dir: str, version: str, metadata: dict = None,
+                   publish_now: bool = True, root: str = MODEL_DIR) -> str:
+    """
+    Seal a staged run: hash every artifact into manifest.json, move the
+    directory into versions/<version>, then (optionally) make it current.
+    Returns the final version directory.
+    """
+    files = {}
+    for fname in sorted(os.listdir(staging_dir)):
+        path = os.path.join(staging_dir, fname)
+        if os.path.isfile(path):
+            files[fname] = {'sha256': _sha256(path), 'size': os.path.getsize(path)}
+
+    manifest = {
+        'version':    version,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'files':      files,
+        'metadata':   metadata or {},
+    }
+    _write_atomic(os.path.join(staging_dir, MANIFEST_FILE),
+                  json.dumps(manifest, indent=2, default=str))
+
+    final_dir = version_dir(version, root)
+    os.replace(staging_dir, final_dir)
+    if publish_now:
+        publish(version, root)
+    return final_dir
+
+
+def abort_version(staging_dir: str):
+    """Discard a staged run that failed before commit_version."""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def prune_staging(max_age_s: float = STAGING_MAX_AGE_S, root: str = MODEL_DIR) -> list:
+    """Delete unsealed staging directories not modified for max_age_s seconds."""
+    vroot = _versions_root(root)
+    if not os.path.isdir(vroot):
+        return []
+    cutoff  = time.time() - max_age_s
+    removed = []
+    for name in os.listdir(vroot):
+        path = os.path.join(vroot, name)
+        try:
+            stale = name.startswith(STAGING_PREFIX) and os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def publish(version: str, root: str = MODEL_DIR):
+    """Atomically point CURRENT at an existing, complete version."""
+    if read_manifest(version, root) is None:
+        raise ValueError(f'Model version "{version}" is missing or incomplete.')
+    _write_atomic(os.path.join(root, CURRENT_FILE), version + '\n')
+
+
+# ── Reading (serving side) ────────────────────────────────────────────────────
+def read_manifest(version: str, root: str = MODEL_DIR):
+    """Manifest dict of a version, or None if it is missing / not yet sealed."""
+    path = os.path.join(version_dir(version, root), MANIFEST_FILE)
+    try:
+        with open(path) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    vdir = version_dir(version, root)
+    for fname, meta in manifest.get('files', {}).items():
+        fpath = os.path.join(vdir, fname)
+        if not os.path.isfile(fpath) or os.path.getsize(fpath) != meta.get('size'):
+            return None
+    return manifest
+
+
+def current_version(root: str = MODEL_DIR):
+    """Name of the live version, or None for the legacy flat layout."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def current_stamp(root: str = MODEL_DIR):
+    """Cheap change detector: (mtime_ns, size) of CURRENT, or None."""
+    try:
+        st = os.stat(os.path.join(root, CURRENT_FILE))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def resolve_model_dir(root: str = MODEL_DIR):
+    """(version, directory) currently being served; version is None for legacy layout."""
+    version = current_version(root)
+    if version and read_manifest(version, root) is not None:
+        return version, version_dir(version, root)
+    return None, root
+
+
+def list_versions(root: str = MODEL_DIR) -> list:
+    """Sealed versions, oldest first."""
+    vroot = _versions_root(root)
+    if not os.path.isdir(vroot):
+        return []
+    return sorted(v for v in os.listdir(vroot)
+                  if not v.startswith(STAGING_PREFIX) and read_manifest(v, root) is not None)
+
+
+def prune_versions(keep: int = 5, root: str = MODEL_DIR) -> list:
+    """
+    Delete the oldest sealed versions beyond `keep`, never the current one,
+    and abandoned staging directories (prune_staging).
+    """
+    current = current_version(root)
+    removed = prune_staging(root=root)
+    for version in list_versions(root)[:-keep] if keep > 0 else []:
+        if version != current:
+            shutil.rmtree(version_dir(version, root), ignore_errors=True)
+            removed.append(version)
+    return removed
+
+
+if __name__ == '__main__':
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if cmd == 'list':
+        current = current_version()
+        for v in list_versions():
+            created = (read_manifest(v) or {}).get('created_at', '')
+            print(f"{'*' if v == current else ' '} {v}  {created}")
+        if current is None:
+            print('  (no CURRENT pointer — serving legacy flat models/ layout)')
+    elif cmd == 'publish' and len(sys.argv) == 3:
+        publish(sys.argv[2])
+        print(f'CURRENT → {sys.argv[2]}')
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -2,12 +2,11 @@
 utils/preprocess.py
 Preprocessing helpers for user input → model-ready features.
 
-KEY FIX: Now loads and uses the same label_encoders.pkl saved during
-training, ensuring inference encoding exactly matches training encoding.
-Falls back to hardcoded CATEGORICAL_MAPS if pkl not available.
+KEY FIX: Encoding is driven by the FeaturePlan (utils/feature_plan.py) of the
+served model version — the same encoders, aliases, defaults and column order
+as training. Falls back to hardcoded CATEGORICAL_MAPS if models are not available.
 """
 
-import os
 import pandas as pd
 import numpy as np
 
@@ -75,136 +74,50 @@ COLUMN_ALIASES = {
     'Job_Involvement': 'JobInvolvement',
 }
 
-# ── Load label encoders from training artifact ────────────────────────────────
-_label_encoders = None
-_le_load_attempted = False
-
-def _get_label_encoders():
-    """Lazy-load training label encoders for consistent inference encoding."""
-    global _label_encoders, _le_load_attempted
-    if _le_load_attempted:
-        return _label_encoders
-    _le_load_attempted = True
+# ── Feature plan of the served model version ──────────────────────────────────
+def current_feature_plan():
+    """
+    FeaturePlan of the model version currently being served (cached and
+    hot-swapped by utils.model_loader). Without loadable models, a plan over
+    IBM_FEATURES with the hardcoded CATEGORICAL_MAPS.
+    """
     try:
-        import joblib
-        le_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'label_encoders.pkl')
-        if os.path.exists(le_path):
-            _label_encoders = joblib.load(le_path)
+        from utils.model_loader import load_feature_plan
+        return load_feature_plan()
     except Exception:
-        _label_encoders = None
-    return _label_encoders
+        from utils.feature_plan import FeaturePlan
+        return FeaturePlan(IBM_FEATURES)
 
 
-def _encode_categorical_value(col: str, val) -> int:
+def encode_input(user_input: dict) -> pd.DataFrame:
     """
-    Encode a single categorical value using training LabelEncoder if available,
-    otherwise fall back to CATEGORICAL_MAPS.
+    Takes a raw user input dict (from the Flask form) and returns a one-row
+    DataFrame with the exact features expected by the model.
+    Categorical values are encoded using the same LabelEncoder as training.
     """
-    le_dict = _get_label_encoders()
-
-    # Try training LabelEncoder first (most accurate)
-    if le_dict and col in le_dict:
-        le = le_dict[col]
-        val_str = str(val)
-        if val_str in le.classes_:
-            return int(le.transform([val_str])[0])
-        # Unknown value → return 0 (safe fallback)
-        return 0
+    plan = current_feature_plan()
+    return pd.DataFrame([plan.encode_row(user_input)], columns=plan.feature_names)
 
-    # Fall back to hardcoded map
-    if col in CATEGORICAL_MAPS:
-        return CATEGORICAL_MAPS[col].get(str(val), 0)
 
-    return 0
-
-
-def encode_input(user_input: dict) -> pd.DataFrame:
+def encode_row(user_input: dict, feature_names=None) -> np.ndarray:
     """
-    Takes a raw user input dict (from the Flask form) and returns
-    a DataFrame with the exact 25 features expected by the model.
-    Categorical values are encoded using the same LabelEncoder as training.
+    DataFrame-free equivalent of encode_input: raw JSON payload → float64
+    NumPy row in feature_names order (defaults to the served plan's order).
+    Produces exactly the values predict_single would build from encode_input.
     """
-    row = {}
-    for col in IBM_FEATURES:
-        val = user_input.get(col, 0)
-        if col in CATEGORICAL_MAPS or (_get_label_encoders() and col in _get_label_encoders()):
-            row[col] = _encode_categorical_value(col, val)
-        else:
-            try:
-                row[col] = float(val)
-            except (ValueError, TypeError):
-                row[col] = 0
-    return pd.DataFrame([row])
+    plan = current_feature_plan()
+    row  = plan.encode_row(user_input)
+    if feature_names is None or list(feature_names) == plan.feature_names:
+        return row
+    # Different order requested: columns the plan does not know stay 0
+    values = dict(zip(plan.feature_names, row))
+    return np.array([values.get(col, 0.0) for col in feature_names])
 
 
 def preprocess_uploaded_csv(df: pd.DataFrame) -> pd.DataFrame:
     """
     Preprocess a user-uploaded CSV for batch prediction.
-    Handles both IBM-style and custom-style columns.
-    Uses the exact same LabelEncoders as training (loaded from label_encoders.pkl).
+    Handles both IBM-style and custom-style columns (aliases from the plan).
+    Uses the exact same encoders, defaults and column order as training.
     """
-    df = df.copy()
-
-    # Normalise column aliases
-    df.rename(columns=COLUMN_ALIASES, inplace=True)
-
-    # Drop target if present
-    for col in ['Attrition', 'attrition', 'ATTRITION']:
-        if col in df.columns:
-            df.drop(columns=[col], inplace=True)
-
-    # Drop constants / ID columns
-    for col in ['EmployeeCount', 'Over18', 'StandardHours',
-                'EmployeeNumber', 'Employee_ID', 'DailyRate']:
-        if col in df.columns:
-            df.drop(columns=[col], inplace=True)
-
-    le_dict = _get_label_encoders()
-
-    # Apply training LabelEncoders first (for known categorical cols)
-    if le_dict:
-        for col, le in le_dict.items():
-            if col in df.columns:
-                known = set(le.classes_)
-                df[col] = df[col].astype(str).apply(
-                    lambda x: int(le.transform([x])[0]) if x in known else 0
-                )
-    else:
-        # Fallback: use hardcoded CATEGORICAL_MAPS
-        for col, mapping in CATEGORICAL_MAPS.items():
-            if col in df.columns:
-                df[col] = df[col].astype(str).map(mapping).fillna(0).astype(int)
-
-    # Encode any remaining object columns with consistent alphabetical LabelEncoder
-    for col in df.select_dtypes(include='object').columns:
-        converted = pd.to_numeric(df[col], errors='coerce')
-        if converted.notna().mean() > 0.5:
-            df[col] = converted.fillna(0)
-        else:
-            cats = sorted(df[col].dropna().unique())
-            mapping = {c: i for i, c in enumerate(cats)}
-            df[col] = df[col].map(mapping).fillna(0).astype(int)
-
-    # Convert all remaining columns to numeric
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    # Load feature names from pkl if available, fall back to IBM_FEATURES
-    try:
-        import joblib
-        fn_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'feature_names.pkl')
-        feature_names = joblib.load(fn_path) if os.path.exists(fn_path) else IBM_FEATURES
-    except Exception:
-        feature_names = IBM_FEATURES
-
-    # Add missing feature columns (fill zero)
-    for col in feature_names:
-        if col not in df.columns:
-            df[col] = 0
-
-    # Keep only known features if all are present
-    available = [c for c in feature_names if c in df.columns]
-    if len(available) == len(feature_names):
-        return df[feature_names]
-
-    return df[available] if available else df.select_dtypes(include=[np.number])
+    return current_feature_plan().encode_frame(df)
@@ -0,0 +1,229 @@
+"""
+utils/results_store.py
+Server-side storage for full batch results, served by /api/results/<id>/download.
+
+Results are written once as data/results/<result_id>.parquet (or .csv when
+pyarrow is not installed) and streamed back in chunks as CSV, gzip-compressed
+CSV, the stored Parquet file or an Arrow IPC file (Feather v2), so the JSON
+response only carries a summary and a link. ResultWriter appends chunk by
+chunk, so a streamed batch never holds its full result table in memory.
+"""
+
+import os
+import re
+import time
+import uuid
+import zlib
+
+RESULTS_DIR   = os.path.join(os.path.dirname(__file__), '..', 'data', 'results')
+RESULT_TTL_S  = float(os.environ.get('EAPS_RESULT_TTL_HOURS', 24)) * 3600
+STREAM_ROWS   = 10_000
+FORMATS       = ('csv', 'csv.gz', 'parquet', 'arrow')
+MIMETYPES     = {
+    'csv':     'text/csv',
+    'csv.gz':  'application/gzip',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow':   'application/vnd.apache.arrow.file',
+}
+
+_RESULT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def valid_result_id(result_id: str) -> bool:
+    """Result ids are uuid4 hex; anything else never reaches the filesystem."""
+    return bool(_RESULT_ID.match(result_id or ''))
+
+
+def result_path(result_id: str):
+    """Stored file of a result, or None if unknown / expired."""
+    if not valid_result_id(result_id):
+        return None
+    for ext in ('.parquet', '.csv'):
+        path = os.path.join(RESULTS_DIR, result_id + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class ResultWriter:
+    """
+    Incremental save_results: write(df) once per chunk, close() publishes the
+    file and returns its id. Chunks after the first must have the same columns.
+    """
+
+    def __init__(self):
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        prune_results()
+        self.result_id = uuid.uuid4().hex
+        self._base     = os.path.join(RESULTS_DIR, self.result_id)
+        self._tmp      = f'{self._base}.{uuid.uuid4().hex}.tmp'
+        self._parquet  = _has_pyarrow()
+        self._writer   = None     # pyarrow.parquet.ParquetWriter once data arrives
+        self._header   = True     # CSV header still to be written
+
+    def write(self, df):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            try:
+                if self._writer is None:
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    self._writer = pq.ParquetWriter(self._tmp, table.schema)
+                else:
+                    table = pa.Table.from_pandas(df, schema=self._writer.schema,
+                                                 preserve_index=False)
+                self._writer.write_table(table)
+                return
+            except (pa.ArrowException, TypeError, ValueError):
+                # e.g. an uploaded column with mixed types Arrow cannot store
+                self._switch_to_csv()
+        df.to_csv(self._tmp, mode='a', header=self._header, index=False)
+        self._header = False
+
+    def _switch_to_csv(self):
+        """Rewrite the row groups written so far as CSV and continue in CSV."""
+        self._parquet = False
+        if self._writer is None:
+            return
+        import pyarrow.parquet as pq
+        self._writer.close()
+        self._writer = None
+        written = self._tmp + '.parquet'
+        os.replace(self._tmp, written)
+        for batch in pq.ParquetFile(written).iter_batches(batch_size=STREAM_ROWS):
+            batch.to_pandas().to_csv(self._tmp, mode='a', header=self._header, index=False)
+            self._header = False
+        os.remove(written)
+
+    def discard(self):
+        """Abandon a partly written result (e.g. the job failed)."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def close(self) -> str:
+        ext = '.parquet' if self._writer is not None else '.csv'
+        if self._writer is not None:
+            self._writer.close()
+        elif not os.path.exists(self._tmp):
+            open(self._tmp, 'w').close()   # no rows at all
+        os.replace(self._tmp, self._base + ext)
+        return self.result_id
+
+
+def save_results(df) -> str:
+    """Persist a result DataFrame and return its id."""
+    writer = ResultWriter()
+    writer.write(df)
+    return writer.close()
+
+
+def prune_results(ttl_s: float = RESULT_TTL_S) -> int:
+    """Delete stored results older than ttl_s seconds."""
+    if not os.path.isdir(RESULTS_DIR):
+        return 0
+    cutoff  = time.time() - ttl_s
+    removed = 0
+    for fname in os.listdir(RESULTS_DIR):
+        path = os.path.join(RESULTS_DIR, fname)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+def _csv_chunks(path: str):
+    """CSV bytes in STREAM_ROWS-row pieces, without loading the whole result."""
+    if path.endswith('.csv'):
+        yield from _file_chunks(path)
+        return
+
+    import pyarrow.parquet as pq
+    header = True
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=STREAM_ROWS):
+        yield batch.to_pandas().to_csv(index=False, header=header).encode()
+        header = False
+
+
+def _gzip(chunks):
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31 → gzip container
+    for chunk in chunks:
+        data = comp.compress(chunk)
+        if data:
+            yield data
+    yield comp.flush()
+
+
+class _Drain:
+    """Write-only sink for pyarrow that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._parts, self._pos, self.closed = [], 0, False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def _arrow_chunks(path: str):
+    """Arrow IPC file bytes built batch by batch from the stored Parquet file."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pf   = pq.ParquetFile(path)
+    sink = _Drain()
+    with pa.ipc.new_file(pa.PythonFile(sink, mode='w'), pf.schema_arrow) as writer:
+        for batch in pf.iter_batches(batch_size=STREAM_ROWS):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def _file_chunks(path: str):
+    with open(path, 'rb') as fh:
+        yield from iter(lambda: fh.read(1 << 20), b'')
+
+
+def stream_result(path: str, fmt: str = 'csv'):
+    """
+    Iterator of response bytes for a stored result in the requested format.
+    Raises ValueError up front (before any bytes are sent) for formats that
+    cannot be produced.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format "{fmt}". Choose from {FORMATS}.')
+    if fmt in ('parquet', 'arrow'):
+        if not path.endswith('.parquet'):
+            raise ValueError(f'{fmt.capitalize()} download needs pyarrow on the server.')
+        return _file_chunks(path) if fmt == 'parquet' else _arrow_chunks(path)
+    if fmt == 'csv.gz':
+        return _gzip(_csv_chunks(path))
+    return _csv_chunks(path)
@@ -0,0 +1,167 @@
+"""
+utils/roster_io.py
+Reading uploaded rosters: CSV, Parquet, Arrow IPC (file and stream) and Feather.
+
+The format is detected from the first bytes, never from the file name:
+    b'PAR1'              Parquet
+    b'ARROW1'            Arrow IPC file (also Feather v2)
+    FF FF FF FF          Arrow IPC stream (continuation marker)
+    b'FEA1'              Feather v1
+    anything else        CSV
+
+Columnar formats go through pyarrow straight into typed columns — no text
+parsing. Paths are memory-mapped and in-memory uploads wrapped without
+copying; Parquet reads only the requested columns, batch by batch. String
+columns named in `categorical` arrive as pandas categoricals, like the CSV
+reader's dtype='category'.
+"""
+
+import os
+
+import pandas as pd
+
+FORMATS = ('csv', 'parquet', 'arrow', 'arrow-stream', 'feather')
+# Download format (utils/results_store.py) matching each upload format
+RESULT_FORMATS = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrow',
+                  'arrow-stream': 'arrow', 'feather': 'arrow'}
+UPLOAD_EXTENSIONS = ('.csv', '.parquet', '.arrow', '.feather', '.ipc')
+
+_MAGIC = (
+    (b'PAR1',             'parquet'),
+    (b'ARROW1',           'arrow'),
+    (b'\xff\xff\xff\xff', 'arrow-stream'),
+    (b'FEA1',             'feather'),
+)
+
+
+def _is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def detect_format(source) -> str:
+    """Format of a path or seekable file object (position is left unchanged)."""
+    if _is_path(source):
+        with open(source, 'rb') as fh:
+            head = fh.read(8)
+    else:
+        pos  = source.tell()
+        head = source.read(8)
+        source.seek(pos)
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return 'csv'
+
+
+def _rewind(source):
+    """Every reader starts at the beginning of the upload, whatever read it before."""
+    if not _is_path(source):
+        source.seek(0)
+    return source
+
+
+def _arrow_input(source):
+    """pyarrow readable for a path (memory-mapped) or a file object (wrapped, no copy if in memory)."""
+    import pyarrow as pa
+    if _is_path(source):
+        return pa.memory_map(os.fspath(source))
+    _rewind(source)
+    if hasattr(source, 'getbuffer'):         # BytesIO / Streamlit UploadedFile
+        return pa.BufferReader(pa.py_buffer(source.getbuffer()))
+    return pa.PythonFile(source, mode='r')
+
+
+def _ipc_batches(source, fmt: str):
+    """(schema, iterator of RecordBatches) of an Arrow IPC / Feather upload."""
+    import pyarrow as pa
+    if fmt == 'arrow-stream':
+        reader = pa.ipc.open_stream(_arrow_input(source))
+        return reader.schema, iter(reader)
+    if fmt == 'feather':
+        import pyarrow.feather as feather
+        table = feather.read_table(_arrow_input(source))
+        return table.schema, iter(table.to_batches())
+    reader = pa.ipc.open_file(_arrow_input(source))
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def read_columns(source, fmt: str) -> list:
+    """Column names of an upload, reading only its header / schema."""
+    if fmt == 'csv':
+        return pd.read_csv(_rewind(source), nrows=0).columns.tolist()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(_arrow_input(source)).names
+    return _ipc_batches(source, fmt)[0].names
+
+
+def _string_columns(schema, names) -> list:
+    import pyarrow as pa
+    return [n for n in names or () if n in schema.names
+            and (pa.types.is_string(schema.field(n).type) or pa.types.is_large_string(schema.field(n).type))]
+
+
+def _to_pandas(data, columns, categorical):
+    """RecordBatch / Table → DataFrame of `columns`, dictionary-encoding the categorical string columns."""
+    import pyarrow.compute as pc
+    if columns is not None:
+        data = data.select(columns)
+    for name in _string_columns(data.schema, categorical):
+        i = data.schema.get_field_index(name)
+        data = data.set_column(i, name, pc.dictionary_encode(data.column(i)))
+    return data.to_pandas()
+
+
+def iter_frames(source, fmt: str, chunk_rows: int, columns=None, categorical=()):
+    """DataFrames of at most chunk_rows rows, restricted to `columns` (None = all)."""
+    if fmt == 'csv':
+        dtype = {c: 'category' for c in categorical}
+        with pd.read_csv(_rewind(source), usecols=columns, dtype=dtype, chunksize=chunk_rows) as reader:
+            yield from reader
+        return
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(_arrow_input(source))
+        pf = pq.ParquetFile(_arrow_input(source),
+                            read_dictionary=_string_columns(schema, categorical))
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    _, batches = _ipc_batches(source, fmt)
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_rows):
+            yield _to_pandas(batch.slice(start, chunk_rows), columns, categorical)
+
+
+def read_frame(source, fmt: str, columns=None, categorical=()) -> pd.DataFrame:
+    """A whole upload as one DataFrame, restricted to `columns` (None = all)."""
+    if fmt == 'csv':
+        return pd.read_csv(_rewind(source), usecols=columns,
+                           dtype={c: 'category' for c in categorical})
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(_arrow_input(source))
+        return pq.read_table(_arrow_input(source), columns=columns,
+                             read_dictionary=_string_columns(schema, categorical)).to_pandas()
+
+    import pyarrow as pa
+    schema, batches = _ipc_batches(source, fmt)
+    return _to_pandas(pa.Table.from_batches(list(batches), schema=schema), columns, categorical)
+
+
+def count_rows(path: str, fmt: str) -> int:
+    """Data rows of an upload on disk, from metadata where the format has it."""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt != 'csv':
+        return sum(batch.num_rows for batch in _ipc_batches(path, fmt)[1])
+
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return max(lines + (last != b'\n') - 1, 0)
@@ -0,0 +1,122 @@
+"""
+utils/score_cache.py
+Content-addressed cache of batch scoring work, so uploading the same roster
+again (another model on /batch, another threshold, the compare page) skips
+the work already done for it.
+
+Entries are .npy files under data/score_cache/, named by a hash of
+    upload   sha256 of the uploaded bytes (upload_key)
+    version  model_loader.model_fingerprint() of the served model version
+    model    model name — probabilities only
+and hold one of
+    'features'  the encoded float64 matrix, in the feature plan's column order
+    'actual'    the upload's Attrition labels as 0/1 (empty if it has none)
+    'proba'     raw P(leave) per row, before thresholding or rounding
+so a threshold change is labelling only, never inference.
+
+The directory is a size-bounded LRU: reads touch an entry's mtime and each
+write evicts the least recently used entries until everything fits in
+EAPS_SCORE_CACHE_MB (0 disables the cache). Files are written to a temp name
+and renamed, so concurrent workers never read a partial entry.
+"""
+
+import hashlib
+import os
+import uuid
+
+import numpy as np
+
+CACHE_DIR   = os.path.join(os.path.dirname(__file__), '..', 'data', 'score_cache')
+CACHE_BYTES = float(os.environ.get('EAPS_SCORE_CACHE_MB', 256)) * 2**20
+KINDS       = ('features', 'actual', 'proba')
+
+
+def enabled() -> bool:
+    return CACHE_BYTES > 0
+
+
+def upload_key(source):
+    """
+    sha256 of an upload (path or seekable file object, left rewound), or
+    None for in-memory DataFrames and when the cache is disabled.
+    """
+    if not enabled() or not (isinstance(source, (str, os.PathLike)) or hasattr(source, 'read')):
+        return None
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def _path(key: str, version: str, kind: str, model_name: str = None) -> str:
+    if kind not in KINDS:
+        raise ValueError(f'Unknown cache entry kind "{kind}". Choose from {KINDS}.')
+    name = hashlib.sha256(f'{key}\0{version}\0{model_name or ""}'.encode()).hexdigest()[:40]
+    return os.path.join(CACHE_DIR, f'{name}.{kind}.npy')
+
+
+def load(key, version: str, kind: str, model_name: str = None):
+    """Cached array (memory-mapped, read-only) or None on a miss."""
+    if key is None:
+        return None
+    path = _path(key, version, kind, model_name)
+    try:
+        array = np.load(path, mmap_mode='r')
+        os.utime(path)            # most recently used
+    except (OSError, ValueError):
+        return None               # missing, evicted meanwhile or unreadable
+    return array
+
+
+def store(key, version: str, kind: str, array, model_name: str = None) -> bool:
+    """Publish an entry, then evict down to CACHE_BYTES. False if it cannot fit."""
+    if key is None:
+        return False
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    if array.nbytes > CACHE_BYTES:
+        return False
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(key, version, kind, model_name)
+    tmp  = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+    evict(keep=path)
+    return True
+
+
+def evict(limit: float = None, keep: str = None) -> int:
+    """Delete least recently used entries until the cache fits in limit bytes (default CACHE_BYTES)."""
+    limit = CACHE_BYTES if limit is None else limit
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    entries = []
+    for fname in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, fname)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    used    = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if used <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        used    -= size
+        removed += 1
+    return removed
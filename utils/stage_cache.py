@@ -0,0 +1,134 @@
+"""
+utils/stage_cache.py
+Content-addressed cache of training pipeline stages (eaps_ml_pipeline.train).
+
+Every stage output is stored under a key hashed from
+    inputs   the keys of the stages it consumes (or dataset file hashes),
+             plus its parameters (hyperparameters, split seed, ...)
+    code     the source file of the module defining the stage function
+             (so the helpers it calls are covered too), of the extra
+             modules passed as code= (repo code the stages run, e.g.
+             utils/kernel_svm.py) and the scikit-learn / XGBoost
+             versions, so edited code or an upgraded library never
+             reuses stale artifacts
+so keys chain from the data files down to each model: changing one model's
+hyperparameters misses only that model's fit / calibrate / evaluate stages
+(and the plots), everything upstream and the other models are loaded.
+
+Entries are joblib files under models/.stage_cache/, written to a temp name
+and renamed. Hits touch an entry's mtime; prune() deletes entries unused for
+EAPS_STAGE_CACHE_DAYS.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+import joblib
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', '.stage_cache')
+MAX_AGE_S = float(os.environ.get('EAPS_STAGE_CACHE_DAYS', 30)) * 86400
+
+
+def digest(*parts) -> str:
+    """sha256 of JSON-able parts (anything else by repr, e.g. numpy scalars)."""
+    payload = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_digest(path: str):
+    """sha256 of a file's bytes, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def module_digest(module) -> str:
+    """sha256 of a module's source file (module object or dotted name)."""
+    if isinstance(module, str):
+        module = sys.modules.get(module) or importlib.import_module(module)
+    return file_digest(module.__file__)
+
+
+def _library_versions() -> dict:
+    import sklearn
+    import xgboost
+    return {'sklearn': sklearn.__version__, 'xgboost': xgboost.__version__}
+
+
+class StageCache:
+    """
+    run() stages through the cache; hits / runs record which stages were
+    loaded and which computed, in order. seconds holds each stage's compute
+    time, stored with its output so a cached stage reports what it cost.
+    code lists further modules whose source is part of every key.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, enabled: bool = True, code=()):
+        self.cache_dir = cache_dir
+        self.enabled   = enabled
+        self.code      = tuple(code)
+        self.hits      = []
+        self.runs      = []
+        self.seconds   = {}
+        self._libs     = _library_versions()
+        self._code     = {name: module_digest(name) for name in self.code}
+
+    def _path(self, stage: str, key: str) -> str:
+        safe = re.sub(r'[^A-Za-z0-9]+', '_', stage).strip('_').lower()
+        return os.path.join(self.cache_dir, f'{safe}-{key[:40]}.joblib')
+
+    def run(self, stage: str, inputs, fn, *args):
+        """
+        fn(*args) for a stage, or its cached output. inputs must identify
+        everything fn depends on besides code (upstream keys and
+        parameters). Returns (output, key); pass key on as the input of the
+        stages downstream.
+        """
+        key  = digest(stage, inputs, module_digest(fn.__module__), self._code, self._libs)
+        path = self._path(stage, key)
+        if self.enabled and os.path.exists(path):
+            try:
+                entry = joblib.load(path)
+                output, self.seconds[stage] = entry['output'], entry['seconds']
+                os.utime(path)                # most recently used
+                self.hits.append(stage)
+                return output, key
+            except Exception:
+                pass                          # unreadable (e.g. truncated): recompute
+
+        start  = time.perf_counter()
+        output = fn(*args)
+        self.seconds[stage] = time.perf_counter() - start
+        self.runs.append(stage)
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+            joblib.dump({'output': output, 'seconds': self.seconds[stage]}, tmp)
+            os.replace(tmp, path)
+        return output, key
+
+    def prune(self, max_age_s: float = MAX_AGE_S) -> int:
+        """Delete entries not used for max_age_s seconds."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        cutoff  = time.time() - max_age_s
+        removed = 0
+        for fname in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
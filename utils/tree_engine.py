@@ -0,0 +1,309 @@
+"""
+utils/tree_engine.py
+Native NumPy inference for the calibrated Random Forest / XGBoost artifacts.
+
+Every tree of every calibration fold is flattened into one set of contiguous
+node arrays (feature, threshold, children, missing, value). Rows are pushed
+through all trees at once, one tree level per NumPy step, and each fold's
+isotonic calibrator is applied as a precomputed np.interp table.
+
+Split semantics match the original libraries bit-for-bit. Thresholds are
+stored as float32 and compared as  float32(x) <= t :
+  - sklearn trees compare  float32(x) <= threshold (float64); t is the
+    largest float32 not above that threshold
+  - XGBoost compares       float32(x) <  split_condition; t is
+    nextafter(split_condition, -inf)
+Leaves point to themselves, so traversal needs no per-row branching.
+
+InplaceBooster is the XGBoost path of the default 'sklearn' engine: the
+booster's own inplace_predict on a float32 matrix with a fixed nthread, and
+the same calibration tables, without the sklearn wrapper's per-call overhead.
+"""
+
+import json
+import numpy as np
+
+from utils.calibrated_shap import calibrated_folds, isotonic_table
+
+# Max (rows × trees) node indices per traversal chunk; small chunks stay in cache
+_CHUNK_CELLS = 50_000
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _is_xgboost(estimator) -> bool:
+    return hasattr(estimator, 'get_booster')
+
+
+def _sklearn_trees(forest):
+    """Yield node arrays for each tree of a fitted sklearn forest / tree."""
+    estimators = getattr(forest, 'estimators_', None) or [forest]
+    for est in estimators:
+        t = est.tree_
+        n = t.node_count
+        left  = t.children_left.astype(np.int32)
+        right = t.children_right.astype(np.int32)
+        leaf  = left == -1
+        nodes = np.arange(n, dtype=np.int32)
+        left  = np.where(leaf, nodes, left)
+        right = np.where(leaf, nodes, right)
+
+        # NaN routing (sklearn >= 1.3); older versions send NaN right
+        go_left = getattr(t, 'missing_go_to_left', None)
+        missing = right.copy() if go_left is None else np.where(go_left.astype(bool), left, right)
+
+        # Largest float32 not above each float64 threshold
+        thr = t.threshold.astype(np.float32)
+        over = thr.astype(np.float64) > t.threshold
+        thr[over] = np.nextafter(thr[over], np.float32(-np.inf))
+
+        value = t.value[:, 0, :]
+        totals = value.sum(axis=1)
+        proba = np.divide(value[:, 1], totals, out=np.zeros(n), where=totals > 0)
+
+        yield {
+            'feature':   np.where(leaf, 0, t.feature).astype(np.int32),
+            'threshold': np.where(leaf, np.inf, thr).astype(np.float32),
+            'left': left, 'right': right, 'missing': missing,
+            'value': proba,
+            'depth': int(t.max_depth),
+        }
+
+
+def _xgb_iteration_trees(model):
+    """Number of boosted trees the sklearn wrapper actually uses for prediction."""
+    booster = model.get_booster()
+    n_trees = len(booster.get_dump())
+    try:
+        best = booster.best_iteration
+    except AttributeError:
+        best = None
+    if best is not None:
+        per_iter = max(1, int(getattr(model, 'num_parallel_tree', None) or 1))
+        n_trees = min(n_trees, (int(best) + 1) * per_iter)
+    return n_trees
+
+
+def _xgb_trees(model, n_features: int):
+    """Yield node arrays for each tree of a fitted XGBClassifier."""
+    booster = model.get_booster()
+    names = booster.feature_names or [f'f{i}' for i in range(n_features)]
+    col = {name: i for i, name in enumerate(names)}
+
+    dumps = booster.get_dump(dump_format='json')[:_xgb_iteration_trees(model)]
+    for dump in dumps:
+        flat = []
+        stack = [(json.loads(dump), 0)]
+        while stack:
+            node, depth = stack.pop()
+            flat.append((node, depth))
+            stack.extend((child, depth + 1) for child in node.get('children', []))
+
+        n = max(node['nodeid'] for node, _ in flat) + 1
+        feature   = np.zeros(n, dtype=np.int32)
+        threshold = np.full(n, np.inf, dtype=np.float32)
+        left      = np.arange(n, dtype=np.int32)
+        right     = np.arange(n, dtype=np.int32)
+        missing   = np.arange(n, dtype=np.int32)
+        value     = np.zeros(n)
+        depth_max = 0
+
+        for node, depth in flat:
+            i = node['nodeid']
+            depth_max = max(depth_max, depth)
+            if 'leaf' in node:
+                value[i] = node['leaf']
+                continue
+            split = node['split']
+            feature[i] = col[split] if split in col else int(str(split).lstrip('f'))
+            cond = np.float32(node['split_condition'])
+            threshold[i] = np.nextafter(cond, np.float32(-np.inf))
+            left[i], right[i], missing[i] = node['yes'], node['no'], node['missing']
+
+        yield {
+            'feature': feature, 'threshold': threshold,
+            'left': left, 'right': right, 'missing': missing,
+            'value': value, 'depth': depth_max,
+        }
+
+
+class CompiledTreeEnsemble:
+    """
+    Flattened, calibrated tree ensemble with an sklearn-like predict_proba.
+    Build with CompiledTreeEnsemble(model) where model is a fitted
+    CalibratedClassifierCV over RF/XGBoost, or a bare RF/XGBoost classifier.
+    """
+
+    def __init__(self, model):
+        self.n_features_in_ = int(model.n_features_in_)
+        self.classes_ = np.array([0, 1])
+
+        if hasattr(model, 'calibrated_classifiers_'):
+            folds = calibrated_folds(model)
+        else:
+            folds = [(model, None)]
+
+        parts = []
+        self.folds = []
+        offset = 0
+        n_trees = 0
+        for base, calibrator in folds:
+            xgb = _is_xgboost(base)
+            trees = list(_xgb_trees(base, self.n_features_in_) if xgb else _sklearn_trees(base))
+
+            for tree in trees:
+                for key in ('left', 'right', 'missing'):
+                    tree[key] = tree[key] + offset
+                offset += len(tree['value'])
+                parts.append(tree)
+
+            fold = {
+                'kind': 'xgb' if xgb else 'rf',
+                'trees': slice(n_trees, n_trees + len(trees)),
+                'table': isotonic_table(calibrator) if calibrator is not None else None,
+                'sigmoid': None,
+                'base_margin': 0.0,
+            }
+            if calibrator is not None and fold['table'] is None:
+                # Platt / sigmoid calibrator: p = 1 / (1 + exp(a·f + b))
+                fold['sigmoid'] = (float(calibrator.a_), float(calibrator.b_))
+            n_trees += len(trees)
+            self.folds.append((fold, base))
+
+        self.feature   = np.concatenate([p['feature'] for p in parts])
+        self.threshold = np.concatenate([p['threshold'] for p in parts])
+        # children[2*i] = left, children[2*i + 1] = right
+        self.children  = np.column_stack([
+            np.concatenate([p['left'] for p in parts]),
+            np.concatenate([p['right'] for p in parts]),
+        ]).ravel()
+        self.missing   = np.concatenate([p['missing'] for p in parts])
+        self.value     = np.concatenate([p['value'] for p in parts])
+        self.roots     = np.cumsum([0] + [len(p['value']) for p in parts[:-1]]).astype(np.int32)
+        self.max_depth = max(p['depth'] for p in parts)
+
+        # XGBoost's base_score lives outside the trees; recover it from the
+        # model's own margin on a reference row.
+        ref = np.zeros((1, self.n_features_in_))
+        leaves = self._leaf_values(ref)
+        folds_out = []
+        for fold, base in self.folds:
+            if fold['kind'] == 'xgb':
+                margin = float(np.asarray(base.predict(ref, output_margin=True)).ravel()[0])
+                fold['base_margin'] = margin - float(leaves[0, fold['trees']].sum())
+            folds_out.append(fold)
+        # Drop estimator references so the compiled engine is self-contained
+        self.folds = folds_out
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children,
+                                      self.missing, self.value, self.roots))
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) leaf value reached by each row in each tree."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_feat = X.shape
+        has_nan = bool(np.isnan(X).any())
+        out = np.empty((n_rows, self.n_trees))
+
+        step = max(1, _CHUNK_CELLS // self.n_trees)
+        for start in range(0, n_rows, step):
+            Xc = X[start:start + step]
+            flat = Xc.ravel()
+            row_base = (np.arange(len(Xc), dtype=np.int32) * n_feat)[:, None]
+            idx = np.broadcast_to(self.roots, (len(Xc), self.n_trees)).copy()
+
+            for _ in range(self.max_depth):
+                xv = flat[row_base + self.feature[idx]]
+                nxt = self.children[2 * idx + (xv > self.threshold[idx])]
+                if has_nan:
+                    nxt = np.where(np.isnan(xv), self.missing[idx], nxt)
+                idx = nxt
+
+            out[start:start + step] = self.value[idx]
+        return out
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Calibrated class probabilities, shape (n_rows, 2), like sklearn."""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        leaves = self._leaf_values(X)
+
+        pos = np.zeros(len(X))
+        for fold in self.folds:
+            vals = leaves[:, fold['trees']]
+            if fold['kind'] == 'xgb':
+                raw = _sigmoid(vals.sum(axis=1) + fold['base_margin'])
+            else:
+                raw = vals.mean(axis=1)
+
+            if fold['table'] is not None:
+                raw = np.interp(raw, *fold['table'])
+            elif fold['sigmoid'] is not None:
+                a, b = fold['sigmoid']
+                raw = 1.0 / (1.0 + np.exp(a * raw + b))
+            pos += raw
+        pos /= len(self.folds)
+
+        return np.column_stack([1.0 - pos, pos])
+
+
+class InplaceBooster:
+    """
+    Calibrated XGBoost scored through Booster.inplace_predict: rows go to the
+    booster as one contiguous float32 array (no DataFrame validation, no
+    DMatrix) on nthread threads, and each fold's calibrator is applied as in
+    CompiledTreeEnsemble. Build with InplaceBooster(model, nthread) where model
+    is a fitted CalibratedClassifierCV over XGBoost or a bare XGBClassifier.
+    """
+
+    def __init__(self, model, nthread: int = 1):
+        self.n_features_in_ = int(model.n_features_in_)
+        self.classes_ = np.array([0, 1])
+        self.nthread  = nthread
+
+        if hasattr(model, 'calibrated_classifiers_'):
+            folds = calibrated_folds(model)
+        else:
+            folds = [(model, None)]
+        if not all(_is_xgboost(base) for base, _ in folds):
+            raise TypeError('InplaceBooster needs an XGBoost model.')
+
+        self.folds = []
+        for base, calibrator in folds:
+            # Only the rounds the wrapper predicts with; the slice is a new
+            # Booster, so nthread does not leak into the model's own one
+            per_iter = max(1, int(getattr(base, 'num_parallel_tree', None) or 1))
+            booster  = base.get_booster()[:_xgb_iteration_trees(base) // per_iter]
+            booster.set_param({'nthread': nthread})
+            table = isotonic_table(calibrator) if calibrator is not None else None
+            sigmoid = ((float(calibrator.a_), float(calibrator.b_))
+                       if calibrator is not None and table is None else None)
+            self.folds.append((booster, table, sigmoid))
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Calibrated class probabilities, shape (n_rows, 2), like sklearn."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        pos = np.zeros(len(X))
+        for booster, table, sigmoid in self.folds:
+            raw = booster.inplace_predict(X, validate_features=False).astype(np.float64)
+            if table is not None:
+                raw = np.interp(raw, *table)
+            elif sigmoid is not None:
+                a, b = sigmoid
+                raw = 1.0 / (1.0 + np.exp(a * raw + b))
+            pos += raw
+        pos /= len(self.folds)
+
+        return np.column_stack([1.0 - pos, pos])
@@ -0,0 +1,167 @@
+"""
+utils/whatif.py
+Threshold what-if over the probabilities of a stored batch, behind
+/api/results/<id>/whatif.
+
+score_batch and compare_batch save one ThresholdIndex per model next to the
+stored results (data/results/<id>.whatif.npz, pruned with them). An index is
+the batch's raw probabilities sorted once, plus prefix sums of the
+probabilities and, when the upload has an Attrition column, of the actual
+outcomes. Any threshold is then two binary searches and a few subtractions —
+O(log n), no re-upload and no inference — so a UI slider can query it live.
+
+For a threshold t:
+    leavers      rows with probability >= t
+    risk_counts  HIGH >= t, MEDIUM 40% .. t, LOW the rest (the compare page bands)
+    expected     precision / recall if every probability is the chance that
+                 employee leaves (the models are calibrated)
+    actual       precision / recall against the uploaded Attrition labels
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+MEDIUM_CUTOFF  = 0.40
+ACTUAL_COLUMNS = ('Attrition', 'attrition', 'ATTRITION')   # as eaps_ml_pipeline TARGET_CANDIDATES
+INDEX_SUFFIX   = '.whatif.npz'
+CACHED_INDEXES = 16
+
+
+def actual_labels(df):
+    """Uploaded outcome column as 0/1 int8 (Yes / 1 / true = left), or None if absent or incomplete."""
+    col = next((c for c in ACTUAL_COLUMNS if c in df.columns), None)
+    if col is None or df[col].isna().any():
+        return None
+    values = df[col].astype(str).str.strip().str.lower()
+    return values.isin(('yes', '1', 'true')).to_numpy(dtype=np.int8)
+
+
+class ThresholdIndex:
+    """Sorted probabilities and prefix sums of one model's batch."""
+
+    def __init__(self, probs, actual=None):
+        probs = np.asarray(probs, dtype=np.float64)
+        order = np.argsort(probs, kind='stable')
+        self.probs = probs[order]
+        self.cum_p = np.concatenate(([0.0], np.cumsum(self.probs)))
+        self.cum_y = None
+        if actual is not None:
+            self.cum_y = np.concatenate(([0], np.cumsum(np.asarray(actual)[order], dtype=np.int64)))
+
+    @classmethod
+    def from_arrays(cls, probs, cum_p, cum_y=None):
+        index = cls.__new__(cls)
+        index.probs, index.cum_p, index.cum_y = probs, cum_p, cum_y
+        return index
+
+    def at(self, threshold: float) -> dict:
+        n       = len(self.probs)
+        below   = int(np.searchsorted(self.probs, threshold, side='left'))
+        medium0 = int(np.searchsorted(self.probs, MEDIUM_CUTOFF, side='left'))
+        flagged = n - below
+
+        exp_tp  = float(self.cum_p[n] - self.cum_p[below])
+        exp_pos = float(self.cum_p[n])
+        result = {
+            'threshold':      round(float(threshold), 4),
+            'total':          n,
+            'leavers':        flagged,
+            'attrition_rate': round(flagged / n * 100, 2) if n else 0,
+            'risk_counts':    {'HIGH': flagged, 'MEDIUM': max(below - medium0, 0),
+                               'LOW': min(below, medium0)},
+            'expected': {
+                'precision': round(exp_tp / flagged, 4) if flagged else None,
+                'recall':    round(exp_tp / exp_pos, 4) if exp_pos else None,
+                'leavers':   round(exp_pos, 1),
+            },
+        }
+        if self.cum_y is not None:
+            tp  = int(self.cum_y[n] - self.cum_y[below])
+            pos = int(self.cum_y[n])
+            result['actual'] = {
+                'precision': round(tp / flagged, 4) if flagged else None,
+                'recall':    round(tp / pos, 4) if pos else None,
+                'leavers':   pos,
+            }
+        return result
+
+
+# ── Storage next to the results (utils/results_store.py) ──────────────────────
+def _index_path(result_id: str) -> str:
+    from utils.results_store import RESULTS_DIR
+    return os.path.join(RESULTS_DIR, result_id + INDEX_SUFFIX)
+
+
+def save_indexes(result_id: str, probs_by_model: dict, actual=None):
+    """Build and store one ThresholdIndex per model for a batch."""
+    from utils.results_store import RESULTS_DIR, prune_results
+
+    arrays = {}
+    for i, (model_name, probs) in enumerate(probs_by_model.items()):
+        index = ThresholdIndex(probs, actual)
+        arrays[f'name_{i}'] = np.array(model_name)
+        arrays[f'probs_{i}'] = index.probs
+        arrays[f'cum_p_{i}'] = index.cum_p
+        if index.cum_y is not None:
+            arrays[f'cum_y_{i}'] = index.cum_y
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    prune_results()
+    path = _index_path(result_id)
+    tmp  = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, path)
+
+
+_loaded = OrderedDict()        # result_id → {model: ThresholdIndex}, most recent last
+_loaded_lock = threading.Lock()
+
+
+def load_indexes(result_id: str):
+    """{model name: ThresholdIndex} of a stored batch, or None if unknown / expired."""
+    from utils.results_store import valid_result_id
+
+    if not valid_result_id(result_id):
+        return None
+    with _loaded_lock:
+        if result_id in _loaded and os.path.exists(_index_path(result_id)):
+            _loaded.move_to_end(result_id)
+            return _loaded[result_id]
+
+    try:
+        with np.load(_index_path(result_id)) as npz:
+            indexes, i = {}, 0
+            while f'name_{i}' in npz:
+                cum_y = npz[f'cum_y_{i}'] if f'cum_y_{i}' in npz else None
+                indexes[str(npz[f'name_{i}'])] = ThresholdIndex.from_arrays(
+                    npz[f'probs_{i}'], npz[f'cum_p_{i}'], cum_y)
+                i += 1
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        _loaded[result_id] = indexes
+        while len(_loaded) > CACHED_INDEXES:
+            _loaded.popitem(last=False)
+    return indexes
+
+
+def what_if(result_id: str, thresholds, model_name: str = None):
+    """
+    {model: [ThresholdIndex.at(t) for t in thresholds]} for a stored batch
+    (all its models, or only model_name); None if the batch is unknown or expired.
+    """
+    indexes = load_indexes(result_id)
+    if indexes is None:
+        return None
+    if model_name is not None:
+        if model_name not in indexes:
+            raise ValueError(f'Model "{model_name}" is not part of this batch. '
+                             f'Choose from {list(indexes)}.')
+        indexes = {model_name: indexes[model_name]}
+    return {name: [index.at(t) for t in thresholds] for name, index in indexes.items()}